@@ -71,6 +71,10 @@ FC_AS_FI_CALLBACK_URL_V2 = os.environ["FC_AS_FI_CALLBACK_URL_V2"]
 FC_AS_FI_ID = os.environ["FC_AS_FI_ID"]
 HASH_FC_AS_FI_SECRET = os.environ["HASH_FC_AS_FI_SECRET"]
 FC_AS_FI_HASH_SALT = os.environ["FC_AS_FI_HASH_SALT"]
+# Also look up the unexpired connections created before codes and access tokens were
+# stored as HMAC digests by their `make_password` hash. Can be switched off once
+# these connections have expired, FC_CONNECTION_AGE after the migration.
+FC_AS_FI_ACCEPT_LEGACY_HASHES = getenv_bool("FC_AS_FI_ACCEPT_LEGACY_HASHES", True)
 FC_AS_FI_LOGOUT_REDIRECT_URI = os.environ["FC_AS_FI_LOGOUT_REDIRECT_URI"]
 FC_AS_FI_LOGOUT_REDIRECT_URI_V2 = os.environ["FC_AS_FI_LOGOUT_REDIRECT_URI_V2"]
 
@@ -85,6 +89,10 @@ FC_AS_FS_ID_V2 = os.environ["FC_AS_FS_ID_V2"]
 FC_AS_FS_SECRET_V2 = os.environ["FC_AS_FS_SECRET_V2"]
 FC_AS_FS_KID_V2 = os.environ["FC_AS_FS_KID_V2"]
 FC_AS_FS_N_V2 = os.environ["FC_AS_FS_N_V2"]
+# Timeout, in seconds, of the requests to FranceConnect
+FC_AS_FS_TIMEOUT = int(os.getenv("FC_AS_FS_TIMEOUT", 5))
+# Lifetime, in seconds, of the cached FranceConnect metadata and signing keys
+FC_AS_FS_METADATA_MAX_AGE = int(os.getenv("FC_AS_FS_METADATA_MAX_AGE", 3600))
 
 FC_CONNECTION_AGE = int(os.environ["FC_CONNECTION_AGE"])
 
@@ -273,6 +281,11 @@ LOGOUT_REDIRECT_URL = "home_page"
 ACTIVITY_CHECK_URL = "activity_check"
 ACTIVITY_CHECK_THRESHOLD = int(os.getenv("ACTIVITY_CHECK_THRESHOLD"))
 ACTIVITY_CHECK_DURATION = timedelta(minutes=ACTIVITY_CHECK_THRESHOLD)
+# The date of the last action of an aidant is only written again once it is older
+# than this, to avoid an UPDATE of the aidant for every journal entry
+ACTIVITY_TRACKING_GRANULARITY = timedelta(
+    seconds=int(os.getenv("ACTIVITY_TRACKING_GRANULARITY_SECONDS", 60))
+)
 
 AUTH_USER_MODEL = "aidants_connect_web.Aidant"
 
@@ -416,6 +429,24 @@ BACKUP_EMAIL_USE_SSL = getenv_bool("BACKUP_EMAIL_USE_SSL", False)
 
 TDL_NEED_BACKUP_SMTP = os.getenv("TDL_NEED_BACKUP_SMTP", "laposte.net")
 
+# Bulk emails are split in batches, each sent through a single SMTP connection
+BULK_EMAIL_BATCH_SIZE = int(os.getenv("BULK_EMAIL_BATCH_SIZE", 100))
+# Maximum rate of batches sent by each Celery worker
+BULK_EMAIL_BATCH_RATE_LIMIT = os.getenv("BULK_EMAIL_BATCH_RATE_LIMIT", "20/m")
+
+# Transactional emails are recorded in an outbox and sent once the transaction
+# which recorded them is committed; failed sends are retried by a periodic task
+OUTGOING_EMAIL_MAX_ATTEMPTS = int(os.getenv("OUTGOING_EMAIL_MAX_ATTEMPTS", 5))
+# Delay before the first retry, in seconds, doubled at each attempt
+OUTGOING_EMAIL_RETRY_DELAY = int(os.getenv("OUTGOING_EMAIL_RETRY_DELAY", 60))
+# Maximum rate of emails sent by each Celery worker
+OUTGOING_EMAIL_RATE_LIMIT = os.getenv("OUTGOING_EMAIL_RATE_LIMIT", "60/m")
+# Maximum number of emails sent to the same address per period, in seconds
+OUTGOING_EMAIL_RECIPIENT_LIMIT = int(os.getenv("OUTGOING_EMAIL_RECIPIENT_LIMIT", 20))
+OUTGOING_EMAIL_RECIPIENT_PERIOD = int(
+    os.getenv("OUTGOING_EMAIL_RECIPIENT_PERIOD", 3600)
+)
+
 # # if email backend is aidants_connect_web.mail.ForceSpecificSenderBackend
 EMAIL_EXTRA_HEADERS = os.getenv("EMAIL_EXTRA_HEADERS", None)
 EMAIL_SENDER = os.getenv("EMAIL_SENDER", os.getenv("ADMIN_EMAIL"))
@@ -616,6 +647,11 @@ SUPPORT_EMAIL = "connexion@aidantsconnect.beta.gouv.fr"
 AC_CONTACT_EMAIL = "contact@aidantsconnect.beta.gouv.fr"
 
 MANDAT_EXPIRED_SOON = 30
+# Mandates transferred to another organisation are moved in batches, each one in
+# its own transaction along with its journal entries
+MANDAT_TRANSFER_BATCH_SIZE = int(os.getenv("MANDAT_TRANSFER_BATCH_SIZE", 1000))
+# Number of usagers listed per page in each tab of the usagers index
+USAGERS_INDEX_PAGE_SIZE = int(os.getenv("USAGERS_INDEX_PAGE_SIZE", 50))
 MANDAT_EXPIRED_SOON_EMAIL_SUBJECT = os.getenv(
     "MANDAT_EXPIRED_SOON_EMAIL_SUBJECT", "Ces mandats vont bientôt expirer"
 )
@@ -799,8 +835,24 @@ PIX_METABASE_CARD_ID = os.getenv("PIX_METABASE_CARD_ID")
 if "test" in sys.argv:
     # Force disable SMS API during tests
     SMS_API_DISABLED = True
+    # Send SMS and emails in-process so that tests don't need a Celery broker
+    SMS_ASYNC_DISPATCH = False
+    BULK_EMAIL_ASYNC_DISPATCH = False
+    OUTGOING_EMAIL_ASYNC_DISPATCH = False
+    MANDAT_TRANSFER_ASYNC_DISPATCH = False
 else:
     SMS_API_DISABLED = getenv_bool("SMS_API_DISABLED", True)
+    # SMS are sent by Celery workers; when disabled, they are sent during the request
+    SMS_ASYNC_DISPATCH = getenv_bool("SMS_ASYNC_DISPATCH", True)
+    # Batches of bulk emails are sent by Celery subtasks; when disabled, they are
+    # sent by the task which prepares them
+    BULK_EMAIL_ASYNC_DISPATCH = getenv_bool("BULK_EMAIL_ASYNC_DISPATCH", True)
+    # Transactional emails are sent by Celery workers once the transaction is
+    # committed; when disabled, they are sent as soon as they are recorded
+    OUTGOING_EMAIL_ASYNC_DISPATCH = getenv_bool("OUTGOING_EMAIL_ASYNC_DISPATCH", True)
+    # Mandate transfers are run by Celery workers; when disabled, they are run
+    # during the request which starts them
+    MANDAT_TRANSFER_ASYNC_DISPATCH = getenv_bool("MANDAT_TRANSFER_ASYNC_DISPATCH", True)
 
 
 FF_ACTIVATE_SMS_CONSENT = getenv_bool("FF_ACTIVATE_SMS_CONSENT", True)
@@ -815,6 +867,13 @@ LM_SMS_SERVICE_PASSWORD = os.getenv("LM_SMS_SERVICE_PASSWORD")
 LM_SMS_SERVICE_BASE_URL = os.getenv("LM_SMS_SERVICE_BASE_URL")
 LM_SMS_SERVICE_OAUTH2_ENDPOINT = os.getenv("LM_SMS_SERVICE_OAUTH2_ENDPOINT")
 LM_SMS_SERVICE_SND_SMS_ENDPOINT = os.getenv("LM_SMS_SERVICE_SND_SMS_ENDPOINT")
+LM_SMS_SERVICE_TIMEOUT = int(os.getenv("LM_SMS_SERVICE_TIMEOUT", 10))
+
+SMS_SEND_MAX_RETRIES = int(os.getenv("SMS_SEND_MAX_RETRIES", 5))
+# Delay before the first retry, doubled at each attempt
+SMS_SEND_RETRY_DELAY = int(os.getenv("SMS_SEND_RETRY_DELAY", 10))
+# Maximum rate of SMS sent by each Celery worker
+SMS_SEND_RATE_LIMIT = os.getenv("SMS_SEND_RATE_LIMIT", "10/s")
 
 # URLS
 SANDBOX_URL = os.getenv("SANDBOX_URL", "")
@@ -850,6 +909,11 @@ FORMATION_MAX_ATTENDANTS = int(os.getenv("FORMATION_MAX_ATTENDANTS", 18))
 GRIST_URL_SERVER = os.getenv("GRIST_URL_SERVER", "")
 GRIST_DOCUMENT_ID = os.getenv("GRIST_DOCUMENT_ID", "")
 GRIST_API_KEY = os.getenv("GRIST_API_KEY", "")
+# Number of records sent to Grist by each update request
+GRIST_UPDATE_CHUNK_SIZE = int(os.getenv("GRIST_UPDATE_CHUNK_SIZE", 500))
+GRIST_UPDATE_MAX_ATTEMPTS = int(os.getenv("GRIST_UPDATE_MAX_ATTEMPTS", 3))
+# Delay before the first retry, in seconds, doubled at each attempt
+GRIST_UPDATE_RETRY_DELAY = int(os.getenv("GRIST_UPDATE_RETRY_DELAY", 2))
 
 
 GRIST_REBORDING_TABLE_ID = os.getenv("GRIST_REBORDING_TABLE_ID", "")
@@ -938,3 +1002,49 @@ ATTESTATION_TEMPLATE_NAME = os.getenv(
     "ATTESTATION_TEMPLATE_NAME",
     "attestation/CertificatHabilitationAidantsConnectVide.pdf",
 )
+
+# Total size, in bytes, of the attestation QR codes and formation certificates
+# kept in memory by each process
+ATTESTATION_RENDER_CACHE_SIZE = int(
+    os.getenv("ATTESTATION_RENDER_CACHE_SIZE", 32 * 1024 * 1024)
+)
+
+# Number of monthly partitions of the journal table created in advance
+JOURNAL_PARTITIONS_MONTHS_AHEAD = int(os.getenv("JOURNAL_PARTITIONS_MONTHS_AHEAD", 3))
+
+# Maximum number of days between two full computations of the aidants statistics,
+# the computations in between only updating the departments which changed
+STATISTICS_RECONCILIATION_DAYS = int(os.getenv("STATISTICS_RECONCILIATION_DAYS", 7))
+
+# Number of days the daily history of the statistics is kept, older days being
+# downsampled to one point per month
+STATISTICS_SERIES_DAILY_RETENTION_DAYS = int(
+    os.getenv("STATISTICS_SERIES_DAILY_RETENTION_DAYS", 90)
+)
+# Number of months the monthly history of the statistics is kept, 0 for ever
+STATISTICS_SERIES_MONTHLY_RETENTION_MONTHS = int(
+    os.getenv("STATISTICS_SERIES_MONTHLY_RETENTION_MONTHS", 0)
+)
+
+# Number of aidants loaded at once when exporting them for bizdevs
+EXPORT_FOR_BIZDEVS_PAGE_SIZE = int(os.getenv("EXPORT_FOR_BIZDEVS_PAGE_SIZE", 500))
+
+# Number of seconds the public statistics page may be cached by browsers and proxies
+PUBLIC_STATISTICS_MAX_AGE = int(os.getenv("PUBLIC_STATISTICS_MAX_AGE", 3600))
+
+# Number of seconds a snapshot of the public organisations API is kept in cache;
+# snapshots are replaced as soon as an organisation changes
+API_ORGANISATIONS_SNAPSHOT_TIMEOUT = int(
+    os.getenv("API_ORGANISATIONS_SNAPSHOT_TIMEOUT", 3600)
+)
+
+# Number of seconds a waiting room request is held until the SMS response arrives;
+# 0 makes waiting rooms poll at a fixed interval instead
+WAITING_ROOM_LONG_POLL_SECONDS = int(os.getenv("WAITING_ROOM_LONG_POLL_SECONDS", 20))
+# Maximum number of waiting room requests held at once by each web process; above,
+# waiting rooms poll. Keep it below the number of threads of the web server.
+WAITING_ROOM_MAX_LONG_POLLS = int(os.getenv("WAITING_ROOM_MAX_LONG_POLLS", 2))
+# Number of seconds after which a waiting room gives up on an unresponsive Redis
+CONSENT_NOTIFICATIONS_REDIS_TIMEOUT = int(
+    os.getenv("CONSENT_NOTIFICATIONS_REDIS_TIMEOUT", 2)
+)
@@ -123,6 +123,7 @@ class JournalActionKeywords(metaclass=JournalActionKeywordsMeta):
     REMOTE_SMS_DENIAL_RECEIVED = "remote_sms_denial_received"
     REMOTE_SMS_CONSENT_SENT = "remote_sms_consent_sent"
     REMOTE_SMS_RECAP_SENT = "remote_sms_recap_sent"
+    REMOTE_SMS_STATUS = "remote_sms_status"
 
 
 JOURNAL_ACTIONS = (
@@ -171,6 +172,10 @@ JOURNAL_ACTIONS = (
         JournalActionKeywords.REMOTE_SMS_RECAP_SENT,
         "Récapitulatif préalable pour mandat conclu par SMS envoyé",
     ),
+    (
+        JournalActionKeywords.REMOTE_SMS_STATUS,
+        "Statut d'envoi d'un SMS pour un mandat conclu par SMS",
+    ),
 )
 
 
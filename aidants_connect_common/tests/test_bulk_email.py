@@ -0,0 +1,74 @@
+from smtplib import SMTPRecipientsRefused, SMTPServerDisconnected
+from unittest.mock import MagicMock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+
+from aidants_connect_common.utils.bulk_email import build_email, send_emails
+
+
+class FlakyEmailBackend(EmailBackend):
+    """Refuses recipients containing "refused", disconnects on "disconnect" """
+
+    opened_connections = 0
+
+    def open(self):
+        FlakyEmailBackend.opened_connections += 1
+        return True
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any("refused" in recipient for recipient in message.to):
+                raise SMTPRecipientsRefused({message.to[0]: (550, b"Refused")})
+            if any("disconnect" in recipient for recipient in message.to):
+                raise SMTPServerDisconnected("Connection unexpectedly closed")
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND="aidants_connect_common.tests.test_bulk_email.FlakyEmailBackend"
+)
+class SendEmailsTests(TestCase):
+    def setUp(self):
+        FlakyEmailBackend.opened_connections = 0
+
+    def build_emails(self, *recipients):
+        return [
+            (
+                recipient,
+                build_email(
+                    subject="Sujet",
+                    from_email="ac@aidantsconnect.beta.gouv.fr",
+                    recipient_list=[recipient],
+                    text_message="Bonjour",
+                    html_message="<p>Bonjour</p>",
+                ),
+            )
+            for recipient in recipients
+        ]
+
+    def test_messages_are_sent_through_one_connection(self):
+        report = send_emails(self.build_emails("a@ac.fr", "b@ac.fr", "c@ac.fr"))
+
+        self.assertEqual(["a@ac.fr", "b@ac.fr", "c@ac.fr"], report.sent)
+        self.assertEqual({}, report.failed)
+        self.assertEqual(1, FlakyEmailBackend.opened_connections)
+        self.assertEqual(3, len(mail.outbox))
+        self.assertEqual([("<p>Bonjour</p>", "text/html")], mail.outbox[0].alternatives)
+
+    def test_failures_are_reported_and_dont_stop_the_batch(self):
+        logger = MagicMock()
+        report = send_emails(
+            self.build_emails(
+                "a@ac.fr", "refused@ac.fr", "disconnect@ac.fr", "b@ac.fr"
+            ),
+            logger=logger,
+        )
+
+        self.assertEqual(["a@ac.fr", "b@ac.fr"], report.sent)
+        self.assertEqual({"refused@ac.fr", "disconnect@ac.fr"}, set(report.failed))
+        self.assertEqual(2, logger.error.call_count)
+        # The connection is opened again after a disconnection only
+        self.assertEqual(2, FlakyEmailBackend.opened_connections)
+        self.assertEqual(["a@ac.fr", "b@ac.fr"], [m.to[0] for m in mail.outbox])
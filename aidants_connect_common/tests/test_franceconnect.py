@@ -0,0 +1,101 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+import jwt
+
+from aidants_connect_common.tests.third_party_service_mocks.franceconnect import (
+    FakeFranceConnect,
+)
+from aidants_connect_common.utils.franceconnect import FranceConnectClient
+
+
+class FranceConnectClientTests(SimpleTestCase):
+    def setUp(self):
+        self.fake = FakeFranceConnect("client_id", "client_secret").start()
+        self.addCleanup(self.fake.stop)
+        self.fake.user_info = {"sub": "123", "given_name": "Fabrice"}
+        self.client = FranceConnectClient(
+            self.fake.base_url, "client_id", "client_secret"
+        )
+        self.addCleanup(self.client.session.close)
+
+    def login(self, client=None) -> dict:
+        client = client or self.client
+        tokens = client.fetch_token("code", "http://localhost/callback/").json()
+        client.decode(tokens["id_token"])
+        return client.decode(client.fetch_user_info(tokens["access_token"]).text)
+
+    def test_pooled(self):
+        pooled = FranceConnectClient.pooled(self.fake.base_url, "id", "secret")
+        self.assertIs(
+            pooled, FranceConnectClient.pooled(self.fake.base_url, "id", "secret")
+        )
+        self.assertIsNot(
+            pooled, FranceConnectClient.pooled(self.fake.base_url, "id", "other")
+        )
+
+    def test_login_reuses_connection_and_cached_keys(self):
+        self.assertEqual(self.login()["given_name"], "Fabrice")
+        self.assertEqual(self.login()["sub"], "123")
+
+        self.assertEqual(self.fake.connections, 1)
+        self.assertEqual(
+            self.fake.requests,
+            [
+                "/.well-known/openid-configuration",
+                "/token",
+                "/jwks",
+                "/userinfo",
+                "/token",
+                "/userinfo",
+            ],
+        )
+
+    @override_settings(FC_AS_FS_METADATA_MAX_AGE=0)
+    def test_stale_metadata_and_keys_are_refreshed(self):
+        self.login()
+        self.fake.requests.clear()
+        self.client.decode(self.fake.sign({"aud": "client_id"}))
+        self.assertEqual(
+            self.fake.requests, ["/.well-known/openid-configuration", "/jwks"]
+        )
+
+    def test_keys_are_refreshed_on_rotation(self):
+        self.login()
+        self.fake.rotate_key()
+
+        with self.assertRaises(jwt.InvalidKeyError):
+            self.client.decode(self.fake.sign({"aud": "client_id"}))
+        self.assertEqual(self.fake.requests.count("/jwks"), 1)
+
+        with mock.patch.object(FranceConnectClient, "KEYS_REFRESH_MIN_INTERVAL", 0):
+            self.assertEqual(self.login()["given_name"], "Fabrice")
+        self.assertEqual(self.fake.requests.count("/jwks"), 2)
+
+    def test_fallback_key_is_used_without_published_keys(self):
+        jwk = self.fake.jwks()["keys"][0]
+        self.fake.stop()
+        client = FranceConnectClient(
+            self.fake.base_url, "client_id", "client_secret", (jwk["kid"], jwk["n"])
+        )
+
+        self.assertEqual(
+            client.decode(self.fake.sign({"aud": "client_id", "sub": "123"})),
+            {"aud": "client_id", "sub": "123"},
+        )
+
+    def test_default_endpoints_without_metadata(self):
+        fake = FakeFranceConnect("client_id", "client_secret", "HS256").start()
+        self.addCleanup(fake.stop)
+        fake.user_info = {"sub": "123"}
+        client = FranceConnectClient(fake.base_url, "client_id", "client_secret")
+
+        tokens = client.fetch_token("code", "http://localhost/callback/").json()
+        user_info = client.fetch_user_info(tokens["access_token"]).json()
+
+        self.assertEqual(user_info, {"sub": "123"})
+        self.assertEqual(
+            fake.requests,
+            ["/.well-known/openid-configuration", "/token", "/userinfo"],
+        )
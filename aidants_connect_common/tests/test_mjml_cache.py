@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.template import loader
+from django.test import TestCase
+
+from mjml import mjml2html
+
+from aidants_connect_common.utils import mjml_cache
+from aidants_connect_common.utils.mjml_cache import compile_mjml
+
+DOCUMENT = """
+<mjml>
+  <mj-head>
+    <mj-attributes><mj-text padding="0" /></mj-attributes>
+    <mj-title>{title}</mj-title>
+  </mj-head>
+  <mj-body>
+    <mj-section>
+      <mj-column>
+        <mj-text font-weight="bold">
+          <p class='intro'>Bonjour {name},</p>
+          <!-- Salutations -->
+          <br>
+          <a href="{url}" title="{name}">votre espace</a>
+        </mj-text>
+        <mj-button href="https://aidantsconnect.beta.gouv.fr/">{name}</mj-button>
+      </mj-column>
+    </mj-section>
+  </mj-body>
+</mjml>
+"""
+
+
+class CompileMjmlTests(TestCase):
+    def setUp(self):
+        mjml_cache._split_content.cache_clear()
+        mjml_cache._compile_skeleton.cache_clear()
+
+    def test_output_is_identical_to_mjml2html(self):
+        fonts = {"Marianne": "https://aidantsconnect.beta.gouv.fr/email.css"}
+        for name, url in [
+            ("Camille", "https://aidantsconnect.beta.gouv.fr/?a=1&amp;b=2"),
+            ("Ça & là\xa0!", "mailto:camille@example.com"),
+            ("  \n Dominique\t", "https://example.com/é"),
+            ("C:\\Users", "https://example.com/C:\\Users"),
+            ("%%mjml-cache-0%%", "%%mjml-cache%%"),
+        ]:
+            with self.subTest(name=name, url=url):
+                document = DOCUMENT.format(title=name, name=name, url=url)
+                self.assertEqual(
+                    mjml2html(document, fonts=fonts), compile_mjml(document, fonts)
+                )
+
+    def test_output_is_identical_to_mjml2html_without_fonts(self):
+        document = DOCUMENT.format(title="Titre", name="Camille", url="/")
+        with self.subTest(fonts=None):
+            self.assertEqual(mjml2html(document), compile_mjml(document))
+            self.assertEqual(
+                mjml2html(document, fonts=None), compile_mjml(document, None)
+            )
+        with self.subTest(fonts={}):
+            self.assertEqual(mjml2html(document, fonts={}), compile_mjml(document, {}))
+
+    def test_email_templates_are_identical_to_mjml2html(self):
+        document = loader.render_to_string(
+            "email/notify_no_totp_workers.mjml",
+            {
+                "users": [{"full_name": "Camille"}, {"email": "dominique@ac.fr"}],
+                "notify_self": True,
+                "espace_responsable_url": "https://aidantsconnect.beta.gouv.fr/",
+            },
+        )
+        self.assertEqual(mjml2html(document), compile_mjml(document))
+
+    def test_skeleton_is_compiled_once(self):
+        with mock.patch(
+            "aidants_connect_common.utils.mjml_cache.mjml2html", wraps=mjml2html
+        ) as mjml2html_mock:
+            for name in ["Camille", "Dominique", "Sacha"]:
+                compile_mjml(DOCUMENT.format(title="Titre", name=name, url=f"/{name}/"))
+
+            self.assertEqual(1, mjml2html_mock.call_count)
+
+            # A different structure is a different skeleton
+            compile_mjml(DOCUMENT.format(title="Autre titre", name="Sacha", url="/"))
+            self.assertEqual(2, mjml2html_mock.call_count)
+
+    def test_invalid_documents_raise_as_mjml2html(self):
+        with self.assertRaises(ValueError):
+            compile_mjml("<mjml><mj-body><mj-text>Bonjour</mj-body></mjml>")
@@ -0,0 +1,50 @@
+from unittest.mock import MagicMock
+
+from django.test import SimpleTestCase
+
+from aidants_connect_common.utils.render_cache import RenderCache, render_key
+
+
+class RenderKeyTests(SimpleTestCase):
+    def test_key_depends_on_every_input(self):
+        self.assertEqual(render_key("qrcode", "abc"), render_key("qrcode", "abc"))
+        self.assertNotEqual(render_key("qrcode", "abc"), render_key("qrcode", "abd"))
+        self.assertNotEqual(render_key("qrcode", "abc"), render_key("pdf", "abc"))
+        self.assertNotEqual(render_key("a", "bc"), render_key("ab", "c"))
+
+
+class RenderCacheTests(SimpleTestCase):
+    def test_renders_once_per_key(self):
+        cache = RenderCache(max_size=100)
+        render = MagicMock(return_value=b"png")
+
+        self.assertEqual(b"png", cache.get_or_render("key", render))
+        self.assertEqual(b"png", cache.get_or_render("key", render))
+        render.assert_called_once_with()
+
+    def test_evicts_least_recently_used_renders(self):
+        cache = RenderCache(max_size=10)
+        cache.get_or_render("first", lambda: b"1234")
+        cache.get_or_render("second", lambda: b"1234")
+        # Marks "first" as recently used
+        cache.get_or_render("first", lambda: b"")
+        cache.get_or_render("third", lambda: b"1234")
+
+        self.assertIn("first", cache)
+        self.assertNotIn("second", cache)
+        self.assertIn("third", cache)
+
+    def test_doesnt_keep_renders_bigger_than_the_cache(self):
+        cache = RenderCache(max_size=10)
+        cache.get_or_render("small", lambda: b"1234")
+
+        self.assertEqual(b"x" * 11, cache.get_or_render("big", lambda: b"x" * 11))
+        self.assertNotIn("big", cache)
+        self.assertIn("small", cache)
+
+    def test_clear(self):
+        cache = RenderCache(max_size=10)
+        cache.get_or_render("key", lambda: b"1234")
+        cache.clear()
+
+        self.assertEqual(0, len(cache))
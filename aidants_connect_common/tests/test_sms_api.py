@@ -82,6 +82,7 @@ class TestSmsApi(TestCase):
                 "message": "Prolétaires de tous les pays, unissez-vous.",
                 "encoding": "Unicode",
             },
+            timeout=settings.LM_SMS_SERVICE_TIMEOUT,
         )
 
 
@@ -0,0 +1,191 @@
+"""
+Local FranceConnect server, serving the endpoints used by
+`aidants_connect_common.utils.franceconnect.FranceConnectClient` over real HTTP
+connections so that tests exercise the connection pooling of the client.
+"""
+
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from secrets import token_hex, token_urlsafe
+from threading import Thread
+from urllib.parse import parse_qs, urlsplit
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+__all__ = ["FakeFranceConnect"]
+
+
+class FakeFranceConnect:
+    """
+    Issues tokens for any authorization code. The ID token carries `nonce` and
+    the `sub` of `user_info`, which is returned by the userinfo endpoint.
+
+    With `algorithm="RS256"`, like FranceConnect v2, tokens and user info are
+    signed with an RSA key published on the JWKS endpoint. With
+    `algorithm="HS256"`, like FranceConnect v1, the ID token is signed with the
+    client secret, user info is plain JSON and no metadata is published.
+    """
+
+    base_path = "/api/v2"
+
+    def __init__(self, client_id: str, client_secret: str, algorithm="RS256"):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.algorithm = algorithm
+        self.nonce = None
+        self.user_info = {}
+        # Number of TCP connections accepted, and paths requested
+        self.connections = 0
+        self.requests: list[str] = []
+        self._access_tokens = set()
+        self.rotate_key()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _RequestHandler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}{self.base_path}"
+
+    def rotate_key(self):
+        self.kid = token_hex(8)
+        self._private_key = rsa.generate_private_key(
+            public_exponent=65537, key_size=2048
+        )
+
+    def jwks(self) -> dict:
+        public_key = jwt.algorithms.RSAAlgorithm.to_jwk(
+            self._private_key.public_key(), as_dict=True
+        )
+        return {"keys": [{**public_key, "kid": self.kid, "alg": "RS256", "use": "sig"}]}
+
+    def sign(self, claims: dict) -> str:
+        if self.algorithm == "HS256":
+            return jwt.encode(claims, self.client_secret, algorithm="HS256")
+        return jwt.encode(
+            claims, self._private_key, algorithm="RS256", headers={"kid": self.kid}
+        )
+
+    def start(self) -> "FakeFranceConnect":
+        Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def metadata(self) -> dict:
+        return {
+            "issuer": self.base_url,
+            "authorization_endpoint": f"{self.base_url}/authorize",
+            "token_endpoint": f"{self.base_url}/token",
+            "userinfo_endpoint": f"{self.base_url}/userinfo",
+            "jwks_uri": f"{self.base_url}/jwks",
+            "end_session_endpoint": f"{self.base_url}/session/end",
+        }
+
+    def issue_tokens(self, params: dict) -> tuple[int, dict]:
+        if (params.get("client_id"), params.get("client_secret")) != (
+            self.client_id,
+            self.client_secret,
+        ) or not params.get("code"):
+            return 400, {"error": "invalid_grant"}
+
+        access_token = token_urlsafe(16)
+        self._access_tokens.add(access_token)
+        now = int(time.time())
+        id_token = self.sign(
+            {
+                "aud": self.client_id,
+                "iss": self.base_url,
+                "iat": now,
+                "exp": now + 60,
+                "sub": self.user_info.get("sub"),
+                "nonce": self.nonce,
+            }
+        )
+        return 200, {
+            "access_token": access_token,
+            "token_type": "Bearer",
+            "expires_in": 60,
+            "id_token": id_token,
+        }
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    # Keeps connections alive between requests
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def fake(self) -> FakeFranceConnect:
+        return self.server.fake
+
+    def setup(self):
+        super().setup()
+        self.fake.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self._route()
+        if (
+            path == "/.well-known/openid-configuration"
+            and self.fake.algorithm != "HS256"
+        ):
+            self._send_json(200, self.fake.metadata())
+        elif path == "/jwks" and self.fake.algorithm != "HS256":
+            self._send_json(200, self.fake.jwks())
+        elif path == "/userinfo":
+            authorization = self.headers.get("Authorization", "")
+            if authorization.removeprefix("Bearer ") not in self.fake._access_tokens:
+                self._send_json(401, {"error": "invalid_token"})
+            elif self.fake.algorithm == "HS256":
+                self._send_json(200, self.fake.user_info)
+            else:
+                self._send(
+                    200,
+                    "application/jwt",
+                    self.fake.sign(
+                        {
+                            **self.fake.user_info,
+                            "aud": self.fake.client_id,
+                            "iss": self.fake.base_url,
+                        }
+                    ).encode(),
+                )
+        else:
+            self._send_json(404, {"error": "not_found"})
+
+    def do_POST(self):
+        path = self._route()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if path == "/token":
+            params = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+            self._send_json(*self.fake.issue_tokens(params))
+        else:
+            self._send_json(404, {"error": "not_found"})
+
+    def _route(self) -> str:
+        path = urlsplit(self.path).path.removeprefix(self.fake.base_path)
+        self.fake.requests.append(path)
+        return path
+
+    def _send_json(self, status: int, content: dict):
+        self._send(status, "application/json", json.dumps(content).encode())
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -21,7 +21,8 @@ import pgtrigger
 from markdown import markdown
 from markdown.extensions.attr_list import AttrListExtension
 from markdown.extensions.nl2br import Nl2BrExtension
-from mjml import mjml2html
+
+from .mjml_cache import compile_mjml
 
 if TYPE_CHECKING:
     from aidants_connect_habilitation.models import Issuer
@@ -62,7 +63,7 @@ def render_email(
 
     text_context = text_context or mjml_context
     text_email = loader.render_to_string(text_template, text_context)
-    html_email = mjml2html(
+    html_email = compile_mjml(
         loader.render_to_string(mjml_template, mjml_context),
         fonts={"Marianne": build_url(static("css/email.css"))},
     )
@@ -0,0 +1,67 @@
+from dataclasses import dataclass, field
+from logging import Logger, getLogger
+from smtplib import SMTPException, SMTPServerDisconnected
+from typing import Hashable, Iterable
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+
+__all__ = ["BulkEmailReport", "build_email", "send_emails"]
+
+
+@dataclass
+class BulkEmailReport:
+    sent: list[Hashable] = field(default_factory=list)
+    failed: dict[Hashable, str] = field(default_factory=dict)
+
+
+def build_email(
+    subject: str,
+    from_email: str,
+    recipient_list: list[str],
+    text_message: str,
+    html_message: str,
+) -> EmailMultiAlternatives:
+    """Builds the same message as `django.core.mail.send_mail` would send"""
+    message = EmailMultiAlternatives(subject, text_message, from_email, recipient_list)
+    message.attach_alternative(html_message, "text/html")
+    return message
+
+
+def send_emails(
+    messages: Iterable[tuple[Hashable, EmailMultiAlternatives]],
+    *,
+    logger: Logger | None = None,
+) -> BulkEmailReport:
+    """
+    Sends messages through a single connection to the email backend.
+
+    A message that can't be sent doesn't prevent the next ones from being sent.
+
+    :param messages: pairs of a key identifying a message and the message
+    :returns: the keys of the messages sent and the errors of the ones that failed
+    """
+    logger = logger or getLogger()
+    report = BulkEmailReport()
+
+    with get_connection() as connection:
+        for key, message in messages:
+            message.connection = connection
+            try:
+                connection.send_messages([message])
+            except OSError as e:  # Including SMTPException
+                logger.error(f"Could not send email {key!r} to {message.to}: {e}")
+                report.failed[key] = f"{e}"
+                if isinstance(e, SMTPServerDisconnected) or not isinstance(
+                    e, SMTPException
+                ):
+                    # The connection can't be reused
+                    connection.close()
+                    try:
+                        connection.open()
+                    except OSError:
+                        # Next messages will be sent on their own connection
+                        pass
+            else:
+                report.sent.append(key)
+
+    return report
@@ -0,0 +1,175 @@
+"""
+Client of FranceConnect, used when Aidants Connect is a service provider (FC as FS).
+
+A client is shared by the whole process for each FranceConnect instance, so that
+its HTTP connections are kept alive from one login to the next. The discovery
+metadata and the signing keys of FranceConnect are cached for
+`settings.FC_AS_FS_METADATA_MAX_AGE` seconds; the keys are also refreshed when a
+token is signed by an unknown key, as FranceConnect rotates them.
+"""
+
+import logging
+from datetime import timedelta
+from functools import cache
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+
+import jwt
+from requests import RequestException, Response, Session
+
+from . import join_url_parts
+
+__all__ = ["FranceConnectClient"]
+
+logger = logging.getLogger()
+
+
+class FranceConnectClient:
+    # Minimum delay, in seconds, between two refreshes of the signing keys caused
+    # by unknown keys, so that forged tokens can't make us hammer FranceConnect
+    KEYS_REFRESH_MIN_INTERVAL = 60
+
+    def __init__(
+        self,
+        base_url: str,
+        client_id: str,
+        client_secret: str,
+        fallback_key: tuple[str, str] | None = None,
+    ):
+        """
+        :param fallback_key: kid and modulus of the RSA key used when FranceConnect
+            does not publish its signing keys
+        """
+        self.base_url = base_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.session = Session()
+        self.session.headers["Accept"] = "application/json"
+
+        self._fallback_key = (
+            jwt.PyJWK(
+                {
+                    "kty": "RSA",
+                    "use": "sig",
+                    "kid": fallback_key[0],
+                    "alg": "RS256",
+                    "e": "AQAB",
+                    "n": fallback_key[1],
+                }
+            )
+            if fallback_key
+            else None
+        )
+        self._lock = Lock()
+        self._metadata: dict = {}
+        self._metadata_fetched_at: float | None = None
+        self._keys: dict[str | None, jwt.PyJWK] = {}
+        self._keys_fetched_at: float | None = None
+
+    @classmethod
+    @cache
+    def pooled(
+        cls,
+        base_url: str,
+        client_id: str,
+        client_secret: str,
+        fallback_key: tuple[str, str] | None = None,
+    ) -> "FranceConnectClient":
+        """Client shared by the whole process for this FranceConnect instance"""
+        return cls(base_url, client_id, client_secret, fallback_key)
+
+    def endpoint(self, name: str, default_path: str) -> str:
+        """:returns: the URL of the endpoint `name` from the discovery metadata,
+        or `default_path` relative to the base URL if it is not published"""
+        with self._lock:
+            if self._is_stale(self._metadata_fetched_at):
+                self._metadata = self._fetch_metadata()
+                self._metadata_fetched_at = monotonic()
+            metadata = self._metadata
+
+        return metadata.get(name) or join_url_parts(self.base_url, default_path)
+
+    def fetch_token(self, code: str, redirect_uri: str) -> Response:
+        return self.session.post(
+            self.endpoint("token_endpoint", "token"),
+            data={
+                "grant_type": "authorization_code",
+                "redirect_uri": redirect_uri,
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "code": code,
+            },
+            timeout=settings.FC_AS_FS_TIMEOUT,
+        )
+
+    def fetch_user_info(self, access_token: str) -> Response:
+        return self.session.get(
+            self.endpoint("userinfo_endpoint", "userinfo"),
+            params={"schema": "openid"},
+            headers={"Authorization": f"Bearer {access_token}"},
+            timeout=settings.FC_AS_FS_TIMEOUT,
+        )
+
+    def decode(self, token: str) -> dict:
+        """Decodes a JWT signed by FranceConnect with one of its RSA keys"""
+        key = self.signing_key(jwt.get_unverified_header(token).get("kid"))
+        return jwt.decode(
+            token,
+            key.key,
+            audience=self.client_id,
+            algorithms=["RS256"],
+            leeway=timedelta(seconds=30),
+        )
+
+    def signing_key(self, kid: str | None) -> jwt.PyJWK:
+        jwks_url = self.endpoint("jwks_uri", "jwks")
+        with self._lock:
+            if self._is_stale(self._keys_fetched_at) or (
+                kid not in self._keys
+                and monotonic() - self._keys_fetched_at
+                >= self.KEYS_REFRESH_MIN_INTERVAL
+            ):
+                self._keys = self._fetch_keys(jwks_url) or self._keys
+                self._keys_fetched_at = monotonic()
+            keys = self._keys
+
+        if kid in keys:
+            return keys[kid]
+        if kid is None and len(keys) == 1:
+            return next(iter(keys.values()))
+        if self._fallback_key is not None:
+            return self._fallback_key
+        raise jwt.InvalidKeyError(f"FranceConnect has no signing key {kid!r}")
+
+    def _is_stale(self, fetched_at: float | None) -> bool:
+        return (
+            fetched_at is None
+            or monotonic() - fetched_at >= settings.FC_AS_FS_METADATA_MAX_AGE
+        )
+
+    def _fetch_metadata(self) -> dict:
+        url = join_url_parts(self.base_url, ".well-known/openid-configuration")
+        try:
+            response = self.session.get(url, timeout=settings.FC_AS_FS_TIMEOUT)
+            response.raise_for_status()
+            return response.json()
+        except (RequestException, ValueError):
+            # FranceConnect v1 does not publish its metadata: the default
+            # endpoints are used until the next refresh
+            logger.info(f"No FranceConnect discovery metadata at {url}")
+            return {}
+
+    def _fetch_keys(self, url: str) -> dict[str | None, jwt.PyJWK]:
+        try:
+            response = self.session.get(url, timeout=settings.FC_AS_FS_TIMEOUT)
+            response.raise_for_status()
+            keys = jwt.PyJWKSet.from_dict(response.json()).keys
+        except (RequestException, ValueError, jwt.PyJWKSetError):
+            logger.warning(
+                f"Unable to fetch FranceConnect signing keys from {url}", exc_info=True
+            )
+            return {}
+
+        return {key.key_id: key for key in keys if key.public_key_use != "enc"}
@@ -0,0 +1,118 @@
+"""
+MJML compilation through a per-process cache of compiled HTML skeletons.
+
+Emails sent in bulk share their MJML structure and only differ by their texts
+and links. The MJML compiler copies the texts of ``mj-text`` and ``mj-button``
+elements and the attribute values of the HTML they contain as is, so these are
+swapped for placeholders, the resulting skeleton is compiled once and the
+values are put back into the compiled HTML. Attribute values are escaped by the
+compiler when they contain backslashes or non-printable characters, so only the
+plain ASCII ones are replaced. Documents whose skeleton doesn't compile to the
+expected placeholders are compiled directly.
+
+The cache is keyed by the skeleton itself so changing a template invalidates it.
+"""
+
+import re
+from functools import lru_cache
+from itertools import chain, zip_longest
+
+from mjml import mjml2html
+
+__all__ = ["compile_mjml"]
+
+# Opening tag, content up to the closing tag, closing tag
+_VERBATIM_ELEMENT_RE = re.compile(
+    r"""(<(mj-text|mj-button)(?=[\s/>])(?:[^'">]|"[^"]*"|'[^']*')*(?<!/)>)"""
+    r"([^<]*(?:<(?!/\2\s*>)[^<]*)*)(</\2\s*>)"
+)
+# Comments, tags (whose quoted attribute values may contain `>`), text
+_CONTENT_TOKEN_RE = re.compile(
+    r"""<!--.*?-->|<(?:[^'">]|"[^"]*"|'[^']*')*>|[^<]+|<""", re.S
+)
+# Attributes which styles may depend on are left in the skeleton
+_ATTRIBUTE_VALUE_RE = re.compile(
+    r'(\s(?!(?:class|id|style)=)[\w:.-]+=")([\x20-\x5b\x5d-\x7e]+)(")'
+)
+
+_PLACEHOLDER = "%%mjml-cache%%"
+_NUMBERED_PLACEHOLDER_RE = re.compile(r"%%mjml-cache-(\d+)%%")
+
+CONTENT_CACHE_SIZE = 4096
+SKELETON_CACHE_SIZE = 64
+
+
+@lru_cache(maxsize=CONTENT_CACHE_SIZE)
+def _split_content(content: str) -> tuple[str, tuple[str, ...]]:
+    """:returns: the skeleton of an element's content and the values it held"""
+    skeleton, values = [], []
+
+    def replace_attribute_value(match: re.Match) -> str:
+        values.append(match[2])
+        return f"{match[1]}{_PLACEHOLDER}{match[3]}"
+
+    for token in _CONTENT_TOKEN_RE.findall(content):
+        if token.startswith("<!--") or token.startswith("</"):
+            pass
+        elif token.startswith("<"):
+            token = _ATTRIBUTE_VALUE_RE.sub(replace_attribute_value, token)
+        elif not token.isspace():
+            # Whitespace-only texts may be dropped by the compiler
+            values.append(token)
+            token = _PLACEHOLDER
+        skeleton.append(token)
+
+    return "".join(skeleton), tuple(values)
+
+
+def _split(document: str) -> tuple[str, list[str]]:
+    """:returns: the skeleton of the document and the values it was stripped of"""
+    values = []
+
+    def replace_content(match: re.Match) -> str:
+        skeleton, content_values = _split_content(match[3])
+        values.extend(content_values)
+        return f"{match[1]}{skeleton}{match[4]}"
+
+    return _VERBATIM_ELEMENT_RE.sub(replace_content, document), values
+
+
+@lru_cache(maxsize=SKELETON_CACHE_SIZE)
+def _compile_skeleton(skeleton: str, fonts: tuple | None) -> list[str] | None:
+    """:returns: the compiled HTML split around the placeholders"""
+    parts = skeleton.split(_PLACEHOLDER)
+    numbered = "".join(
+        chain.from_iterable(
+            zip_longest(
+                parts,
+                (f"%%mjml-cache-{i}%%" for i in range(len(parts) - 1)),
+                fillvalue="",
+            )
+        )
+    )
+    try:
+        html_parts = _NUMBERED_PLACEHOLDER_RE.split(
+            mjml2html(numbered, fonts=None if fonts is None else dict(fonts))
+        )
+    except ValueError:
+        return None
+
+    # Each value must be copied once and in order
+    expected = [f"{i}" for i in range(len(parts) - 1)]
+    return html_parts[::2] if html_parts[1::2] == expected else None
+
+
+def compile_mjml(document: str, fonts: dict[str, str] | None = None) -> str:
+    """Same as `mjml2html(document, fonts=fonts)`, using the skeleton cache"""
+    if "%%mjml-cache" in document:
+        return mjml2html(document, fonts=fonts)
+
+    skeleton, values = _split(document)
+    # `None` lets the compiler use its default fonts, unlike an empty dict
+    html_parts = _compile_skeleton(
+        skeleton, None if fonts is None else tuple(sorted(fonts.items()))
+    )
+    if html_parts is None:
+        return mjml2html(document, fonts=fonts)
+
+    return "".join(chain.from_iterable(zip_longest(html_parts, values, fillvalue="")))
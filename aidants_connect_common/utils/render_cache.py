@@ -0,0 +1,64 @@
+"""
+Per-process cache of rendered documents, such as QR codes and PDFs.
+
+Renders are addressed by a digest of the inputs that determine their content, so
+an entry never goes stale: changing any input changes the key. The same digest
+can be used as a strong ETag for responses serving the render.
+
+The cache is bounded by the total size of the renders it holds, the least
+recently used ones being evicted first.
+"""
+
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from typing import Callable
+
+__all__ = ["RenderCache", "render_key"]
+
+
+def render_key(*inputs) -> str:
+    """:returns: the digest addressing the render of `inputs`"""
+    return sha256("\x1f".join(f"{item}" for item in inputs).encode()).hexdigest()
+
+
+class RenderCache:
+    def __init__(self, max_size: int):
+        """:param max_size: total size, in bytes, of the renders kept"""
+        self.max_size = max_size
+        self._renders: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._renders
+
+    def __len__(self) -> int:
+        return len(self._renders)
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        """:returns: the render cached under `key`, calling `render` if missing"""
+        with self._lock:
+            if (content := self._renders.get(key)) is not None:
+                self._renders.move_to_end(key)
+                return content
+
+        # Rendered outside the lock: concurrent misses only cost a duplicate render
+        content = render()
+        if len(content) > self.max_size:
+            return content
+
+        with self._lock:
+            if key not in self._renders:
+                self._renders[key] = content
+                self._size += len(content)
+            while self._size > self.max_size:
+                _, evicted = self._renders.popitem(last=False)
+                self._size -= len(evicted)
+
+        return content
+
+    def clear(self):
+        with self._lock:
+            self._renders.clear()
+            self._size = 0
@@ -3,6 +3,7 @@ import json
 import logging
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from functools import cache
 from itertools import starmap
 from pathlib import Path
 
@@ -141,7 +142,7 @@ class SmsApiImpl(SmsApi):
             join_url_parts(self._base_url, settings.LM_SMS_SERVICE_OAUTH2_ENDPOINT),
         )
 
-        self._client = OAuthClient(self._auth_infos)
+        self._client = OAuthClient.pooled(self._auth_infos)
 
     def __str__(self):
         props = [
@@ -165,6 +166,7 @@ class SmsApiImpl(SmsApi):
                 "message": message.strip(),
                 "encoding": "Unicode",
             },
+            timeout=settings.LM_SMS_SERVICE_TIMEOUT,
         )
 
         if not f"{response.status_code}".startswith("20"):
@@ -194,7 +196,7 @@ class SmsApiImpl(SmsApi):
             ) from None
 
 
-@dataclass
+@dataclass(frozen=True)
 class AuthInfos:
     username: str
     password: str
@@ -245,6 +247,13 @@ class OAuthClient(Session):
         self.mount("https://", OAuthMiddleware(auth_infos))
         self.mount("http://", OAuthMiddleware(auth_infos))
 
+    @classmethod
+    @cache
+    def pooled(cls, auth_infos: AuthInfos) -> "OAuthClient":
+        """Client shared by the whole process so that its connections and token
+        are reused from one SMS to the next"""
+        return cls(auth_infos)
+
 
 class OAuthMiddleware(HTTPAdapter):
     _token: None | TokenInfos = None
@@ -321,6 +330,7 @@ class OAuthMiddleware(HTTPAdapter):
                 "username": self._auth_infos.username,
                 "password": self._auth_infos.password,
             },
+            timeout=settings.LM_SMS_SERVICE_TIMEOUT,
         ).json()
 
         self.token = TokenInfos.from_json(response)
@@ -17,19 +17,22 @@ from aidants_connect_web.models import (
     HabilitationRequest,
     Journal,
     Mandat,
+    MandatTransfer,
     MobileAskingUser,
     Organisation,
+    OutgoingEmail,
     ReboardingAidantStatistiques,
+    StatisticsSeries,
     StructureChangeRequest,
     Usager,
 )
 
 from .aidant import AidantAdmin, FirstConnexionManagerInfoAdmin, MobileAskingUserAdmin
 from .aidant_of import AidantOFAdmin
-from .email_stats import AidantEmailStatsAdmin, EmailStatisticsAdmin
+from .email_stats import AidantEmailStatsAdmin, EmailStatisticsAdmin, OutgoingEmailAdmin
 from .habilitation_request import HabilitationRequestAdmin
 from .journal import JournalAdmin
-from .mandat import MandatAdmin
+from .mandat import MandatAdmin, MandatTransferAdmin
 from .notification import NotificationAdmin  # noqa: F401
 from .organisation import OrganisationAdmin, OrganisationOFAdmin
 from .other_models import ConnectionAdmin, TokenAdmin
@@ -39,6 +42,7 @@ from .statistiques import (
     AidantStatistiquesbyDepartmentAdmin,
     AidantStatistiquesbyRegionAdmin,
     ReboardingAidantStatistiquesAdmin,
+    StatisticsSeriesAdmin,
 )
 from .structure_change_request import StructureChangeRequestAdmin
 from .usager import UsagerAdmin
@@ -46,6 +50,7 @@ from .usager import UsagerAdmin
 # Display the following tables in the admin
 admin_site.register(EmailStatistics, EmailStatisticsAdmin)
 admin_site.register(AidantEmailStats, AidantEmailStatsAdmin)
+admin_site.register(OutgoingEmail, OutgoingEmailAdmin)
 
 admin_site.register(Organisation, OrganisationAdmin)
 admin_of_site.register(Organisation, OrganisationOFAdmin)
@@ -56,6 +61,7 @@ admin_site.register(AidantStatistiques, AidantStatistiquesAdmin)
 admin_site.register(AidantStatistiquesbyDepartment, AidantStatistiquesbyDepartmentAdmin)
 admin_site.register(AidantStatistiquesbyRegion, AidantStatistiquesbyRegionAdmin)
 admin_site.register(ReboardingAidantStatistiques, ReboardingAidantStatistiquesAdmin)
+admin_site.register(StatisticsSeries, StatisticsSeriesAdmin)
 
 admin_of_site.register(HabilitationRequest, HabilitationRequestAdmin)
 
@@ -63,6 +69,7 @@ admin_site.register(HabilitationRequest, HabilitationRequestAdmin)
 admin_site.register(StructureChangeRequest, StructureChangeRequestAdmin)
 admin_site.register(Usager, UsagerAdmin)
 admin_site.register(Mandat, MandatAdmin)
+admin_site.register(MandatTransfer, MandatTransferAdmin)
 admin_site.register(Journal, JournalAdmin)
 admin_site.register(Connection, ConnectionAdmin)
 
@@ -39,6 +39,7 @@ from aidants_connect_web.models import (
     HabilitationRequest,
     Journal,
     Organisation,
+    StatisticsChange,
 )
 
 logger = logging.getLogger()
@@ -563,7 +564,12 @@ class AidantAdmin(ImportExportMixin, VisibleToAdminMetier, DjangoUserAdmin):
     generate_attestation.short_description = "Générer l'attestation"
 
     def mass_deactivate(self, request: HttpRequest, queryset: QuerySet):
+        # Listed before the update, which may take aidants out of `queryset`
+        organisations = list(
+            Organisation.objects.filter(current_aidants__in=queryset).distinct()
+        )
         queryset.update(is_active=False)
+        StatisticsChange.record(*organisations)
         self.message_user(request, f"{queryset.count()} profils ont été désactivés")
 
     mass_deactivate.short_description = "Désactiver les profils sélectionnés"
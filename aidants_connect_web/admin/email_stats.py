@@ -1,6 +1,8 @@
 from django.contrib.admin import ModelAdmin
+from django.utils.timezone import now
 
 from aidants_connect.admin import VisibleToAdminMetier
+from aidants_connect_web.constants import OutgoingEmailStatus
 
 
 class EmailStatisticsAdmin(VisibleToAdminMetier, ModelAdmin):
@@ -22,3 +24,39 @@ class AidantEmailStatsAdmin(VisibleToAdminMetier, ModelAdmin):
 
     def get_sending_date_display(self, obj):
         return obj.get_sending_date_display()
+
+
+class OutgoingEmailAdmin(VisibleToAdminMetier, ModelAdmin):
+    list_display = ("created_at", "subject", "recipient", "status", "attempts")
+    list_filter = ("status",)
+    search_fields = ("recipient", "dedup_key")
+    readonly_fields = (
+        "created_at",
+        "dedup_key",
+        "from_email",
+        "recipient",
+        "subject",
+        "text_message",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "sent_at",
+        "last_error",
+    )
+    exclude = ("html_message",)
+    actions = ("retry",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry(self, request, queryset):
+        rows_updated = queryset.exclude(status=OutgoingEmailStatus.SENT).update(
+            status=OutgoingEmailStatus.PENDING, attempts=0, next_attempt_at=now()
+        )
+        self.message_user(
+            request,
+            f"{rows_updated} emails seront renvoyés lors du prochain passage "
+            "de la tâche d'envoi.",
+        )
+
+    retry.short_description = "Renvoyer les emails sélectionnés"
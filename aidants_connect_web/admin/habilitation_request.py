@@ -33,6 +33,7 @@ from aidants_connect_web.models import (
     EmailStatistics,
     HabilitationRequest,
     Organisation,
+    StatisticsChange,
 )
 
 logger = logging.getLogger()
@@ -424,6 +425,10 @@ class HabilitationRequestAdmin(ImportExportMixin, VisibleToAdminMetier, ModelAdm
         )
 
     def mark_refused(self, request, queryset):
+        # Listed before the update, which may take requests out of `queryset`
+        organisations = list(
+            Organisation.objects.filter(habilitation_requests__in=queryset).distinct()
+        )
         rows_updated = queryset.filter(
             status__in=(
                 ReferentRequestStatuses.STATUS_PROCESSING,
@@ -431,6 +436,7 @@ class HabilitationRequestAdmin(ImportExportMixin, VisibleToAdminMetier, ModelAdm
                 ReferentRequestStatuses.STATUS_NEW,
             )
         ).update(status=ReferentRequestStatuses.STATUS_REFUSED)
+        StatisticsChange.record(*organisations)
         for habilitation_request in queryset:
             self.send_refusal_email(habilitation_request)
         self.message_user(request, f"{rows_updated} demandes ont été refusées.")
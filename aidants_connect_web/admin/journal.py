@@ -1,11 +1,15 @@
 import logging
+import re
 
 from django.contrib.admin import ModelAdmin
+from django.db.models import Q
 
 from aidants_connect.admin import VisibleToTechAdmin
 
 logger = logging.getLogger()
 
+METADATA_SEARCH_RE = re.compile(r"^\s*(?P<key>[a-z_]+)\s*=\s*(?P<value>.+?)\s*$")
+
 
 class JournalAdmin(VisibleToTechAdmin, ModelAdmin):
     list_display = (
@@ -26,7 +30,11 @@ class JournalAdmin(VisibleToTechAdmin, ModelAdmin):
         "usager__family_name",
         "usager__given_name",
         "usager__email",
-        "additional_information",
+    )
+    search_help_text = (
+        "Recherche sur l'action, l'aidant ou l'usager. "
+        "Utilisez « clé=valeur » pour rechercher dans les métadonnées "
+        "(ex. : aidant_id=42, serial_number=ABC123)."
     )
     ordering = ("-creation_date",)
 
@@ -35,3 +43,13 @@ class JournalAdmin(VisibleToTechAdmin, ModelAdmin):
 
     def has_delete_permission(self, request, obj=None):
         return False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Metadata searches use the GIN index on `metadata` instead of a text scan
+        if match := METADATA_SEARCH_RE.match(search_term):
+            key, value = match["key"], match["value"]
+            query = Q(metadata__contains={key: value})
+            if value.isdigit():
+                query |= Q(metadata__contains={key: int(value)})
+            return queryset.filter(query), False
+        return super().get_search_results(request, queryset, search_term)
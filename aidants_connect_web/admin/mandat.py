@@ -4,12 +4,17 @@ from collections.abc import Collection
 from django.contrib import messages
 from django.contrib.admin import ModelAdmin, TabularInline
 from django.http import HttpResponseNotAllowed, HttpResponseRedirect
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404, render
 from django.urls import path, reverse
 
 from aidants_connect.admin import VisibleToTechAdmin
 from aidants_connect_common.admin import DepartmentFilter, RegionFilter
-from aidants_connect_web.models import Autorisation, Mandat, Organisation
+from aidants_connect_web.models import (
+    Autorisation,
+    Mandat,
+    MandatTransfer,
+    Organisation,
+)
 
 logger = logging.getLogger()
 
@@ -41,6 +46,7 @@ class MandatAdmin(VisibleToTechAdmin, ModelAdmin):
         "is_remote",
     )
     list_filter = (MandatRegionFilter, MandatDepartmentFilter)
+    list_select_related = ("usager", "organisation")
     search_fields = ("usager__given_name", "usager__family_name", "organisation__name")
 
     fields = (
@@ -60,6 +66,9 @@ class MandatAdmin(VisibleToTechAdmin, ModelAdmin):
 
     actions = ("move_to_another_organisation",)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate_revocation()
+
     def move_to_another_organisation(self, _, queryset):
         ids = ",".join(
             str(pk) for pk in queryset.order_by("pk").values_list("pk", flat=True)
@@ -79,6 +88,11 @@ class MandatAdmin(VisibleToTechAdmin, ModelAdmin):
                 self.admin_site.admin_view(self.mandate_transfer),
                 name="aidants_connect_web_mandat_transfer",
             ),
+            path(
+                "transfer/<int:transfer_id>/",
+                self.admin_site.admin_view(self.mandate_transfer_progress),
+                name="aidants_connect_web_mandat_transfer_progress",
+            ),
             *super().get_urls(),
         ]
 
@@ -116,7 +130,7 @@ class MandatAdmin(VisibleToTechAdmin, ModelAdmin):
             )
 
         include_fields = ["organisation"]
-        mandates = Mandat.objects.filter(pk__in=ids.split(","))
+        mandates = Mandat.objects.select_related("usager").filter(pk__in=ids.split(","))
         context = {
             **self.admin_site.each_context(request),
             "media": self.media,
@@ -136,18 +150,9 @@ class MandatAdmin(VisibleToTechAdmin, ModelAdmin):
         try:
             ids = request.POST["ids"].split(",")
             organisation = Organisation.objects.get(pk=request.POST["organisation"])
-            failure, failed_ids = Mandat.transfer_to_organisation(organisation, ids)
-
-            mandates = Mandat.objects.filter(pk__in=failed_ids)
-            if failure:
-                context = {
-                    **self.admin_site.each_context(request),
-                    "media": self.media,
-                    "mandates": mandates,
-                    "mandates_count": mandates.count(),
-                }
-
-                return render(request, "admin/transfert_error.html", context)
+            transfer = MandatTransfer.objects.create(
+                aidant=request.user, organisation=organisation, mandat_ids=ids
+            )
         except Organisation.DoesNotExist:
             self.message_user(
                 request,
@@ -172,6 +177,83 @@ class MandatAdmin(VisibleToTechAdmin, ModelAdmin):
                 messages.ERROR,
             )
 
+            return HttpResponseRedirect(
+                reverse("otpadmin:aidants_connect_web_mandat_changelist")
+            )
+
+        return HttpResponseRedirect(
+            reverse(
+                "otpadmin:aidants_connect_web_mandat_transfer_progress",
+                kwargs={"transfer_id": transfer.pk},
+            )
+        )
+
+    def mandate_transfer_progress(self, request, transfer_id):
+        transfer = get_object_or_404(
+            MandatTransfer.objects.select_related("organisation"), pk=transfer_id
+        )
+
+        if transfer.is_error:
+            self.message_user(
+                request,
+                "Les mandats n'ont pas pu être tansférés à cause d'une erreur.",
+                messages.ERROR,
+            )
+        elif transfer.is_done and transfer.failed_ids:
+            mandates = (
+                Mandat.objects.select_related("usager")
+                .filter(pk__in=transfer.failed_ids)
+                .order_by("pk")
+            )
+            context = {
+                **self.admin_site.each_context(request),
+                "media": self.media,
+                "organisation": transfer.organisation,
+                "mandates": mandates,
+                "mandates_count": mandates.count(),
+            }
+
+            return render(request, "admin/transfert_error.html", context)
+        elif transfer.is_done:
+            self.message_user(
+                request,
+                f"Les {len(transfer.mandat_ids)} mandats ont été transférés vers "
+                f"l'organisation {transfer.organisation}.",
+                messages.SUCCESS,
+            )
+        else:
+            context = {
+                **self.admin_site.each_context(request),
+                "media": self.media,
+                "transfer": transfer,
+                "mandates_count": len(transfer.mandat_ids),
+            }
+
+            return render(request, "admin/transfert_progress.html", context)
+
         return HttpResponseRedirect(
             reverse("otpadmin:aidants_connect_web_mandat_changelist")
         )
+
+
+class MandatTransferAdmin(VisibleToTechAdmin, ModelAdmin):
+    list_display = ("created_at", "organisation", "aidant", "state", "progress")
+    list_filter = ("state",)
+    list_select_related = ("organisation", "aidant")
+    raw_id_fields = ("organisation", "aidant")
+    fields = readonly_fields = (
+        "created_at",
+        "aidant",
+        "organisation",
+        "state",
+        "progress",
+        "failed_ids",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def progress(self, obj: MandatTransfer):
+        return f"{obj.processed_count} / {len(obj.mandat_ids)}"
+
+    progress.short_description = "Mandats traités"
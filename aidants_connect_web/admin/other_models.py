@@ -5,12 +5,10 @@ from django.contrib import admin
 from django.contrib import messages as django_messages
 from django.contrib.admin import ModelAdmin, register
 from django.db.models import QuerySet
-from django.http import Http404, HttpResponse
+from django.http import FileResponse, Http404
 from django.urls import path, reverse
 from django.utils.safestring import mark_safe
 
-from celery.result import AsyncResult
-from celery.states import FAILURE, SUCCESS
 from rest_framework.authtoken.admin import TokenAdmin
 
 from aidants_connect.admin import VisibleToAdminMetier, admin_site
@@ -61,23 +59,15 @@ class ExportRequestAdmin(VisibleToAdminMetier, ModelAdmin):
     def file_link(self, obj: ExportRequest):
         if obj.is_ongoing:
             return "L'export est en cours…"
-        if not obj.file_path.exists() and AsyncResult(str(obj.task_uuid)).state not in [
-            SUCCESS,
-            FAILURE,
-        ]:
+        if obj.is_error:
+            return "Une erreur s'est produite"
+        if not obj.file or not obj.file.storage.exists(obj.file.name):
             return "Le fichier n'existe plus"
         route = reverse(
             "otpadmin:aidants_connect_web_export_request_download",
             kwargs={"request_id": obj.pk},
         )
-        if obj.is_error:
-            return mark_safe(
-                f"""<a href="{route}">Une erreur s'est produite (voir)</a>"""
-            )
-        elif obj.is_done:
-            return mark_safe(f"""<a href="{route}">Télécharger lʼexport</a>""")
-        else:
-            return "Lʼexport est en cours"
+        return mark_safe(f"""<a href="{route}">Télécharger lʼexport</a>""")
 
     file_link.short_description = "Lien du fichier"
 
@@ -123,34 +113,19 @@ class ExportRequestAdmin(VisibleToAdminMetier, ModelAdmin):
         except ExportRequest.DoesNotExist:
             raise Http404
 
-        if export_request.is_ongoing:
+        file = export_request.file
+        if not export_request.is_done or not file or not file.storage.exists(file.name):
             raise Http404
 
-        if export_request.file_path.exists():
-            with open(export_request.file_path, "rb") as csv:
-                return HttpResponse(
-                    csv,
-                    content_type="text/csv",
-                    headers={
-                        "Content-Disposition": f'attachment; filename="{export_request.file_path.name}"'  # noqa: E501
-                    },
-                )
-
-        result = AsyncResult(str(export_request.task_uuid))
-        if result.state in [SUCCESS, FAILURE]:
-            with open(export_request.file_path, "w") as f:
-                result = str(result.get())
-                f.write(result)
-
-                return HttpResponse(
-                    result.encode(),
-                    content_type="text/csv",
-                    headers={
-                        "Content-Disposition": f'attachment; filename="{export_request.file_path.name}"'  # noqa: E501
-                    },
-                )
-        else:
-            raise Http404
+        # The file is sent as is and decompressed by the browser
+        response = FileResponse(
+            file.open("rb"),
+            as_attachment=True,
+            filename=export_request.filename.removesuffix(".gz"),
+            content_type="text/csv",
+        )
+        response.headers["Content-Encoding"] = "gzip"
+        return response
 
 
 @register(CoReferentNonAidantRequest, site=admin_site)
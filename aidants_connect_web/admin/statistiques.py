@@ -10,6 +10,7 @@ logger = logging.getLogger()
 class AidantStatistiquesAdmin(VisibleToAdminMetier, ModelAdmin):
     list_display = (
         "created_at",
+        "is_reconciliation",
         "number_aidants",
         "number_aidants_is_active",
         "number_responsable",
@@ -70,3 +71,10 @@ class ReboardingAidantStatistiquesAdmin(VisibleToAdminMetier, ModelAdmin):
 
     readonly_fields = ("aidant",)
     list_filter = ("reboarding_session_date",)
+
+
+class StatisticsSeriesAdmin(VisibleToAdminMetier, ModelAdmin):
+    list_display = ("date", "granularity", "departement", "family", "values")
+    list_filter = ("granularity", "family", "departement")
+    date_hierarchy = "date"
+    readonly_fields = ("departement", "family", "granularity", "date", "values")
@@ -0,0 +1,44 @@
+import csv
+import json
+from io import StringIO
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def _as_rows(data) -> list:
+    # Errors are rendered as a single row
+    return data if isinstance(data, list) else [data]
+
+
+class NDJSONRenderer(BaseRenderer):
+    """One JSON document per line"""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return "".join(
+            f"{json.dumps(row, cls=JSONEncoder, ensure_ascii=False)}\n"
+            for row in _as_rows(data)
+        ).encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """One line per item, with the keys of the first one as header"""
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = _as_rows(data)
+        if not rows:
+            return b""
+
+        output = StringIO()
+        writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        return output.getvalue().encode(self.charset)
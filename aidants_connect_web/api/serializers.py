@@ -99,7 +99,18 @@ class FNEAidantSerializer(serializers.HyperlinkedModelSerializer):
         view_name="fne_aidants-detail", lookup_field="id"
     )
     is_aidant = serializers.SerializerMethodField(method_name="get_is_aidant")
-    is_manager = serializers.SerializerMethodField(method_name="get_is_manager")
+    is_manager = serializers.BooleanField(read_only=True)
+
+    # Annotated by FNEAidantViewSet
+    get_supports_number = serializers.SerializerMethodField(
+        method_name="get_supports_total"
+    )
+    get_supports_number_for_current_month = serializers.SerializerMethodField(
+        method_name="get_supports_current_month"
+    )
+    get_supports_number_last_six_months = serializers.SerializerMethodField(
+        method_name="get_supports_per_month"
+    )
 
     created_at = serializers.ModelField(
         model_field=_organisation_meta.get_field("created_at")
@@ -114,8 +125,17 @@ class FNEAidantSerializer(serializers.HyperlinkedModelSerializer):
     def get_is_aidant(self, obj):
         return obj.can_create_mandats
 
-    def get_is_manager(self, obj):
-        return obj.responsable_de.all().count() > 0
+    def get_supports_total(self, obj):
+        return (obj.supports_numbers or {}).get("total", 0)
+
+    def get_supports_current_month(self, obj):
+        return (obj.supports_numbers or {}).get("current_month", 0)
+
+    def get_supports_per_month(self, obj):
+        numbers = obj.supports_numbers or {}
+        # Months without supports are skipped, the following ones shift left
+        counts = [numbers[f"month_{i}"] for i in range(6) if numbers.get(f"month_{i}")]
+        return {i: counts[i] if i < len(counts) else 0 for i in range(6)}
 
     class Meta:
         model = Aidant
@@ -1,10 +1,26 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, Max, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce, JSONObject
 from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.functional import cached_property
+from django.utils.http import http_date, quote_etag
+from django.utils.timezone import localtime, now
 from django.views.generic import FormView
 
+from dateutil.relativedelta import relativedelta
 from django_filters import FilterSet
 from django_filters import rest_framework as filters
 from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
 
+from aidants_connect_common.constants import JournalActionKeywords
+from aidants_connect_web.api.renderers import CSVRenderer, NDJSONRenderer
 from aidants_connect_web.api.serializers import (
     FNEAidantSerializer,
     FNEOrganisationSerializer,
@@ -12,7 +28,7 @@ from aidants_connect_web.api.serializers import (
 )
 from aidants_connect_web.decorators import responsable_logged_required
 from aidants_connect_web.forms import NewHabilitationRequestForm
-from aidants_connect_web.models import Aidant, Organisation
+from aidants_connect_web.models import Aidant, Journal, Mandat, Organisation
 from aidants_connect_web.presenters import HabilitationRequestItemPresenter
 
 
@@ -39,19 +55,177 @@ class OrganisationFilter(FilterSet):
         }
 
 
+class FNECursorPagination(CursorPagination):
+    """
+    Pages ordered by modification date: a row modified during a sync is moved to
+    the last page, so it can't be missed. The next sync can start from the last
+    modification date seen, with the `updated_at__gte` filter.
+    """
+
+    ordering = ("updated_at", "pk")
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+SUPPORT_ACTIONS = [
+    JournalActionKeywords.FRANCECONNECT_USAGER,
+    JournalActionKeywords.CREATE_ATTESTATION,
+    JournalActionKeywords.CREATE_AUTORISATION,
+    JournalActionKeywords.USE_AUTORISATION,
+    JournalActionKeywords.INIT_RENEW_MANDAT,
+]
+
+
+def fne_organisations_queryset():
+    num_mandats = (
+        Mandat.objects.filter(organisation=OuterRef("pk"))
+        .order_by()
+        .values("organisation")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return Organisation.objects.annotate(
+        num_mandats=Coalesce(Subquery(num_mandats), 0)
+    ).prefetch_related("responsables")
+
+
+def supports_numbers_subquery():
+    """
+    Counts the supports of each aidant as `Aidant.get_supports_number`,
+    `Aidant.get_supports_number_for_current_month` and
+    `Aidant.get_supports_number_last_six_months` do, in a single subquery
+    returning `{"total": …, "current_month": …, "month_0": …, …, "month_5": …}`
+    """
+    six_months_ago = now() - relativedelta(months=5)
+    first_month = localtime(six_months_ago).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+    months = [first_month + relativedelta(months=i) for i in range(6)]
+
+    per_month = {
+        f"month_{i}": Count(
+            "pk",
+            filter=Q(creation_date__gte=max(start, six_months_ago))
+            & (Q(creation_date__lt=months[i + 1]) if i < 5 else Q()),
+        )
+        for i, start in enumerate(months)
+    }
+    return (
+        Journal.objects.filter(aidant=OuterRef("pk"), action__in=SUPPORT_ACTIONS)
+        .order_by()
+        .values("aidant")
+        .annotate(
+            numbers=JSONObject(
+                total=Count("pk"),
+                current_month=Count(
+                    "pk",
+                    filter=Q(
+                        creation_date__gte=localtime().replace(
+                            day=1, hour=0, minute=0, second=0, microsecond=0
+                        )
+                    ),
+                ),
+                **per_month,
+            )
+        )
+        .values("numbers")
+    )
+
+
 class OrganisationViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Public list of the active organisations.
+
+    Lists are served from a snapshot of the serialized organisations, cached until
+    the number of organisations or their last `updated_at`, which every write
+    bumps, change. They carry `ETag` and `Last-Modified` headers derived from the
+    same values so that clients polling the list only get a 304 when nothing
+    changed. The `export` action serves the whole snapshot at once as NDJSON or CSV.
+    """
+
     lookup_field = "uuid"
     lookup_url_kwarg = "uuid"
     queryset = Organisation.objects.filter(is_active=True).order_by("pk").all()
     serializer_class = OrganisationSerializer
 
+    @cached_property
+    def changes(self) -> dict:
+        """Number of organisations and date of the last change"""
+        return self.get_queryset().aggregate(
+            count=Count("pk"), last_modified=Max("updated_at")
+        )
+
+    def get_snapshot(self) -> list[dict]:
+        """Serialized organisations, cached until one of them changes"""
+        last_modified = self.changes["last_modified"]
+        key = ":".join(
+            [
+                "api_organisations_snapshot",
+                f"{self.changes['count']}",
+                f"{last_modified.timestamp() if last_modified else ''}",
+                # Serialized URLs are absolute
+                self.request.build_absolute_uri("/"),
+            ]
+        )
+        snapshot = cache.get(key)
+        if snapshot is None:
+            data = self.get_serializer(self.get_queryset(), many=True).data
+            snapshot = [dict(item) for item in data]
+            cache.set(key, snapshot, settings.API_ORGANISATIONS_SNAPSHOT_TIMEOUT)
+        return snapshot
+
+    def get_conditional_response(self, request, response=None):
+        """
+        :returns: a 304 response if the client's copy is up to date, `response`
+            with validators set otherwise
+        """
+        # Representations differ per renderer
+        etag = quote_etag(
+            md5(
+                f"{self.changes['count']}:{self.changes['last_modified']}:"
+                f"{request.accepted_renderer.format}".encode()
+            ).hexdigest()
+        )
+        last_modified = self.changes["last_modified"]
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+        if response is not None:
+            response.headers["ETag"] = etag
+            if last_modified is not None:
+                response.headers["Last-Modified"] = http_date(last_modified)
+        return get_conditional_response(
+            request, etag=etag, last_modified=last_modified, response=response
+        )
+
+    def list(self, request, *args, **kwargs):
+        if (not_modified := self.get_conditional_response(request)) is not None:
+            return not_modified
+
+        page = self.paginate_queryset(self.get_snapshot())
+        return self.get_conditional_response(request, self.get_paginated_response(page))
+
+    @action(
+        detail=False,
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+        pagination_class=None,
+    )
+    def export(self, request, *args, **kwargs):
+        if (not_modified := self.get_conditional_response(request)) is not None:
+            return not_modified
+
+        response = Response(self.get_snapshot())
+        response.headers["Content-Disposition"] = (
+            f'attachment; filename="organisations.{request.accepted_renderer.format}"'
+        )
+        return self.get_conditional_response(request, response)
+
 
 class FNEOrganisationViewSet(viewsets.ReadOnlyModelViewSet):
     lookup_field = "uuid"
     lookup_url_kwarg = "uuid"
     permission_classes = [permissions.IsAuthenticated]
-    queryset = Organisation.objects.all().order_by("pk")
+    queryset = fne_organisations_queryset()
     serializer_class = FNEOrganisationSerializer
+    pagination_class = FNECursorPagination
 
     filter_backends = [filters.DjangoFilterBackend]
     filterset_class = OrganisationFilter
@@ -63,12 +237,28 @@ class FNEAidantViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     queryset = Aidant.objects.filter(
         is_staff=False, is_superuser=False, can_create_mandats=True
-    ).order_by("pk")
+    )
     serializer_class = FNEAidantSerializer
+    pagination_class = FNECursorPagination
 
     filter_backends = [filters.DjangoFilterBackend]
     filterset_class = AidantFilter
 
+    def get_queryset(self):
+        return (
+            super()
+            .get_queryset()
+            .annotate(
+                is_manager=Exists(
+                    Aidant.responsable_de.through.objects.filter(aidant=OuterRef("pk"))
+                ),
+                supports_numbers=Subquery(supports_numbers_subquery()),
+            )
+            .prefetch_related(
+                Prefetch("organisation", queryset=fne_organisations_queryset())
+            )
+        )
+
 
 @responsable_logged_required
 class NewHabilitationRequestSubmitNew(FormView):
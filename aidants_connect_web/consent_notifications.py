@@ -0,0 +1,112 @@
+"""
+Redis pub/sub channel through which the SMS callback wakes up the waiting rooms
+of the aidants expecting a response to a remote consent request.
+
+Redis is only used as a signal: the consent itself is always read from the
+journal. When Redis is unavailable, waiting rooms fall back to plain polling.
+"""
+
+import logging
+from contextlib import contextmanager
+from threading import Lock
+from time import monotonic
+from typing import Iterator, Optional
+
+from django.conf import settings
+
+from redis import Redis
+from redis.client import PubSub
+from redis.exceptions import RedisError
+
+logger = logging.getLogger()
+
+_redis_client: Optional[Redis] = None
+
+# Number of requests of this process currently held by a long poll
+_long_polls = 0
+_long_polls_lock = Lock()
+
+
+def _get_redis_client() -> Redis:
+    global _redis_client
+    if _redis_client is None:
+        # Timeouts make an unreachable Redis raise, and waiting rooms fall back to
+        # polling, instead of hanging the request
+        _redis_client = Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=settings.CONSENT_NOTIFICATIONS_REDIS_TIMEOUT,
+            socket_timeout=settings.CONSENT_NOTIFICATIONS_REDIS_TIMEOUT,
+        )
+    return _redis_client
+
+
+def _channel(consent_request_id: str) -> str:
+    return f"{__name__}:{consent_request_id}"
+
+
+def notify_sms_response(consent_request_id: str):
+    """Wakes up the waiting rooms of a consent request; must not fail"""
+    try:
+        _get_redis_client().publish(_channel(consent_request_id), "1")
+    except RedisError:
+        logger.warning(
+            "Could not notify waiting rooms of the response to consent request "
+            f"{consent_request_id!r}"
+        )
+
+
+class Subscription:
+    def __init__(self, pubsub: PubSub):
+        self._pubsub = pubsub
+
+    def wait(self, timeout: float) -> bool:
+        """:returns: True if notified before the timeout, False otherwise"""
+        deadline = monotonic() + timeout
+        while (remaining := deadline - monotonic()) > 0:
+            message = self._pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=remaining
+            )
+            if message is not None:
+                return True
+        return False
+
+
+@contextmanager
+def long_poll_slot() -> Iterator[bool]:
+    """
+    Reserves one of the `settings.WAITING_ROOM_MAX_LONG_POLLS` requests of this
+    process that may be held at once, so that long polls can't take all the
+    threads of the web server.
+
+    :returns: False if no request may be held, in which case the waiting room
+        must poll instead
+    """
+    global _long_polls
+    with _long_polls_lock:
+        reserved = _long_polls < settings.WAITING_ROOM_MAX_LONG_POLLS
+        if reserved:
+            _long_polls += 1
+    try:
+        yield reserved
+    finally:
+        if reserved:
+            with _long_polls_lock:
+                _long_polls -= 1
+
+
+@contextmanager
+def subscribe_to_sms_response(consent_request_id: str) -> Iterator[Subscription]:
+    """
+    Subscribes to the notifications of a consent request.
+
+    Subscribe before checking the journal so a response arriving in between is
+    not missed.
+
+    :raises RedisError: if Redis is unavailable
+    """
+    pubsub = _get_redis_client().pubsub()
+    try:
+        pubsub.subscribe(_channel(consent_request_id))
+        yield Subscription(pubsub)
+    finally:
+        pubsub.close()
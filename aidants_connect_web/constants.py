@@ -95,6 +95,19 @@ class StructureChangeRequestStatuses(TextChoices):
         return (StructureChangeRequestStatuses.STATUS_NEW,)
 
 
+class SmsStatus(TextChoices):
+    SENT = ("sent", "Transmis au fournisseur")
+    FAILED = ("failed", "Échec de l'envoi")
+    DELIVERED = ("delivered", "Remis au destinataire")
+    UNDELIVERED = ("undelivered", "Non remis au destinataire")
+
+
+class OutgoingEmailStatus(TextChoices):
+    PENDING = ("pending", "En attente d'envoi")
+    SENT = ("sent", "Envoyé")
+    FAILED = ("failed", "Échec de l'envoi")
+
+
 class HabilitationRequestCourseType(IntegerChoices):
     CLASSIC = (auto(), "Formation classique")
     P2P = (auto(), "Formation entre pairs")
@@ -0,0 +1,25 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from aidants_connect_web.tasks import backfill_journal_metadata
+
+logger = logging.getLogger()
+
+
+class Command(BaseCommand):
+    help = "Fills the metadata of journal entries created before it was recorded"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--after",
+            type=int,
+            default=0,
+            help="Only process entries whose id is greater than this one",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        backfill_journal_metadata(
+            after=options["after"], batch_size=options["batch_size"], logger=logger
+        )
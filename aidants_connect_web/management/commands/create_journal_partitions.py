@@ -0,0 +1,14 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from aidants_connect_web.tasks import create_journal_partitions
+
+logger = logging.getLogger()
+
+
+class Command(BaseCommand):
+    help = "Creates the upcoming monthly partitions of the journal table"
+
+    def handle(self, *args, **options):
+        create_journal_partitions(logger=logger)
@@ -0,0 +1,15 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from aidants_connect_web.models import MandatTemplate
+
+logger = logging.getLogger()
+
+
+class Command(BaseCommand):
+    help = "Records the hash of every mandate template, to find them from attestations"
+
+    def handle(self, *args, **options):
+        templates = MandatTemplate.index_templates()
+        logger.info(f"Indexed {len(templates)} mandate templates")
@@ -0,0 +1,288 @@
+# Converts the journal into a table partitioned by month on `creation_date`.
+#
+# The existing table is kept as-is and attached as the partition holding the whole
+# history up to the first day of next month. Every index and the partition
+# constraint are built beforehand, concurrently, so that the only step holding an
+# exclusive lock is a metadata-only swap. New entries then land in monthly
+# partitions created ahead of time by `aidants_connect_web_journal_ensure_partition`
+# (see `Journal.ensure_partitions` and the `create_journal_partitions` task).
+
+from django.conf import settings
+from django.db import migrations, models
+
+TABLE = "aidants_connect_web_journal"
+LEGACY_TABLE = "aidants_connect_web_journal_legacy"
+CUTOFF_CONSTRAINT = "aidants_connect_web_journal_legacy_cutoff"
+
+# Indexes that match the access patterns of `JournalQuerySet`. They are created
+# concurrently on the existing table then attached to the partitioned table's
+# indexes of the same definition.
+CREATE_INDEXES_CONCURRENTLY = [
+    f"""CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {TABLE}_id_creation_date_uniq
+        ON {TABLE} (id, creation_date);""",
+    f"""CREATE INDEX CONCURRENTLY IF NOT EXISTS journal_action_aidant_date_idx
+        ON {TABLE} (action, aidant_id, creation_date);""",
+    f"""CREATE INDEX CONCURRENTLY IF NOT EXISTS journal_phone_consent_idx
+        ON {TABLE} (user_phone, consent_request_id);""",
+    f"""CREATE INDEX CONCURRENTLY IF NOT EXISTS journal_attestation_hash_idx
+        ON {TABLE} (attestation_hash);""",
+]
+
+DROP_INDEXES = [
+    f"DROP INDEX CONCURRENTLY IF EXISTS {TABLE}_id_creation_date_uniq;",
+    "DROP INDEX CONCURRENTLY IF EXISTS journal_action_aidant_date_idx;",
+    "DROP INDEX CONCURRENTLY IF EXISTS journal_phone_consent_idx;",
+    "DROP INDEX CONCURRENTLY IF EXISTS journal_attestation_hash_idx;",
+]
+
+# Adding the constraint as NOT VALID is instantaneous and VALIDATE CONSTRAINT only
+# takes a SHARE UPDATE EXCLUSIVE lock: writes are not blocked during the scan.
+# Having it validated allows ATTACH PARTITION to skip its own scan under an
+# ACCESS EXCLUSIVE lock.
+ADD_CUTOFF_CONSTRAINT = f"""
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = '{TABLE}'::regclass AND conname = '{CUTOFF_CONSTRAINT}'
+    ) THEN
+        EXECUTE format(
+            'ALTER TABLE {TABLE} ADD CONSTRAINT {CUTOFF_CONSTRAINT} '
+            'CHECK (creation_date < %L) NOT VALID',
+            date_trunc('month', now()) + interval '1 month'
+        );
+    END IF;
+END
+$$;
+"""
+
+VALIDATE_CUTOFF_CONSTRAINT = (
+    f"ALTER TABLE {TABLE} VALIDATE CONSTRAINT {CUTOFF_CONSTRAINT};"
+)
+
+DROP_CUTOFF_CONSTRAINT = (
+    f"ALTER TABLE {TABLE} DROP CONSTRAINT IF EXISTS {CUTOFF_CONSTRAINT};"
+)
+
+SWAP_TABLES = f"""
+DO $$
+DECLARE
+    cutoff timestamptz;
+    max_id bigint;
+    seq text;
+    item record;
+BEGIN
+    LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE;
+
+    SELECT (regexp_match(pg_get_constraintdef(oid), '''([^'']+)'''))[1]::timestamptz
+    INTO cutoff
+    FROM pg_constraint
+    WHERE conrelid = '{TABLE}'::regclass AND conname = '{CUTOFF_CONSTRAINT}';
+
+    SELECT coalesce(max(id), 0) INTO max_id FROM {TABLE};
+
+    ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE};
+    -- The primary key has to include the partition key: the unique index on
+    -- (id, creation_date) replaces it and will be attached to the partitioned
+    -- table's primary key
+    ALTER TABLE {LEGACY_TABLE} DROP CONSTRAINT {TABLE}_pkey;
+    ALTER TABLE {LEGACY_TABLE} ADD CONSTRAINT {LEGACY_TABLE}_pkey
+        PRIMARY KEY USING INDEX {TABLE}_id_creation_date_uniq;
+
+    -- The id sequence moves to the partitioned table
+    IF EXISTS (
+        SELECT 1 FROM pg_attribute
+        WHERE attrelid = '{LEGACY_TABLE}'::regclass
+        AND attname = 'id'
+        AND attidentity <> ''
+    ) THEN
+        ALTER TABLE {LEGACY_TABLE} ALTER COLUMN id DROP IDENTITY;
+    ELSE
+        seq := pg_get_serial_sequence('{LEGACY_TABLE}', 'id');
+        ALTER TABLE {LEGACY_TABLE} ALTER COLUMN id DROP DEFAULT;
+        IF seq IS NOT NULL THEN
+            EXECUTE format('DROP SEQUENCE %s', seq);
+        END IF;
+    END IF;
+
+    CREATE TABLE {TABLE} (
+        LIKE {LEGACY_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE
+    ) PARTITION BY RANGE (creation_date);
+    ALTER TABLE {TABLE} DROP CONSTRAINT {CUTOFF_CONSTRAINT};
+
+    CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id;
+    PERFORM setval('{TABLE}_id_seq', max_id + 1, false);
+    ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq');
+
+    -- The partition key has to be part of the primary key
+    ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, creation_date);
+
+    -- Indexes keep their names on the partitioned table. The legacy table's indexes
+    -- are renamed and attached in place by ATTACH PARTITION: nothing is rebuilt.
+    FOR item IN
+        SELECT c.relname AS name, pg_get_indexdef(i.indexrelid) AS definition
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = '{LEGACY_TABLE}'::regclass AND NOT i.indisunique
+    LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', item.name, 'l_' || item.name);
+        EXECUTE regexp_replace(
+            item.definition, ' ON \\S+ USING ', ' ON {TABLE} USING '
+        );
+    END LOOP;
+
+    FOR item IN
+        SELECT conname AS name, pg_get_constraintdef(oid) AS definition
+        FROM pg_constraint
+        WHERE conrelid = '{LEGACY_TABLE}'::regclass AND contype = 'f'
+    LOOP
+        EXECUTE format(
+            'ALTER TABLE {TABLE} ADD CONSTRAINT %I %s', item.name, item.definition
+        );
+    END LOOP;
+
+    EXECUTE format(
+        'ALTER TABLE {TABLE} ATTACH PARTITION {LEGACY_TABLE} '
+        'FOR VALUES FROM (MINVALUE) TO (%L)',
+        cutoff
+    );
+    ALTER TABLE {LEGACY_TABLE} DROP CONSTRAINT {CUTOFF_CONSTRAINT};
+END
+$$;
+"""
+
+UNSWAP_TABLES = f"""
+DO $$
+DECLARE
+    max_id bigint;
+    item record;
+BEGIN
+    LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE;
+
+    ALTER TABLE {TABLE} DETACH PARTITION {LEGACY_TABLE};
+    INSERT INTO {LEGACY_TABLE} SELECT * FROM {TABLE};
+    SELECT coalesce(max(id), 0) INTO max_id FROM {LEGACY_TABLE};
+
+    ALTER SEQUENCE {TABLE}_id_seq OWNED BY {LEGACY_TABLE}.id;
+    ALTER TABLE {LEGACY_TABLE} ALTER COLUMN id
+        SET DEFAULT nextval('{TABLE}_id_seq');
+    PERFORM setval('{TABLE}_id_seq', max_id + 1, false);
+
+    DROP TABLE {TABLE} CASCADE;
+
+    ALTER TABLE {LEGACY_TABLE} RENAME TO {TABLE};
+    ALTER TABLE {TABLE} DROP CONSTRAINT {LEGACY_TABLE}_pkey;
+    ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id);
+
+    FOR item IN
+        SELECT c.relname AS name
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = '{TABLE}'::regclass AND c.relname LIKE 'l\\_%'
+    LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', item.name, substr(item.name, 3));
+    END LOOP;
+END
+$$;
+"""
+
+# Creates the monthly partition containing `month`. Rows that were already stored
+# in the default partition for this range are moved into the new partition.
+# Returns NULL if the range is already covered by another partition.
+CREATE_PARTITION_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION {TABLE}_ensure_partition(month timestamptz)
+RETURNS text AS $$
+DECLARE
+    start_date timestamptz := date_trunc('month', month);
+    end_date timestamptz := date_trunc('month', month) + interval '1 month';
+    partition_name text := '{TABLE}_' || to_char(date_trunc('month', month), 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    BEGIN
+        EXECUTE format(
+            'CREATE TABLE %I (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+            partition_name
+        );
+        EXECUTE format(
+            'WITH moved AS ('
+            '    DELETE FROM {TABLE}_default '
+            '    WHERE creation_date >= %L AND creation_date < %L RETURNING *'
+            ') INSERT INTO %I SELECT * FROM moved',
+            start_date, end_date, partition_name
+        );
+        EXECUTE format(
+            'ALTER TABLE {TABLE} ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name, start_date, end_date
+        );
+    EXCEPTION WHEN invalid_object_definition THEN
+        -- This range overlaps an existing partition
+        RETURN NULL;
+    END;
+
+    RETURN partition_name;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+# Same partitions as `Journal.ensure_partitions`, which the `create_journal_partitions`
+# task then runs periodically to keep them ahead
+CREATE_PARTITIONS = [
+    f"CREATE TABLE IF NOT EXISTS {TABLE}_default PARTITION OF {TABLE} DEFAULT;",
+    (
+        f"""SELECT {TABLE}_ensure_partition(
+                date_trunc('month', now()) + make_interval(months => i)
+            )
+            FROM generate_series(0, %s) AS i;""",
+        [settings.JOURNAL_PARTITIONS_MONTHS_AHEAD],
+    ),
+]
+
+DROP_PARTITION_FUNCTION = (
+    f"DROP FUNCTION IF EXISTS {TABLE}_ensure_partition(timestamptz);"
+)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("aidants_connect_web", "0095_alter_organisation_city_and_more"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(CREATE_INDEXES_CONCURRENTLY, DROP_INDEXES),
+                migrations.RunSQL(ADD_CUTOFF_CONSTRAINT, DROP_CUTOFF_CONSTRAINT),
+                migrations.RunSQL(VALIDATE_CUTOFF_CONSTRAINT, migrations.RunSQL.noop),
+                migrations.RunSQL(SWAP_TABLES, UNSWAP_TABLES),
+                migrations.RunSQL(CREATE_PARTITION_FUNCTION, DROP_PARTITION_FUNCTION),
+                migrations.RunSQL(CREATE_PARTITIONS, migrations.RunSQL.noop),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="journal",
+                    index=models.Index(
+                        fields=["action", "aidant", "creation_date"],
+                        name="journal_action_aidant_date_idx",
+                    ),
+                ),
+                migrations.AddIndex(
+                    model_name="journal",
+                    index=models.Index(
+                        fields=["user_phone", "consent_request_id"],
+                        name="journal_phone_consent_idx",
+                    ),
+                ),
+                migrations.AddIndex(
+                    model_name="journal",
+                    index=models.Index(
+                        fields=["attestation_hash"], name="journal_attestation_hash_idx"
+                    ),
+                ),
+            ],
+        ),
+    ]
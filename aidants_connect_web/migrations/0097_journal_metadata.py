@@ -0,0 +1,67 @@
+# Adds the structured `metadata` column to the journal and its GIN index.
+#
+# Adding a column with a constant default doesn't rewrite the table. The index
+# can't be built concurrently on a partitioned table, so it is created on the
+# parent table only then built concurrently on each partition and attached.
+# Existing entries are filled afterwards by the `backfill_journal_metadata` task.
+
+from django.contrib.postgres.indexes import GinIndex
+from django.db import migrations, models
+
+TABLE = "aidants_connect_web_journal"
+INDEX = "journal_metadata_gin_idx"
+
+
+def create_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {INDEX} "
+            f"ON ONLY {TABLE} USING gin (metadata jsonb_path_ops);"
+        )
+        cursor.execute(
+            "SELECT inhrelid::regclass::text FROM pg_inherits "
+            "WHERE inhparent = %s::regclass;",
+            [TABLE],
+        )
+        for (partition,) in cursor.fetchall():
+            cursor.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_metadata_idx "
+                f"ON {partition} USING gin (metadata jsonb_path_ops);"
+            )
+            cursor.execute(
+                f"ALTER INDEX {INDEX} ATTACH PARTITION {partition}_metadata_idx;"
+            )
+
+
+def drop_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP INDEX IF EXISTS {INDEX};")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("aidants_connect_web", "0096_journal_partitioning"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="journal",
+            name="metadata",
+            field=models.JSONField(blank=True, default=dict, verbose_name="Métadonnées"),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(create_index, drop_index)],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="journal",
+                    index=GinIndex(
+                        fields=["metadata"],
+                        name="journal_metadata_gin_idx",
+                        opclasses=["jsonb_path_ops"],
+                    ),
+                ),
+            ],
+        ),
+    ]
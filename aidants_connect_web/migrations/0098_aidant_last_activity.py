@@ -0,0 +1,68 @@
+# Adds the denormalised dates of the last action and last activity of aidants and
+# fills them from the journal, in batches of aidants committed one at a time so
+# that an interrupted migration can be resumed and doesn't hold long locks.
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+# Same as JournalActionKeywords.activity_tracking_actions
+ACTIVITY_TRACKING_ACTIONS = [
+    "create_attestation",
+    "use_autorisation",
+    "init_renew_mandat",
+]
+
+BACKFILL_BATCH = """
+UPDATE aidants_connect_web_aidant AS aidant SET
+    last_action_at = (
+        SELECT max(creation_date) FROM aidants_connect_web_journal
+        WHERE aidant_id = aidant.id
+    ),
+    last_activity_at = (
+        SELECT max(creation_date) FROM aidants_connect_web_journal
+        WHERE aidant_id = aidant.id AND action = ANY(%s)
+    )
+WHERE aidant.id > %s AND aidant.id <= %s AND aidant.last_action_at IS NULL;
+"""
+
+
+def backfill_last_activity(apps, schema_editor):
+    Aidant = apps.get_model("aidants_connect_web", "Aidant")
+    max_id = Aidant.objects.aggregate(max_id=models.Max("pk"))["max_id"] or 0
+    with schema_editor.connection.cursor() as cursor:
+        for start in range(0, max_id, BATCH_SIZE):
+            cursor.execute(
+                BACKFILL_BATCH,
+                [ACTIVITY_TRACKING_ACTIONS, start, start + BATCH_SIZE],
+            )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("aidants_connect_web", "0097_journal_metadata"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="aidant",
+            name="last_action_at",
+            field=models.DateTimeField(
+                default=None,
+                null=True,
+                verbose_name="Date de la dernière action journalisée",
+            ),
+        ),
+        migrations.AddField(
+            model_name="aidant",
+            name="last_activity_at",
+            field=models.DateTimeField(
+                default=None,
+                null=True,
+                verbose_name="Date de la dernière utilisation du service",
+            ),
+        ),
+        migrations.RunPython(backfill_last_activity, migrations.RunPython.noop),
+    ]
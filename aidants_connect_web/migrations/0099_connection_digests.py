@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aidants_connect_web', '0098_aidant_last_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='connection',
+            name='access_token_digest',
+            field=models.CharField(default=None, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='connection',
+            name='code_digest',
+            field=models.CharField(default=None, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:39
+
+from django.db import migrations, models
+
+import aidants_connect_web.models.other_models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aidants_connect_web', '0099_connection_digests'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportrequest',
+            name='filename',
+            field=models.CharField(default=aidants_connect_web.models.other_models._filepath_generator, max_length=50),
+        ),
+    ]
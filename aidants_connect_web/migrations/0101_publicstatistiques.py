@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aidants_connect_web', '0100_exportrequest_compressed_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PublicStatistiques',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('number_demarches', models.PositiveIntegerField(default=0, verbose_name='Démarches administratives réalisées')),
+                ('number_usagers_helped', models.PositiveIntegerField(default=0, verbose_name='Personnes accompagnées')),
+                ('number_mandats', models.PositiveIntegerField(default=0, verbose_name='Mandats créés')),
+                ('number_accredited_aidants', models.PositiveIntegerField(default=0, verbose_name='Aidants habilités')),
+                ('number_future_aidants', models.PositiveIntegerField(default=0, verbose_name='Aidants en cours d’habilitation')),
+                ('number_accredited_organisations', models.PositiveIntegerField(default=0, verbose_name='Structures habilitées')),
+                ('number_future_organisations', models.PositiveIntegerField(default=0, verbose_name='Structures en cours d’habilitation')),
+                ('demarches', models.JSONField(default=list, verbose_name='Démarches réalisées')),
+            ],
+            options={
+                'verbose_name': 'Statistiques publiques',
+                'verbose_name_plural': 'Statistiques publiques',
+                'get_latest_by': 'created_at',
+            },
+        ),
+    ]
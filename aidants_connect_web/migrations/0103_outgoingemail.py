@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:57
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aidants_connect_web', '0102_journal_sms_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutgoingEmail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('dedup_key', models.CharField(blank=True, default=None, max_length=255, null=True, unique=True, verbose_name='Clé de dédoublonnage')),
+                ('from_email', models.CharField(max_length=255, verbose_name='Expéditeur')),
+                ('recipient', models.CharField(max_length=255, verbose_name='Destinataire')),
+                ('subject', models.CharField(max_length=255, verbose_name='Objet')),
+                ('text_message', models.TextField(verbose_name='Message texte')),
+                ('html_message', models.TextField(verbose_name='Message HTML')),
+                ('status', models.CharField(choices=[('pending', "En attente d'envoi"), ('sent', 'Envoyé'), ('failed', "Échec de l'envoi")], default='pending', max_length=20, verbose_name='État')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Nombre de tentatives')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Prochaine tentative')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name="Date d'envoi")),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Dernière erreur')),
+            ],
+            options={
+                'verbose_name': 'Email transactionnel',
+                'verbose_name_plural': 'Emails transactionnels',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='aidants_con_status_a6389e_idx'), models.Index(fields=['recipient', 'sent_at'], name='aidants_con_recipie_5fdc5a_idx')],
+            },
+        ),
+    ]
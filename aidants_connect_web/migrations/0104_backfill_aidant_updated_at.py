@@ -0,0 +1,22 @@
+# Aidants created before `Aidant.updated_at` was added have no modification date,
+# which the FNE API paginates on: they get their account creation date.
+
+from django.db import migrations
+from django.db.models import F
+
+
+def backfill_updated_at(apps, _):
+    Aidant = apps.get_model("aidants_connect_web", "Aidant")
+    Aidant.objects.filter(updated_at__isnull=True).update(
+        updated_at=F("date_joined")
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("aidants_connect_web", "0103_outgoingemail"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:38
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aidants_connect_web', '0104_backfill_aidant_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MandatTransfer',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('mandat_ids', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None, verbose_name='Mandats')),
+                ('processed_count', models.PositiveIntegerField(default=0, verbose_name='Mandats traités')),
+                ('failed_ids', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None, verbose_name='Mandats non transférés')),
+                ('state', models.IntegerField(choices=[(1, 'En cours'), (2, 'Fini'), (3, 'Erreur')], default=1, verbose_name='État')),
+                ('aidant', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Lancé par')),
+                ('organisation', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='mandat_transfers', to='aidants_connect_web.organisation', verbose_name='Organisation de destination')),
+            ],
+            options={
+                'verbose_name': 'Transfert de mandats',
+                'verbose_name_plural': 'Transferts de mandats',
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aidants_connect_web', '0105_mandattransfer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MandatTemplate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True, verbose_name='Chemin du template')),
+                ('sha256', models.CharField(max_length=64, verbose_name='Empreinte SHA-256')),
+                ('indexed_at', models.DateTimeField(auto_now=True, verbose_name="Date d'indexation")),
+            ],
+            options={
+                'verbose_name': 'Template de mandat',
+                'verbose_name_plural': 'Templates de mandat',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aidants_connect_web', '0106_mandattemplate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatisticsChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department_insee_code', models.CharField(max_length=5, unique=True, verbose_name='Code INSEE du département')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date du dernier changement')),
+            ],
+            options={
+                'verbose_name': 'Changement des statistiques',
+                'verbose_name_plural': 'Changements des statistiques',
+            },
+        ),
+        migrations.AddField(
+            model_name='aidantstatistiques',
+            name='is_reconciliation',
+            field=models.BooleanField(default=True, help_text='Les autres calculs ne mettent à jour que les départements modifiés', verbose_name='Calcul complet'),
+        ),
+    ]
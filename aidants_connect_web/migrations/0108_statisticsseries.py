@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aidants_connect_common', '0027_fundingconum_alter_formationattendant_state_and_more'),
+        ('aidants_connect_web', '0107_statisticschange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatisticsSeries',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('family', models.CharField(choices=[('aidants', 'Aidants'), ('organisations', 'Structures'), ('usage', 'Utilisation')], max_length=16, verbose_name='Famille')),
+                ('granularity', models.CharField(choices=[('day', 'Jour'), ('month', 'Mois')], max_length=8, verbose_name='Granularité')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('values', models.JSONField(default=dict, verbose_name='Valeurs')),
+                ('departement', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='aidants_connect_common.department', verbose_name='Département')),
+            ],
+            options={
+                'verbose_name': 'Historique des statistiques',
+                'verbose_name_plural': 'Historiques des statistiques',
+                'indexes': [models.Index(fields=['granularity', 'date'], name='aidants_con_granula_ec0a4c_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='statisticsseries',
+            constraint=models.UniqueConstraint(fields=('departement', 'family', 'granularity', 'date'), name='unique_statistics_series_point'),
+        ),
+    ]
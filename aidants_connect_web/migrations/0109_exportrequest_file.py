@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aidants_connect_web', '0108_statisticsseries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportrequest',
+            name='file',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to='exports', verbose_name='Fichier'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aidants_connect_web', '0109_exportrequest_file'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='statisticschange',
+            name='department_insee_code',
+            field=models.CharField(db_index=True, max_length=5, verbose_name='Code INSEE du département'),
+        ),
+        migrations.AlterField(
+            model_name='statisticschange',
+            name='changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date du changement'),
+        ),
+    ]
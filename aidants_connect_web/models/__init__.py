@@ -15,6 +15,7 @@ from .mandat import (
     CarteTOTP,
     Connection,
     Mandat,
+    MandatTemplate,
     default_connection_expiration_date,
 )
 from .notification import Notification, NotificationType
@@ -24,13 +25,19 @@ from .other_models import (
     ExportRequest,
     HabilitationRequest,
     LogEmailSending,
+    MandatTransfer,
     StructureChangeRequest,
 )
+from .outgoing_email import OutgoingEmail, OutgoingEmailQuerySet
 from .stats import (
     AidantStatistiques,
     AidantStatistiquesbyDepartment,
     AidantStatistiquesbyRegion,
+    PublicStatistiques,
     ReboardingAidantStatistiques,
+    StatisticsChange,
+    StatisticsSeries,
+    StatisticsSeriesQuerySet,
 )
 from .usager import Usager, UsagerQuerySet
 from .utils import delete_mandats_and_clean_journal
@@ -61,9 +68,17 @@ __all__ = [
     NotificationType,
     Organisation,
     OrganisationType,
+    OutgoingEmail,
+    OutgoingEmailQuerySet,
     Mandat,
+    MandatTemplate,
+    MandatTransfer,
     MobileAskingUser,
+    PublicStatistiques,
     ReboardingAidantStatistiques,
+    StatisticsChange,
+    StatisticsSeries,
+    StatisticsSeriesQuerySet,
     Usager,
     UsagerQuerySet,
     default_connection_expiration_date,
@@ -7,9 +7,9 @@ from typing import Collection, Optional
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser, UserManager
-from django.core.files import File
+from django.core.files.base import ContentFile
 from django.db import models
-from django.db.models import Count, Q
+from django.db.models import Count, OuterRef, Q, Subquery
 from django.db.models.functions import TruncMonth
 from django.utils import timezone
 from django.utils.functional import cached_property
@@ -17,14 +17,12 @@ from django.utils.text import slugify
 from django.utils.timezone import now
 
 from dateutil.relativedelta import relativedelta
-from pypdf import PdfReader, PdfWriter
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 
 from aidants_connect_common.constants import JournalActionKeywords
 
 from ..constants import OTP_APP_DEVICE_NAME
+from ..utilities import render_formation_attestation
+from .journal import Journal
 from .mandat import Autorisation, Mandat
 from .organisation import Organisation
 from .usager import Usager
@@ -60,8 +58,24 @@ class AidantManager(UserManager):
         return Q(
             is_active=True,
             referent_non_aidant=False,
-            journal_entries__action__in=JournalActionKeywords.activity_tracking_actions,
-            journal_entries__creation_date__lte=now() - timedelta(days=90),
+            last_activity_at__lte=now() - timedelta(days=90),
+        )
+
+    def refresh_last_activity(self, aidants_ids: Collection[int] | None = None):
+        """Recomputes `last_action_at` and `last_activity_at` from the journal"""
+        entries = (
+            Journal.objects.filter(aidant=OuterRef("pk"))
+            .order_by("-creation_date")
+            .values("creation_date")
+        )
+        aidants = self.all() if aidants_ids is None else self.filter(pk__in=aidants_ids)
+        return aidants.update(
+            last_action_at=Subquery(entries[:1]),
+            last_activity_at=Subquery(
+                entries.filter(
+                    action__in=JournalActionKeywords.activity_tracking_actions
+                )[:1]
+            ),
         )
 
     def __normalize_fields(self, extra_fields: dict):
@@ -171,6 +185,14 @@ class Aidant(AbstractUser):
         null=True,
         default=None,
     )
+    # Both are maintained when journal entries are created
+    # (see `Journal.update_aidants_activity`)
+    last_action_at = models.DateTimeField(
+        "Date de la dernière action journalisée", null=True, default=None
+    )
+    last_activity_at = models.DateTimeField(
+        "Date de la dernière utilisation du service", null=True, default=None
+    )
 
     created_by_fne = models.BooleanField("Création FNE", default=False)
     id_fne = models.CharField(
@@ -251,38 +273,10 @@ class Aidant(AbstractUser):
         )
         str_name = f"{self.first_name.lower().title()} {self.last_name.upper()}".strip()
         str_file_name = slugify(str_name)
-        pdfmetrics.registerFont(
-            TTFont("mariannethin", "attestation/Marianne-ThinItalic.ttf")
-        )
-        pdfmetrics.registerFont(TTFont("spectralblod", "attestation/Spectral-Bold.ttf"))
-        overlay_name = f"attestation/{str_file_name}_{self.id}.pdf"
-        output_name = (
-            f"attestation/CertificatHabilitationAidantsConnect_{str_file_name}.pdf"
+        self.attestation.save(
+            f"CertificatHabilitationAidantsConnect_{str_file_name}.pdf",
+            ContentFile(render_formation_attestation(str_name, str_formation_date)),
         )
-        c = canvas.Canvas(overlay_name)
-        c.setFont("spectralblod", 40)
-        x_name = settings.ATTESTATION_X_NAME
-        y_name = settings.ATTESTATION_Y_NAME
-        c.drawString(x_name, y_name, str_name)
-        c.setFont("mariannethin", 10)
-        x_date = settings.ATTESTATION_X_DATE
-        y_date = settings.ATTESTATION_Y_DATE
-        c.drawString(x_date, y_date, str_formation_date)
-        c.save()
-        reader = PdfReader(settings.ATTESTATION_TEMPLATE_NAME)
-        overlay = PdfReader(overlay_name)
-        writer = PdfWriter()
-        for i, page in enumerate(reader.pages):
-            if i < len(overlay.pages):
-                page.merge_page(overlay.pages[i])
-            writer.add_page(page)
-        with open(output_name, "wb") as f:
-            writer.write(f)
-
-        with open(output_name, "rb") as f:
-            self.attestation.save(
-                f"CertificatHabilitationAidantsConnect_{str_file_name}.pdf", File(f)
-            )
 
     def deactivate(self):
         self.is_active = False
@@ -435,10 +429,7 @@ class Aidant(AbstractUser):
         """
         :return: the timestamp of this aidant's last logged action or `None`.
         """
-        try:
-            return self.journal_entries.last().creation_date
-        except AttributeError:
-            return None
+        return self.last_action_at
 
     def get_journal_create_attestation(self, access_token):
         """
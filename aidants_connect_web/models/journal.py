@@ -1,13 +1,19 @@
 from __future__ import annotations
 
 import logging
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import timedelta
 from typing import TYPE_CHECKING, Collection, Iterable, Optional
 
 from django.conf import settings
-from django.db import IntegrityError, models
+from django.contrib.postgres.indexes import GinIndex
+from django.db import IntegrityError, connection, models, transaction
 from django.db.models import Q, QuerySet
+from django.utils import timezone
 
+from dateutil.relativedelta import relativedelta
 from phonenumber_field.modelfields import PhoneNumberField
 from phonenumbers import PhoneNumber, PhoneNumberFormat, format_number
 
@@ -16,7 +22,7 @@ from aidants_connect_common.constants import (
     AuthorizationDurations,
     JournalActionKeywords,
 )
-from aidants_connect_web.constants import RemoteConsentMethodChoices
+from aidants_connect_web.constants import RemoteConsentMethodChoices, SmsStatus
 
 if TYPE_CHECKING:
     from .aidant import Aidant
@@ -26,6 +32,82 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger()
 
+# Entries logged within `Journal.buffered()`, waiting to be written
+_buffered_entries: ContextVar[list[Journal] | None] = ContextVar(
+    "buffered_journal_entries", default=None
+)
+
+# Text appended to `additional_information` when the related usager, organisation
+# or mandate is deleted (see `delete_mandats_and_clean_journal`)
+_CLEANUP_SUFFIX_RE = re.compile(
+    r"Add(?:ed)? by clean_journal_entries_and_delete_mandats"
+)
+_CARD_INFO_RE = re.compile(
+    r"^aidant\.id = (?P<aidant_id>\d+), sn = (?P<serial_number>.*?)"
+    r"(?:, reason = (?P<reason>.*))?$",
+    re.DOTALL,
+)
+_TRANSFER_INFO_RE = re.compile(
+    r"^previous_organisation = (?P<previous_organisation_id>\d+), "
+    r"previous_hash = (?P<previous_hash>.*)$",
+    re.DOTALL,
+)
+_SWITCH_ORGANISATION_INFO_RE = re.compile(
+    r"\(#(?P<previous_organisation_id>\d+)\) -new organisation : .*"
+    r"\(#(?P<new_organisation_id>\d+)\)$",
+    re.DOTALL,
+)
+_TOTP_IMPORT_INFO_RE = re.compile(r"^(?P<added>\d+) ajouts - (?P<updated>\d+) modif")
+
+
+def _parse_card_info(info: str) -> dict | None:
+    if (match := _CARD_INFO_RE.match(info)) is None:
+        return None
+    result = {
+        "aidant_id": int(match["aidant_id"]),
+        "serial_number": match["serial_number"],
+    }
+    if match["reason"] is not None:
+        result["reason"] = match["reason"]
+    return result
+
+
+def _parse_transfer_info(info: str) -> dict | None:
+    if (match := _TRANSFER_INFO_RE.match(info)) is None:
+        return None
+    previous_hash = match["previous_hash"]
+    return {
+        "previous_organisation_id": int(match["previous_organisation_id"]),
+        "previous_hash": None if previous_hash == "None" else previous_hash,
+    }
+
+
+def _parse_switch_organisation_info(info: str) -> dict | None:
+    if (match := _SWITCH_ORGANISATION_INFO_RE.search(info)) is None:
+        return None
+    return {
+        "previous_organisation_id": int(match["previous_organisation_id"]),
+        "new_organisation_id": int(match["new_organisation_id"]),
+    }
+
+
+def _parse_totp_import_info(info: str) -> dict | None:
+    if (match := _TOTP_IMPORT_INFO_RE.match(info)) is None:
+        return None
+    return {"added": int(match["added"]), "updated": int(match["updated"])}
+
+
+# Converts the `additional_information` of entries created before `Journal.metadata`
+# existed to the metadata that would be recorded today
+LEGACY_METADATA_PARSERS = {
+    JournalActionKeywords.CARD_ASSOCIATION: _parse_card_info,
+    JournalActionKeywords.CARD_VALIDATION: _parse_card_info,
+    JournalActionKeywords.CARD_DISSOCIATION: _parse_card_info,
+    JournalActionKeywords.TRANSFER_MANDAT: _parse_transfer_info,
+    JournalActionKeywords.SWITCH_ORGANISATION: _parse_switch_organisation_info,
+    JournalActionKeywords.IMPORT_TOTP_CARDS: _parse_totp_import_info,
+}
+
 
 class JournalQuerySet(models.QuerySet):
     def excluding_staff(self):
@@ -118,10 +200,15 @@ class JournalQuerySet(models.QuerySet):
 
     def find_card_association_logs_for_user(self, user: Aidant):
         return self.filter(
-            additional_information__contains=f"aidant.id = {user.id}",
+            metadata__contains={"aidant_id": user.id},
             action=JournalActionKeywords.CARD_ASSOCIATION,
         )
 
+    def without_metadata(self):
+        """Entries written before `Journal.metadata` existed whose additional
+        information can be converted to metadata"""
+        return self.filter(action__in=LEGACY_METADATA_PARSERS.keys(), metadata={})
+
 
 class Journal(models.Model):
     INFO_REMOTE_MANDAT = "Mandat conclu à distance pendant l'état d'urgence sanitaire (23 mars 2020)"  # noqa
@@ -151,6 +238,8 @@ class Journal(models.Model):
     autorisation = models.IntegerField(blank=True, null=True)
     attestation_hash = models.CharField(max_length=100, blank=True, null=True)
     additional_information = models.TextField(blank=True, null=True)
+    # Structured counterpart of `additional_information`, queried with `__contains`
+    metadata = models.JSONField("Métadonnées", default=dict, blank=True)
 
     is_remote_mandat = models.BooleanField(default=False)
     user_phone = PhoneNumberField(blank=True)
@@ -180,6 +269,25 @@ class Journal(models.Model):
     class Meta:
         verbose_name = "entrée de journal"
         verbose_name_plural = "entrées de journal"
+        # The table is partitioned by month on `creation_date` (see migration 0096)
+        indexes = [
+            models.Index(
+                fields=["action", "aidant", "creation_date"],
+                name="journal_action_aidant_date_idx",
+            ),
+            models.Index(
+                fields=["user_phone", "consent_request_id"],
+                name="journal_phone_consent_idx",
+            ),
+            models.Index(
+                fields=["attestation_hash"], name="journal_attestation_hash_idx"
+            ),
+            GinIndex(
+                fields=["metadata"],
+                name="journal_metadata_gin_idx",
+                opclasses=["jsonb_path_ops"],
+            ),
+        ]
         constraints = [
             # All infos are set when creating a journal for remote mandate by SMS
             models.CheckConstraint(
@@ -216,9 +324,143 @@ class Journal(models.Model):
     def delete(self, *args, **kwargs):
         raise NotImplementedError("Deleting is not allowed on journal entries")
 
+    @classmethod
+    @contextmanager
+    def buffered(cls):
+        """Defers the writing of the entries logged within this block to a single
+        `bulk_create` when it exits, along with the update of the aidants' activity
+        and of the departments whose statistics changed.
+        Entries are discarded if the block raises.
+
+        Nested blocks are merged with the outermost one.
+        """
+        if _buffered_entries.get() is not None:
+            yield
+            return
+
+        token = _buffered_entries.set([])
+        try:
+            yield
+            entries = _buffered_entries.get()
+        finally:
+            _buffered_entries.reset(token)
+
+        from .stats import StatisticsChange
+
+        with transaction.atomic():
+            cls.objects.bulk_create(entries)
+            cls.update_aidants_activity(entries)
+            StatisticsChange.record_journal_entries(entries)
+
+    @classmethod
+    def _log(cls, **kwargs) -> Journal:
+        if (entries := _buffered_entries.get()) is None:
+            return cls.objects.create(**kwargs)
+
+        entry = cls(**kwargs)
+        entries.append(entry)
+        return entry
+
+    @classmethod
+    def update_aidants_activity(cls, entries: Iterable[Journal]):
+        """Records the date of the last action of the aidants who created `entries`.
+        When one of them is an activity, also records the date of their last activity
+        and resets their activity tracking warning.
+
+        Dates are only written when they are older than
+        `settings.ACTIVITY_TRACKING_GRANULARITY`."""
+        from .aidant import Aidant
+
+        aidants: dict[int, Aidant | None] = {}
+        updates: dict[int, dict] = {}
+        for entry in entries:
+            if entry.aidant_id is None:
+                continue
+            if cls.aidant.is_cached(entry):
+                aidants[entry.aidant_id] = entry.aidant
+            fields = updates.setdefault(entry.aidant_id, {})
+            fields["last_action_at"] = entry.creation_date
+            if entry.action in JournalActionKeywords.activity_tracking_actions:
+                fields["last_activity_at"] = entry.creation_date
+                fields["activity_tracking_warning_at"] = None
+
+        # Aidants whose dates are up to date within the granularity are left
+        # untouched, so that most entries don't write the aidant's row
+        granularity = settings.ACTIVITY_TRACKING_GRANULARITY
+        for aidant_id, fields in updates.items():
+            outdated = Q(last_action_at__isnull=True) | Q(
+                last_action_at__lt=fields["last_action_at"] - granularity
+            )
+            if "last_activity_at" in fields:
+                outdated |= (
+                    Q(last_activity_at__isnull=True)
+                    | Q(last_activity_at__lt=fields["last_activity_at"] - granularity)
+                    | Q(activity_tracking_warning_at__isnull=False)
+                )
+            if not Aidant.objects.filter(outdated, pk=aidant_id).update(**fields):
+                continue
+            if (aidant := aidants.get(aidant_id)) is not None:
+                for name, value in fields.items():
+                    setattr(aidant, name, value)
+
+    @classmethod
+    def ensure_partitions(cls, months_ahead: int | None = None) -> list[str]:
+        """Creates the monthly partitions of the journal table from the current month
+        up to `months_ahead` months in the future, if they don't already exist.
+
+        :return: the names of the partitions covering these months
+        """
+        if months_ahead is None:
+            months_ahead = settings.JOURNAL_PARTITIONS_MONTHS_AHEAD
+
+        current_month = timezone.now().replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+        result = []
+        with connection.cursor() as cursor:
+            for i in range(months_ahead + 1):
+                cursor.execute(
+                    f"SELECT {cls._meta.db_table}_ensure_partition(%s)",
+                    [current_month + relativedelta(months=i)],
+                )
+                if (partition_name := cursor.fetchone()[0]) is not None:
+                    result.append(partition_name)
+        return result
+
+    @classmethod
+    def backfill_metadata(cls, after: int = 0, batch_size: int = 1000) -> int | None:
+        """Fills `metadata` from `additional_information` for a batch of entries
+        whose id is greater than `after`.
+
+        :return: the id of the last entry of the batch, to be passed as `after` to
+                 process the next one, or `None` if there is nothing left to process
+        """
+        entries = list(
+            cls.objects.without_metadata()
+            .filter(pk__gt=after)
+            .order_by("pk")
+            .only("pk", "action", "additional_information")[:batch_size]
+        )
+        if not entries:
+            return None
+
+        to_update = []
+        for entry in entries:
+            info = _CLEANUP_SUFFIX_RE.split(entry.additional_information or "")[0]
+            if metadata := LEGACY_METADATA_PARSERS[entry.action](info.strip()):
+                entry.metadata = metadata
+                to_update.append(entry)
+            else:
+                logger.warning(
+                    f"Could not extract metadata from journal entry #{entry.pk}"
+                )
+
+        cls.objects.bulk_update(to_update, ["metadata"])
+        return entries[-1].pk
+
     @classmethod
     def log_connection(cls, aidant: Aidant):
-        return cls.objects.create(
+        return cls._log(
             aidant=aidant,
             organisation=aidant.organisation,
             action=JournalActionKeywords.CONNECT_AIDANT,
@@ -226,7 +468,7 @@ class Journal(models.Model):
 
     @classmethod
     def log_activity_check(cls, aidant: Aidant):
-        return cls.objects.create(
+        return cls._log(
             aidant=aidant,
             organisation=aidant.organisation,
             action=JournalActionKeywords.ACTIVITY_CHECK_AIDANT,
@@ -235,21 +477,23 @@ class Journal(models.Model):
     @classmethod
     def log_card_association(cls, responsable: Aidant, aidant: Aidant, sn: str):
         more_info = f"aidant.id = {aidant.id}, sn = {sn}"
-        return cls.objects.create(
+        return cls._log(
             aidant=responsable,
             organisation=responsable.organisation,
             action=JournalActionKeywords.CARD_ASSOCIATION,
             additional_information=more_info,
+            metadata={"aidant_id": aidant.id, "serial_number": sn},
         )
 
     @classmethod
     def log_card_validation(cls, responsable: Aidant, aidant: Aidant, sn: str):
         more_info = f"aidant.id = {aidant.id}, sn = {sn}"
-        return cls.objects.create(
+        return cls._log(
             aidant=responsable,
             organisation=responsable.organisation,
             action=JournalActionKeywords.CARD_VALIDATION,
             additional_information=more_info,
+            metadata={"aidant_id": aidant.id, "serial_number": sn},
         )
 
     @classmethod
@@ -257,16 +501,17 @@ class Journal(models.Model):
         cls, responsable: Aidant, aidant: Aidant, sn: str, reason: str
     ):
         more_info = f"aidant.id = {aidant.id}, sn = {sn}, reason = {reason}"
-        return cls.objects.create(
+        return cls._log(
             aidant=responsable,
             organisation=responsable.organisation,
             action=JournalActionKeywords.CARD_DISSOCIATION,
             additional_information=more_info,
+            metadata={"aidant_id": aidant.id, "serial_number": sn, "reason": reason},
         )
 
     @classmethod
     def log_franceconnection_usager(cls, aidant: Aidant, usager: Usager):
-        return cls.objects.create(
+        return cls._log(
             aidant=aidant,
             organisation=aidant.organisation,
             usager=usager,
@@ -275,7 +520,7 @@ class Journal(models.Model):
 
     @classmethod
     def log_update_email_usager(cls, aidant: Aidant, usager: Usager):
-        return cls.objects.create(
+        return cls._log(
             aidant=aidant,
             organisation=aidant.organisation,
             usager=usager,
@@ -284,7 +529,7 @@ class Journal(models.Model):
 
     @classmethod
     def log_update_phone_usager(cls, aidant: Aidant, usager: Usager):
-        return cls.objects.create(
+        return cls._log(
             aidant=aidant,
             organisation=aidant.organisation,
             usager=usager,
@@ -326,7 +571,7 @@ class Journal(models.Model):
                 "user_phone must be set when " "mandate uses SMS consent method"
             )
 
-        return cls.objects.create(
+        return cls._log(
             aidant=aidant,
             organisation=aidant.organisation,
             usager=usager,
@@ -377,7 +622,7 @@ class Journal(models.Model):
                 "user_phone must be set when " "mandate uses SMS consent method"
             )
 
-        return cls.objects.create(
+        return cls._log(
             aidant=aidant,
             organisation=aidant.organisation,
             usager=usager,
@@ -398,7 +643,7 @@ class Journal(models.Model):
         mandat = autorisation.mandat
         usager = mandat.usager
 
-        return cls.objects.create(
+        return cls._log(
             aidant=aidant,
             organisation=aidant.organisation,
             usager=usager,
@@ -418,7 +663,7 @@ class Journal(models.Model):
         access_token: str,
         autorisation: Autorisation,
     ):
-        return cls.objects.create(
+        return cls._log(
             aidant=aidant,
             organisation=aidant.organisation,
             usager=usager,
@@ -430,7 +675,7 @@ class Journal(models.Model):
 
     @classmethod
     def log_autorisation_cancel(cls, autorisation: Autorisation, aidant: Aidant):
-        return cls.objects.create(
+        return cls._log(
             aidant=aidant,
             organisation=aidant.organisation,
             usager=autorisation.mandat.usager,
@@ -442,7 +687,7 @@ class Journal(models.Model):
 
     @classmethod
     def log_mandat_cancel(cls, mandat: Mandat, aidant: Aidant):
-        return cls.objects.create(
+        return cls._log(
             aidant=aidant,
             organisation=aidant.organisation,
             usager=mandat.usager,
@@ -453,11 +698,12 @@ class Journal(models.Model):
     @classmethod
     def log_toitp_card_import(cls, aidant: Aidant, added: int, updated: int):
         message = f"{added} ajouts - {updated} modifications"
-        return cls.objects.create(
+        return cls._log(
             aidant=aidant,
             organisation=aidant.organisation,
             action=JournalActionKeywords.IMPORT_TOTP_CARDS,
             additional_information=message,
+            metadata={"added": added, "updated": updated},
         )
 
     @classmethod
@@ -467,7 +713,7 @@ class Journal(models.Model):
         previous_organisation: Organisation,
         previous_hash: Optional[str],
     ):
-        return cls.objects.create(
+        return cls._log(
             mandat=mandat,
             organisation=mandat.organisation,
             action=JournalActionKeywords.TRANSFER_MANDAT,
@@ -475,6 +721,10 @@ class Journal(models.Model):
                 f"previous_organisation = {previous_organisation.pk}, "
                 f"previous_hash = {previous_hash}"
             ),
+            metadata={
+                "previous_organisation_id": previous_organisation.pk,
+                "previous_hash": previous_hash,
+            },
         )
 
     @classmethod
@@ -504,11 +754,15 @@ class Journal(models.Model):
             f"previous organisation : {previous.name} (#{previous.id}) -"
             f"new organisation : {aidant.organisation.name} (#{aidant.organisation.id})"
         )
-        return cls.objects.create(
+        return cls._log(
             aidant=aidant,
             organisation=aidant.organisation,
             action=JournalActionKeywords.SWITCH_ORGANISATION,
             additional_information=more_info,
+            metadata={
+                "previous_organisation_id": previous.id,
+                "new_organisation_id": aidant.organisation.id,
+            },
         )
 
     @classmethod
@@ -599,6 +853,40 @@ class Journal(models.Model):
             message,
         )
 
+    @classmethod
+    def log_sms_status(
+        cls,
+        user_phone: PhoneNumber,
+        consent_request_id: str,
+        status: SmsStatus,
+        **metadata,
+    ) -> Journal:
+        """Records what became of the last SMS sent for a consent request"""
+        user_phone = format_number(user_phone, PhoneNumberFormat.E164)
+        sms_entry = (
+            cls.objects.filter(
+                action__in=[
+                    JournalActionKeywords.REMOTE_SMS_RECAP_SENT,
+                    JournalActionKeywords.REMOTE_SMS_CONSENT_SENT,
+                ],
+                user_phone=user_phone,
+                consent_request_id=consent_request_id,
+            )
+            .order_by("-creation_date")
+            .first()
+        )
+
+        return cls._log(
+            action=JournalActionKeywords.REMOTE_SMS_STATUS,
+            aidant_id=sms_entry.aidant_id if sms_entry else None,
+            is_remote_mandat=True,
+            remote_constent_method=RemoteConsentMethodChoices.SMS,
+            user_phone=user_phone,
+            consent_request_id=consent_request_id,
+            additional_information=f"status={status}",
+            metadata={"status": status, **metadata},
+        )
+
     @classmethod
     def _log_sms_event(
         cls,
@@ -621,7 +909,7 @@ class Journal(models.Model):
             AuthorizationDurations.duration(duree) if isinstance(duree, str) else duree
         )
 
-        return cls.objects.create(
+        return cls._log(
             action=action,
             aidant=aidant,
             demarche=demarche,
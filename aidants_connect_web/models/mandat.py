@@ -2,17 +2,33 @@ from __future__ import annotations
 
 import contextlib
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
-from os import walk as os_walk
+from os import listdir
 from os.path import dirname
 from os.path import join as path_join
 from re import sub as regex_sub
-from typing import TYPE_CHECKING, Collection, Optional, Union
+from typing import TYPE_CHECKING, Callable, Collection, Iterable, Optional, Union
 
 from django.conf import settings
+from django.contrib.auth.hashers import make_password
 from django.contrib.postgres.fields import ArrayField
 from django.db import IntegrityError, models, transaction
-from django.db.models import SET_NULL, Q, QuerySet
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import (
+    SET_NULL,
+    Case,
+    Count,
+    Exists,
+    ExpressionWrapper,
+    Max,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Value,
+    When,
+)
 from django.template import defaultfilters, loader
 from django.template.defaultfilters import pluralize
 from django.urls import reverse
@@ -28,10 +44,13 @@ from phonenumbers import region_code_for_country_code
 from aidants_connect_common.constants import (
     AuthorizationDurationChoices,
     AuthorizationDurations,
+    JournalActionKeywords,
 )
 from aidants_connect_web.constants import RemoteConsentMethodChoices
 from aidants_connect_web.utilities import (
     generate_attestation_hash,
+    generate_fc_as_fi_digest,
+    generate_file_sha256_hash,
     mandate_template_path,
 )
 
@@ -81,6 +100,35 @@ class MandatQuerySet(models.QuerySet):
     def seperatly_revoked(self):
         return self.exclude(autorisations__revocation_date__isnull=True)
 
+    def annotate_revocation(self):
+        """
+        Annotates each mandate with ``has_autorisations``,
+        ``has_active_autorisations``, ``revocation_date`` and
+        ``was_explicitly_revoked``, so that ``Mandat.is_active``,
+        ``Mandat.revocation_date`` and ``Mandat.was_explicitly_revoked`` don't query
+        the mandate's autorisations.
+        """
+        autorisations = Autorisation.objects.filter(mandat=OuterRef("pk"))
+        return self.annotate(
+            has_autorisations=Exists(autorisations),
+            has_active_autorisations=Exists(
+                autorisations.filter(revocation_date__isnull=True)
+            ),
+            revocation_date=Case(
+                When(has_active_autorisations=True, then=Value(None)),
+                default=Subquery(
+                    autorisations.values("mandat")
+                    .annotate(last_revocation_date=Max("revocation_date"))
+                    .values("last_revocation_date")
+                ),
+                output_field=models.DateTimeField(),
+            ),
+        ).annotate(
+            was_explicitly_revoked=ExpressionWrapper(
+                Q(revocation_date__isnull=False), output_field=models.BooleanField()
+            )
+        )
+
 
 class Mandat(models.Model):
     organisation = models.ForeignKey(
@@ -128,6 +176,9 @@ class Mandat(models.Model):
             return False
         # A `mandat` is considered `active` if it contains
         # at least one active `autorisation`.
+        if hasattr(self, "has_active_autorisations"):
+            # Annotated by MandatQuerySet.annotate_revocation()
+            return self.has_active_autorisations
         return self.autorisations.active().exists()
 
     @property
@@ -148,6 +199,9 @@ class Mandat(models.Model):
         """
         Returns the date of the most recently revoked authorization if all them
         were revoked, ``None``, otherwise.
+
+        Set without querying the database on mandates fetched with
+        ``MandatQuerySet.annotate_revocation()``.
         """
         return (
             self.autorisations.order_by("-revocation_date").first().revocation_date
@@ -175,6 +229,9 @@ class Mandat(models.Model):
         """
         Returns whether the mandate was explicitely revoked, independently of it's
         expiration date.
+
+        Set without querying the database on mandates fetched with
+        ``MandatQuerySet.annotate_revocation()``.
         """
         return Mandat.objects.seperatly_revoked().filter(pk=self.pk).exists()
 
@@ -192,11 +249,15 @@ class Mandat(models.Model):
         :return: the template file relative path as can be used on Django's
         template engine (without `templates` prepended), otherwise `None`
         """
-        return (
-            self.template_path
-            if self.template_path is not None
-            else self._get_mandate_template_path_from_journal_hash()
-        )
+        if self.template_path is None:
+            template_path = self._get_mandate_template_path_from_journal_hash()
+            if template_path is not None:
+                # Recorded so that it doesn't need to be searched again
+                Mandat.objects.filter(pk=self.pk).update(template_path=template_path)
+                self.template_path = template_path
+            return template_path
+
+        return self.template_path
 
     def _get_mandate_template_path_from_journal_hash(self) -> Union[None, str]:
         """Legacy mode for `models.Mandat.text()`
@@ -211,31 +272,30 @@ class Mandat(models.Model):
         (without `templates` prepended`) otherwise
         """
 
-        journal_entries = Journal.find_attestation_creation_entries(self)
+        journal_entries = Journal.find_attestation_creation_entries(
+            self
+        ).select_related("aidant")
 
-        if journal_entries.count() == 0:
+        if len(journal_entries) == 0:
             return None
 
-        template_dir = dirname(
-            loader.get_template(settings.MANDAT_TEMPLATE_PATH).origin.name
-        )
-
+        templates = MandatTemplate.get_index()
         demarches = [it.demarche for it in self.autorisations.all()]
 
         for journal_entry in journal_entries:
-            for _, _, filenames in os_walk(template_dir):
-                for filename in filenames:
-                    file_hash = generate_attestation_hash(
-                        journal_entry.aidant,
-                        self.usager,
-                        demarches,
-                        self.expiration_date,
-                        journal_entry.creation_date.date().isoformat(),
-                        path_join(settings.MANDAT_TEMPLATE_DIR, filename),
-                    )
+            for template_path, template_hash in templates.items():
+                attestation_hash = generate_attestation_hash(
+                    journal_entry.aidant,
+                    self.usager,
+                    demarches,
+                    self.expiration_date,
+                    journal_entry.creation_date.date().isoformat(),
+                    template_path,
+                    template_hash=template_hash,
+                )
 
-                    if file_hash == journal_entry.attestation_hash:
-                        return path_join(settings.MANDAT_TEMPLATE_DIR, filename)
+                if attestation_hash == journal_entry.attestation_hash:
+                    return template_path
 
         return None
 
@@ -258,7 +318,7 @@ class Mandat(models.Model):
     @classmethod
     def get_attestation_or_none(cls, mandate_id):
         try:
-            mandate = Mandat.objects.get(mandate_id)
+            mandate = Mandat.objects.get(pk=mandate_id)
             journal = Journal.find_attestation_creation_entries(mandate)
             # If the journal count is 1, let's use this, otherwise, we don't consider
             # the results to be sufficiently specific to display a hash
@@ -289,40 +349,125 @@ class Mandat(models.Model):
         ).order_by("organisation", "expiration_date")
 
     @classmethod
-    def transfer_to_organisation(cls, organisation: Organisation, ids: Collection[str]):
+    def _find_legacy_attestation_hashes(
+        cls, mandates: Iterable[Mandat]
+    ) -> dict[int, str | None]:
+        """
+        Same heuristic as `Journal.find_attestation_creation_entries` for mandates
+        whose attestation creation entry is not linked to them, for all of
+        `mandates` at once. Like `get_attestation_or_none`, ambiguous results are
+        ignored.
+        """
+        mandates = list(mandates)
+        if not mandates:
+            return {}
+
+        window = timedelta(hours=24)
+        entries = Journal.objects.filter(
+            action=JournalActionKeywords.CREATE_ATTESTATION,
+            usager__in={mandate.usager_id for mandate in mandates},
+            aidant__organisation__in={mandate.organisation_id for mandate in mandates},
+            creation_date__range=(
+                min(mandate.creation_date for mandate in mandates) - window,
+                max(mandate.creation_date for mandate in mandates) + window,
+            ),
+        ).values("usager", "aidant__organisation", "creation_date", "attestation_hash")
+        candidates = defaultdict(list)
+        for entry in entries:
+            candidates[(entry["usager"], entry["aidant__organisation"])].append(entry)
+
+        result = {}
+        for mandate in mandates:
+            matches = [
+                entry["attestation_hash"]
+                for entry in candidates[(mandate.usager_id, mandate.organisation_id)]
+                if abs(entry["creation_date"] - mandate.creation_date) <= window
+            ]
+            if len(matches) == 1:
+                result[mandate.pk] = matches[0]
+        return result
+
+    @classmethod
+    def transfer_to_organisation(
+        cls,
+        organisation: Organisation,
+        ids: Collection[str | int],
+        on_progress: Callable[[int], None] | None = None,
+    ):
+        """
+        Moves mandates to ``organisation`` in batches of
+        ``settings.MANDAT_TRANSFER_BATCH_SIZE``. Each batch is updated and journaled
+        in a few statements, in its own transaction.
+
+        :param on_progress: called with the number of mandates processed so far,
+            after each batch
+        :returns: whether some mandates couldn't be transferred, and their ids
+        """
+        from .stats import StatisticsChange
+
+        ids = [int(mandate_id) for mandate_id in ids]
         failed_updates = []
+        batch_size = settings.MANDAT_TRANSFER_BATCH_SIZE
 
-        for mandate_id in ids:
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start : start + batch_size]
             try:
-                mandate = Mandat.objects.get(pk=mandate_id)
-                journal = Mandat.get_attestation_or_none(mandate_id)
-
-                with transaction.atomic():
-                    mandate.organisation = organisation
-                    mandate.save()
+                with transaction.atomic(), Journal.buffered():
+                    mandates = list(
+                        Mandat.objects.select_for_update(of=("self",))
+                        .select_related("organisation")
+                        .filter(pk__in=batch)
+                    )
+                    missing_ids = set(batch) - {mandate.pk for mandate in mandates}
+                    mandates = [
+                        mandate
+                        for mandate in mandates
+                        if mandate.organisation_id != organisation.pk
+                    ]
+                    Mandat.objects.filter(
+                        pk__in=[mandate.pk for mandate in mandates]
+                    ).update(organisation=organisation)
+                    StatisticsChange.record(
+                        organisation, *(mandate.organisation for mandate in mandates)
+                    )
 
-                    Journal.log_transfert_mandat(
-                        mandate,
-                        mandate.organisation,
-                        getattr(journal, "attestation_hash", None),
+                    previous_hashes = dict(
+                        Journal.objects.filter(
+                            action=JournalActionKeywords.CREATE_ATTESTATION,
+                            mandat__in=mandates,
+                        )
+                        .values("mandat")
+                        # Like get_attestation_or_none, ambiguous results are ignored
+                        .annotate(count=Count("pk"), hash=Max("attestation_hash"))
+                        .filter(count=1)
+                        .values_list("mandat", "hash")
+                    )
+                    previous_hashes.update(
+                        cls._find_legacy_attestation_hashes(
+                            mandate
+                            for mandate in mandates
+                            if mandate.pk not in previous_hashes
+                        )
                     )
-                    if journal is not None:
-                        journal.attestation_hash = generate_attestation_hash(
-                            aidant=journal.aidant,
-                            usager=mandate.usager,
-                            demarches=journal.demarche,
-                            expiration_date=mandate.expiration_date,
-                            creation_date=mandate.expiration_date.date().isoformat(),
-                            mandat_template_path=mandate.get_mandate_template_path(),
-                            organisation_id=organisation.id,
+                    for mandate in mandates:
+                        previous_organisation = mandate.organisation
+                        mandate.organisation = organisation
+                        Journal.log_transfert_mandat(
+                            mandate,
+                            previous_organisation,
+                            previous_hashes.get(mandate.pk),
                         )
-                        journal.save()
             except Exception:
-                failed_updates.append(mandate_id)
+                failed_updates.extend(batch)
                 logger.exception(
                     "An error happened while trying to transfer mandates to "
                     "another organisation"
                 )
+            else:
+                failed_updates.extend(sorted(missing_ids))
+
+            if on_progress is not None:
+                on_progress(start + len(batch))
 
         return len(failed_updates) != 0, failed_updates
 
@@ -350,6 +495,68 @@ class Mandat(models.Model):
         ]
 
 
+class MandatTemplate(models.Model):
+    """
+    Hash of the content of each mandate template, used to find out which template
+    was presented for a mandate from the hash of its attestation.
+
+    Filled on deployment by the ``index_mandat_templates`` command, and on use
+    when templates were added or removed since.
+    """
+
+    path = models.CharField("Chemin du template", max_length=255, unique=True)
+    sha256 = models.CharField("Empreinte SHA-256", max_length=64)
+    indexed_at = models.DateTimeField("Date d'indexation", auto_now=True)
+
+    class Meta:
+        verbose_name = "Template de mandat"
+        verbose_name_plural = "Templates de mandat"
+
+    def __str__(self):
+        return self.path
+
+    @classmethod
+    def index_templates(cls) -> list[MandatTemplate]:
+        """Records the hash of every template of ``settings.MANDAT_TEMPLATE_DIR``
+        and forgets the templates which were removed"""
+        paths = cls.list_template_paths()
+        templates = cls.objects.bulk_create(
+            [
+                cls(path=path, sha256=generate_file_sha256_hash(f"templates/{path}"))
+                for path in paths
+            ],
+            update_conflicts=True,
+            unique_fields=["path"],
+            update_fields=["sha256", "indexed_at"],
+        )
+        cls.objects.exclude(path__in=paths).delete()
+        return templates
+
+    @staticmethod
+    def list_template_paths() -> list[str]:
+        """:return: the path of every template of ``settings.MANDAT_TEMPLATE_DIR``"""
+        template_dir = dirname(
+            loader.get_template(settings.MANDAT_TEMPLATE_PATH).origin.name
+        )
+        return [
+            path_join(settings.MANDAT_TEMPLATE_DIR, filename)
+            for filename in sorted(listdir(template_dir))
+        ]
+
+    @classmethod
+    def get_index(cls) -> dict[str, str]:
+        """
+        :return: the hash of each template, by path; templates are indexed first
+            if the index does not match ``settings.MANDAT_TEMPLATE_DIR``
+        """
+        index = dict(cls.objects.order_by("path").values_list("path", "sha256"))
+        if index.keys() != set(cls.list_template_paths()):
+            index = {
+                template.path: template.sha256 for template in cls.index_templates()
+            }
+        return index
+
+
 class AutorisationQuerySet(models.QuerySet):
     def active(self):
         return self.exclude(mandat__expiration_date__lt=timezone.now()).filter(
@@ -464,10 +671,66 @@ class Autorisation(models.Model):
         Journal.log_autorisation_cancel(self, aidant)
 
 
+_connection_digests_migration_date: datetime | None = None
+
+
+def get_connection_digests_migration_date() -> datetime | None:
+    """Date at which connections started to be stored with digests, which is when
+    the migration adding them was applied"""
+    global _connection_digests_migration_date
+    if _connection_digests_migration_date is None:
+        _connection_digests_migration_date = (
+            MigrationRecorder.Migration.objects.filter(
+                app="aidants_connect_web", name="0099_connection_digests"
+            )
+            .values_list("applied", flat=True)
+            .first()
+        )
+    return _connection_digests_migration_date
+
+
 class ConnectionQuerySet(models.QuerySet):
     def expired(self):
         return self.filter(expires_on__lt=timezone.now())
 
+    def get_by_code(self, code: str) -> Connection:
+        return self._get_by_digest("code", code)
+
+    def get_by_access_token(self, access_token: str) -> Connection:
+        return self._get_by_digest("access_token", access_token)
+
+    def _get_by_digest(self, field_name: str, value: str) -> Connection:
+        digest = generate_fc_as_fi_digest(value)
+        try:
+            return self.get(**{f"{field_name}_digest": digest})
+        except self.model.DoesNotExist:
+            if not settings.FC_AS_FI_ACCEPT_LEGACY_HASHES:
+                raise
+
+        # Unexpired connection created before codes and access tokens were stored
+        # as digests. The costly legacy hash is only derived if there is any.
+        digests_since = get_connection_digests_migration_date()
+        if digests_since is None:
+            raise self.model.DoesNotExist(
+                f"{self.model._meta.object_name} matching query does not exist."
+            )
+        legacy_connections = self.filter(
+            **{f"{field_name}_digest__isnull": True},
+            expires_on__gte=timezone.now(),
+            expires_on__lte=digests_since
+            + timedelta(seconds=settings.FC_CONNECTION_AGE),
+        )
+        if not legacy_connections.exists():
+            raise self.model.DoesNotExist(
+                f"{self.model._meta.object_name} matching query does not exist."
+            )
+        connection = legacy_connections.get(
+            **{field_name: make_password(value, settings.FC_AS_FI_HASH_SALT)}
+        )
+        setattr(connection, f"{field_name}_digest", digest)
+        connection.save(update_fields=[f"{field_name}_digest"])
+        return connection
+
 
 def default_connection_expiration_date():
     now = timezone.now()
@@ -505,8 +768,14 @@ class Connection(models.Model):
 
     expires_on = models.DateTimeField(default=default_connection_expiration_date)  # FS
     access_token = models.TextField(default="No token provided")  # FS
+    access_token_digest = models.CharField(
+        max_length=64, null=True, default=None, unique=True, editable=False
+    )
 
     code = models.TextField()
+    code_digest = models.CharField(
+        max_length=64, null=True, default=None, unique=True, editable=False
+    )
     demarche = models.TextField(default="No demarche provided")
     aidant = models.ForeignKey(
         "aidants_connect_web.Aidant",
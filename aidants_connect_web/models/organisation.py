@@ -36,7 +36,15 @@ class OrganisationType(models.Model):
         return f"{self.name}"
 
 
-class OrganisationManager(models.Manager):
+class OrganisationQuerySet(QuerySet):
+    def update(self, **kwargs):
+        # `updated_at` versions the public organisations API (see
+        # `OrganisationViewSet`), so it is bumped by every write
+        kwargs.setdefault("updated_at", timezone.now())
+        return super().update(**kwargs)
+
+
+class OrganisationManager(models.Manager.from_queryset(OrganisationQuerySet)):
     def accredited(self):
         return self.filter(
             aidants__is_active=True,
@@ -150,6 +158,12 @@ class Organisation(models.Model):
     def __str__(self):
         return f"{self.name}"
 
+    def save(self, *args, update_fields=None, **kwargs):
+        # See `OrganisationQuerySet.update`
+        if update_fields is not None and "updated_at" not in update_fields:
+            update_fields = {*update_fields, "updated_at"}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
     class AlreadyExists(Exception):
         pass
 
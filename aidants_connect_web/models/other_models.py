@@ -2,15 +2,15 @@ from __future__ import annotations
 
 import logging
 from enum import auto
-from pathlib import Path
+from functools import partial
 from textwrap import dedent
 from uuid import uuid4
 
 from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
 from django.db import models, transaction
 from django.db.models import IntegerChoices
 from django.db.transaction import atomic
-from django.utils.functional import cached_property
 
 import pgtrigger
 import requests
@@ -285,7 +285,7 @@ class HabilitationRequest(models.Model):
 
 
 def _filepath_generator():
-    return f"{uuid4()}.csv"
+    return f"{uuid4()}.csv.gz"
 
 
 class ExportRequest(models.Model):
@@ -296,11 +296,16 @@ class ExportRequest(models.Model):
 
     aidant = models.ForeignKey(Aidant, on_delete=models.CASCADE)
     date = models.DateField(auto_now_add=True)
-    filename = models.CharField(max_length=40, default=_filepath_generator)
+    filename = models.CharField(max_length=50, default=_filepath_generator)
     state = models.IntegerField(
         "État", choices=ExportRequestState.choices, default=ExportRequestState.ONGOING
     )
     task_uuid = models.UUIDField(null=True, blank=False, default=None)
+    # Written by the Celery worker and read by the web process, so it must live in
+    # a storage both of them reach
+    file = models.FileField(
+        "Fichier", upload_to="exports", null=True, blank=True, editable=False
+    )
 
     @property
     def is_ongoing(self):
@@ -314,24 +319,83 @@ class ExportRequest(models.Model):
     def is_error(self):
         return self.state == self.ExportRequestState.ERROR.value
 
-    @cached_property
-    def file_path(self):
-        import aidants_connect
-
-        return Path(aidants_connect.__path__[0]).resolve().parent / self.filename
-
     def save(self, *args, **kwargs):
         if not self.pk:
             from ..tasks import export_for_bizdevs
 
             super().save(*args, **kwargs)
-            result = export_for_bizdevs.apply_async((self.pk,), compression="zlib")
+            result = export_for_bizdevs.apply_async((self.pk,))
             self.task_uuid = result.id
             super().save(update_fields=("task_uuid",))
         else:
             super().save(*args, **kwargs)
 
 
+class MandatTransfer(models.Model):
+    """Transfer of mandates to another organisation, run by the Celery workers"""
+
+    class MandatTransferState(IntegerChoices):
+        ONGOING = (auto(), "En cours")
+        DONE = (auto(), "Fini")
+        ERROR = (auto(), "Erreur")
+
+    aidant = models.ForeignKey(
+        Aidant, null=True, on_delete=models.SET_NULL, verbose_name="Lancé par"
+    )
+    organisation = models.ForeignKey(
+        Organisation,
+        on_delete=models.PROTECT,
+        related_name="mandat_transfers",
+        verbose_name="Organisation de destination",
+    )
+    created_at = models.DateTimeField("Date de création", auto_now_add=True)
+    mandat_ids = ArrayField(models.IntegerField(), verbose_name="Mandats")
+    processed_count = models.PositiveIntegerField("Mandats traités", default=0)
+    failed_ids = ArrayField(
+        models.IntegerField(),
+        default=list,
+        blank=True,
+        verbose_name="Mandats non transférés",
+    )
+    state = models.IntegerField(
+        "État",
+        choices=MandatTransferState.choices,
+        default=MandatTransferState.ONGOING,
+    )
+
+    class Meta:
+        verbose_name = "Transfert de mandats"
+        verbose_name_plural = "Transferts de mandats"
+
+    def __str__(self):
+        return f"Transfert de {len(self.mandat_ids)} mandats vers {self.organisation}"
+
+    @property
+    def is_ongoing(self):
+        return self.state == self.MandatTransferState.ONGOING.value
+
+    @property
+    def is_done(self):
+        return self.state == self.MandatTransferState.DONE.value
+
+    @property
+    def is_error(self):
+        return self.state == self.MandatTransferState.ERROR.value
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            return super().save(*args, **kwargs)
+
+        from ..tasks import transfer_mandats
+
+        super().save(*args, **kwargs)
+        if settings.MANDAT_TRANSFER_ASYNC_DISPATCH:
+            transaction.on_commit(partial(transfer_mandats.delay, self.pk))
+        else:
+            transfer_mandats.apply((self.pk,))
+            self.refresh_from_db()
+
+
 class StructureChangeRequest(models.Model):
     """
     Request to move an already-trained aidant to a new structure.
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils.timezone import now
+
+from aidants_connect_common.utils.bulk_email import build_email
+from aidants_connect_web.constants import OutgoingEmailStatus
+
+
+class OutgoingEmailQuerySet(models.QuerySet):
+    def due(self):
+        return self.filter(
+            status=OutgoingEmailStatus.PENDING, next_attempt_at__lte=now()
+        )
+
+
+class OutgoingEmail(models.Model):
+    """Transactional email waiting to be sent, or sent, by the Celery workers"""
+
+    OutgoingEmailStatus = OutgoingEmailStatus
+
+    created_at = models.DateTimeField("Date de création", auto_now_add=True)
+    dedup_key = models.CharField(
+        "Clé de dédoublonnage",
+        max_length=255,
+        unique=True,
+        null=True,
+        blank=True,
+        default=None,
+    )
+    from_email = models.CharField("Expéditeur", max_length=255)
+    recipient = models.CharField("Destinataire", max_length=255)
+    subject = models.CharField("Objet", max_length=255)
+    text_message = models.TextField("Message texte")
+    html_message = models.TextField("Message HTML")
+
+    status = models.CharField(
+        "État",
+        max_length=20,
+        choices=OutgoingEmailStatus.choices,
+        default=OutgoingEmailStatus.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField("Nombre de tentatives", default=0)
+    next_attempt_at = models.DateTimeField("Prochaine tentative", default=now)
+    sent_at = models.DateTimeField("Date d'envoi", null=True, blank=True)
+    last_error = models.TextField("Dernière erreur", blank=True, default="")
+
+    objects = OutgoingEmailQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Email transactionnel"
+        verbose_name_plural = "Emails transactionnels"
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+            models.Index(fields=["recipient", "sent_at"]),
+        ]
+
+    def __str__(self):
+        return f"Email « {self.subject} » pour {self.recipient}"
+
+    @classmethod
+    def enqueue(
+        cls,
+        *,
+        subject: str,
+        message: str,
+        from_email: str,
+        recipient_list: list[str],
+        html_message: str,
+        dedup_key: str | None = None,
+    ) -> list[OutgoingEmail]:
+        """
+        Records one email per recipient, to be sent once the current transaction is
+        committed. Takes the same arguments as `django.core.mail.send_mail`.
+
+        :param dedup_key: identifies the event the email is sent for; an email is
+            only recorded once per key and recipient
+        :returns: the emails recorded, without the duplicates
+        """
+        from aidants_connect_web.tasks import dispatch_outgoing_email
+
+        emails = []
+        with transaction.atomic():
+            for recipient in recipient_list:
+                fields = {
+                    "from_email": from_email,
+                    "recipient": recipient,
+                    "subject": subject,
+                    "text_message": message,
+                    "html_message": html_message,
+                    # Picked up by the periodic task if the dispatch below is lost
+                    "next_attempt_at": now()
+                    + timedelta(seconds=settings.OUTGOING_EMAIL_RETRY_DELAY),
+                }
+                if dedup_key is None:
+                    emails.append(cls.objects.create(**fields))
+                    continue
+
+                email, created = cls.objects.get_or_create(
+                    dedup_key=f"{dedup_key}:{recipient}", defaults=fields
+                )
+                if created:
+                    emails.append(email)
+
+        for email in emails:
+            if settings.OUTGOING_EMAIL_ASYNC_DISPATCH:
+                transaction.on_commit(partial(dispatch_outgoing_email, email.pk))
+            else:
+                dispatch_outgoing_email(email.pk)
+
+        return emails
+
+    def build(self):
+        return build_email(
+            subject=self.subject,
+            from_email=self.from_email,
+            recipient_list=[self.recipient],
+            text_message=self.text_message,
+            html_message=self.html_message,
+        )
+
+    def recipient_available_at(self):
+        """
+        :returns: the date after which an email can be sent to the recipient
+            without exceeding `settings.OUTGOING_EMAIL_RECIPIENT_LIMIT`, or `None`
+            if it can be sent right away
+        """
+        period = timedelta(seconds=settings.OUTGOING_EMAIL_RECIPIENT_PERIOD)
+        # The window frees up when the oldest of the last sends leaves it
+        last_sends = (
+            OutgoingEmail.objects.filter(
+                recipient=self.recipient,
+                status=OutgoingEmailStatus.SENT,
+                sent_at__gt=now() - period,
+            )
+            .order_by("-sent_at")
+            .values_list("sent_at", flat=True)
+        )
+        try:
+            oldest = last_sends[settings.OUTGOING_EMAIL_RECIPIENT_LIMIT - 1]
+        except IndexError:
+            return None
+        return oldest + period
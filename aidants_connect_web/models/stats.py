@@ -1,12 +1,20 @@
 from __future__ import annotations
 
 import logging
+from datetime import date
+from typing import TYPE_CHECKING, Iterable
 
 from django.db import models
+from django.db.models import Q
+from django.utils.timezone import now
 
+from aidants_connect_common.constants import JournalActionKeywords
 from aidants_connect_common.models import Department, Region
 from aidants_connect_web.models import Aidant
 
+if TYPE_CHECKING:
+    from aidants_connect_web.models import Journal, Organisation
+
 logger = logging.getLogger()
 
 
@@ -104,6 +112,12 @@ class AbstractAidantStatistiques(models.Model):
 
 
 class AidantStatistiques(AbstractAidantStatistiques):
+    is_reconciliation = models.BooleanField(
+        "Calcul complet",
+        default=True,
+        help_text="Les autres calculs ne mettent à jour que les départements modifiés",
+    )
+
     class Meta:
         verbose_name = "Statistiques aidants"
         verbose_name_plural = "Statistiques aidants"
@@ -129,6 +143,160 @@ class AidantStatistiquesbyDepartment(AbstractAidantStatistiques):
         verbose_name_plural = "Statistiques aidants par département"
 
 
+class StatisticsChange(models.Model):
+    """Change of the statistics of a department since they were last computed.
+
+    Changes are only ever inserted, so that concurrent writers never wait on each
+    other, and the computations delete the changes they have read."""
+
+    # Journal entries counted by the statistics
+    JOURNAL_ACTIONS = (
+        JournalActionKeywords.FRANCECONNECT_USAGER,
+        JournalActionKeywords.CREATE_ATTESTATION,
+        JournalActionKeywords.CREATE_AUTORISATION,
+        JournalActionKeywords.USE_AUTORISATION,
+        JournalActionKeywords.INIT_RENEW_MANDAT,
+    )
+
+    department_insee_code = models.CharField(
+        "Code INSEE du département", max_length=5, db_index=True
+    )
+    changed_at = models.DateTimeField("Date du changement", default=now)
+
+    class Meta:
+        verbose_name = "Changement des statistiques"
+        verbose_name_plural = "Changements des statistiques"
+
+    def __str__(self):
+        return f"{self.department_insee_code} @ {self.changed_at}"
+
+    @classmethod
+    def record(cls, *organisations: Organisation | None):
+        """Records a change in the departments of `organisations`. Changes outside
+        any department are left to the next full computation."""
+        cls.record_departments(
+            *(
+                organisation.department_insee_code
+                for organisation in organisations
+                if organisation is not None
+            )
+        )
+
+    @classmethod
+    def record_departments(cls, *department_insee_codes: str | None):
+        department_insee_codes = {code for code in department_insee_codes if code}
+        if not department_insee_codes:
+            return
+
+        changed_at = now()
+        cls.objects.bulk_create(
+            [
+                cls(department_insee_code=code, changed_at=changed_at)
+                for code in sorted(department_insee_codes)
+            ]
+        )
+
+    @classmethod
+    def record_journal_entries(cls, entries: Iterable[Journal]):
+        cls.record(
+            *(
+                entry.organisation
+                for entry in entries
+                if entry.action in cls.JOURNAL_ACTIONS
+            )
+        )
+
+
+class StatisticsSeriesQuerySet(models.QuerySet):
+    def between(self, start: date, end: date):
+        """
+        Daily figures between `start` and `end`, included, along with the monthly
+        figures of the months they overlap, where days were downsampled
+        """
+        return self.filter(
+            Q(granularity=StatisticsSeries.Granularity.DAY, date__range=(start, end))
+            | Q(
+                granularity=StatisticsSeries.Granularity.MONTH,
+                date__range=(start.replace(day=1), end),
+            )
+        ).order_by("departement", "family", "date", "granularity")
+
+
+class StatisticsSeries(models.Model):
+    """
+    Figures of a department for one family of metrics, on one day or, once older
+    than `settings.STATISTICS_SERIES_DAILY_RETENTION_DAYS`, for one month
+    """
+
+    class Family(models.TextChoices):
+        AIDANTS = "aidants", "Aidants"
+        ORGANISATIONS = "organisations", "Structures"
+        USAGE = "usage", "Utilisation"
+
+    class Granularity(models.TextChoices):
+        DAY = "day", "Jour"
+        MONTH = "month", "Mois"
+
+    FAMILY_FIGURES = {
+        Family.AIDANTS: [
+            "number_aidants",
+            "number_aidants_is_active",
+            "number_responsable",
+            "number_aidant_can_create_mandat",
+            "number_operational_aidants",
+            "number_aidants_without_totp",
+            "number_aidant_with_login",
+            "number_aidant_who_have_created_mandat",
+            "number_future_aidant",
+            "number_trained_aidant_since_begining",
+            "number_future_trained_aidant",
+            "number_aidants_in_zrr",
+            "number_old_aidants_warned",
+            "number_old_inactive_aidants_warned",
+            "number_aidants_with_otp_app",
+        ],
+        Family.ORGANISATIONS: [
+            "number_organisation_requests",
+            "number_validated_organisation_requests",
+            "number_organisation_with_accredited_aidants",
+            "number_organisation_with_at_least_one_ac_usage",
+            "number_orgas_in_zrr",
+        ],
+        Family.USAGE: [
+            "number_usage_of_ac",
+            "revoked_mandats",
+        ],
+    }
+
+    departement = models.ForeignKey(
+        Department, verbose_name="Département", on_delete=models.PROTECT
+    )
+    family = models.CharField("Famille", max_length=16, choices=Family.choices)
+    granularity = models.CharField(
+        "Granularité", max_length=8, choices=Granularity.choices
+    )
+    # For monthly figures, first day of the month
+    date = models.DateField("Date")
+    # Maps each figure of the family to its value on the last day computed
+    values = models.JSONField("Valeurs", default=dict)
+
+    objects = StatisticsSeriesQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Historique des statistiques"
+        verbose_name_plural = "Historiques des statistiques"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["departement", "family", "granularity", "date"],
+                name="unique_statistics_series_point",
+            )
+        ]
+        indexes = [models.Index(fields=["granularity", "date"])]
+
+    def __str__(self):
+        return f"{self.departement_id} {self.family} @ {self.date}"
+
+
 class ReboardingAidantStatistiques(models.Model):
     created_at = models.DateTimeField("Date de création", auto_now_add=True, null=True)
 
@@ -186,3 +354,36 @@ class ReboardingAidantStatistiques(models.Model):
 class Meta:
     verbose_name = "Statistique réembarquement"
     verbose_name_plural = "Statistiques réembarquement"
+
+
+class PublicStatistiques(models.Model):
+    """Snapshot of the figures displayed on the public statistics page"""
+
+    created_at = models.DateTimeField("Date de création", auto_now_add=True)
+
+    number_demarches = models.PositiveIntegerField(
+        "Démarches administratives réalisées", default=0
+    )
+    number_usagers_helped = models.PositiveIntegerField(
+        "Personnes accompagnées", default=0
+    )
+    number_mandats = models.PositiveIntegerField("Mandats créés", default=0)
+    number_accredited_aidants = models.PositiveIntegerField(
+        "Aidants habilités", default=0
+    )
+    number_future_aidants = models.PositiveIntegerField(
+        "Aidants en cours d’habilitation", default=0
+    )
+    number_accredited_organisations = models.PositiveIntegerField(
+        "Structures habilitées", default=0
+    )
+    number_future_organisations = models.PositiveIntegerField(
+        "Structures en cours d’habilitation", default=0
+    )
+    # List of [demarche, count] pairs, from the least to the most used demarche
+    demarches = models.JSONField("Démarches réalisées", default=list)
+
+    class Meta:
+        get_latest_by = "created_at"
+        verbose_name = "Statistiques publiques"
+        verbose_name_plural = "Statistiques publiques"
@@ -127,7 +127,7 @@ class Usager(models.Model):
         return True
 
     def has_all_mandats_revoked_or_expired_over_a_year(self):
-        for mandat in self.mandats.all():
+        for mandat in self.mandats.annotate_revocation():
             if (
                 not mandat.was_explicitly_revoked
                 and timezone.now() < mandat.expiration_date + timedelta(days=365)
@@ -3,9 +3,17 @@ import logging
 from django.apps import AppConfig
 from django.conf import settings
 from django.contrib.auth.signals import user_logged_in
-from django.core.mail import send_mail
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import connection
-from django.db.models.signals import post_migrate, post_save
+from django.db.models import DEFERRED
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_migrate,
+    post_save,
+)
 from django.dispatch import Signal, receiver
 from django.templatetags.static import static
 from django.urls import reverse
@@ -14,18 +22,21 @@ from django_otp.plugins.otp_totp.models import TOTPDevice
 from ipware import get_client_ip
 from ua_parser import user_agent_parser
 
-from aidants_connect_common.constants import (
-    JournalActionKeywords,
-    RequestOriginConstants,
-)
+from aidants_connect_common.constants import RequestOriginConstants
 from aidants_connect_common.utils import build_url, render_email
 from aidants_connect_web import tasks
 from aidants_connect_web.constants import NotificationType, ReferentRequestStatuses
 from aidants_connect_web.models import (
     Aidant,
+    Autorisation,
+    CarteTOTP,
     HabilitationRequest,
     Journal,
+    Mandat,
     Notification,
+    Organisation,
+    OutgoingEmail,
+    StatisticsChange,
 )
 from aidants_connect_web.models.aidant import UserFingerprint
 
@@ -62,17 +73,20 @@ def send_email_on_new_notification(sender, instance: Notification, created: bool
             ),
         },
     )
-    send_mail(
+    OutgoingEmail.enqueue(
         from_email=settings.EMAIL_AIDANT_NEW_FEATURE_NOTIFICATION_FROM,
         recipient_list=[instance.aidant.email],
         subject=settings.EMAIL_AIDANT_NEW_FEATURE_NOTIFICATION_SUBJECT,
         message=text_message,
         html_message=html_message,
+        dedup_key=f"new_feature_notification:{instance.pk}",
     )
 
 
 @receiver(aidant_activated)
-def notify_referent_aidant_activated(sender, aidant: Aidant, **_):
+def notify_referent_aidant_activated(
+    sender, aidant: Aidant, hrequest: HabilitationRequest, **_
+):
     str_referents = ""
     for referent in aidant.organisation.responsables.all():
         if str_referents:
@@ -93,7 +107,7 @@ def notify_referent_aidant_activated(sender, aidant: Aidant, **_):
                 ),
             },
         )
-        send_mail(
+        OutgoingEmail.enqueue(
             from_email=settings.EMAIL_AIDANT_ACTIVATED_FROM,
             recipient_list=[referent.email],
             subject=settings.EMAIL_AIDANT_ACTIVATED_SUBJECT.format(
@@ -101,6 +115,7 @@ def notify_referent_aidant_activated(sender, aidant: Aidant, **_):
             ),
             message=text_message,
             html_message=html_message,
+            dedup_key=f"aidant_activated:{hrequest.pk}",
         )
 
     text_message, html_message = render_email(
@@ -117,12 +132,13 @@ def notify_referent_aidant_activated(sender, aidant: Aidant, **_):
         },
     )
 
-    send_mail(
+    OutgoingEmail.enqueue(
         from_email=settings.AC_CONTACT_EMAIL,
         recipient_list=[aidant.email],
         subject="Bienvenue parmi nos aidants habilités !",
         message=text_message,
         html_message=html_message,
+        dedup_key=f"aidant_created:{hrequest.pk}",
     )
 
 
@@ -179,7 +195,7 @@ def send_mail_aidant__organisations_changed(instance: Aidant, diff: dict, **_):
         {"aidant": instance, **diff},
     )
 
-    send_mail(
+    OutgoingEmail.enqueue(
         from_email=settings.AIDANTS__ORGANISATIONS_CHANGED_EMAIL_FROM,
         recipient_list=[instance.email],
         subject=settings.AIDANTS__ORGANISATIONS_CHANGED_EMAIL_SUBJECT,
@@ -218,14 +234,194 @@ def populate_organisation_type_table(app_config: AppConfig, **_):
 def update_activity_tracking_on_new_journal(
     sender, instance: Journal, created: bool, **_
 ):
-    if (
-        not created
-        or instance.action not in JournalActionKeywords.activity_tracking_actions
+    if created:
+        Journal.update_aidants_activity([instance])
+
+
+@receiver(post_save, sender=Journal)
+def record_statistics_change_on_new_journal(
+    sender, instance: Journal, created: bool, **_
+):
+    if created:
+        StatisticsChange.record_journal_entries([instance])
+
+
+# Path from each model to the organisation in which it is counted by the statistics
+STATISTICS_ORGANISATION_PATHS = {
+    Aidant: "organisation",
+    Autorisation: "mandat__organisation",
+    CarteTOTP: "aidant__organisation",
+    HabilitationRequest: "organisation",
+    Mandat: "organisation",
+    TOTPDevice: "user__organisation",
+}
+
+
+def is_set(value) -> bool:
+    return value is not None
+
+
+# Fields of each model which the statistics depend on, with the function giving
+# the part of their value which matters, if not all of it
+STATISTICS_FIELDS = {
+    Aidant: {
+        "organisation_id": None,
+        "is_active": None,
+        "can_create_mandats": None,
+        "last_login": is_set,
+        "deactivation_warning_at": is_set,
+    },
+    Autorisation: {"mandat_id": None, "revocation_date": is_set},
+    CarteTOTP: {"aidant_id": None},
+    HabilitationRequest: {
+        "organisation_id": None,
+        "status": None,
+        "formation_done": None,
+    },
+    Mandat: {"organisation_id": None},
+    Organisation: {
+        "name": None,
+        "department_insee_code": None,
+        "city_insee_code": None,
+    },
+    TOTPDevice: {"user_id": None, "name": None},
+}
+
+
+def get_statistics_values(sender, instance) -> dict:
+    # Deferred fields are left out
+    return {
+        name: value if normalize is None else normalize(value)
+        for name, normalize in STATISTICS_FIELDS[sender].items()
+        if (value := instance.__dict__.get(name, DEFERRED)) is not DEFERRED
+    }
+
+
+def get_statistics_organisation(sender, instance) -> Organisation | None:
+    for name in STATISTICS_ORGANISATION_PATHS[sender].split(LOOKUP_SEP):
+        # The related object may already be gone when deletions cascade
+        try:
+            instance = getattr(instance, name)
+        except ObjectDoesNotExist:
+            return None
+        if instance is None:
+            return None
+    return instance
+
+
+def get_previous_statistics_organisation(
+    sender, previous_values: dict, values: dict
+) -> Organisation | None:
+    """:returns: the organisation an object was counted in before it moved"""
+    field_name, *path = STATISTICS_ORGANISATION_PATHS[sender].split(LOOKUP_SEP)
+    previous_id = previous_values.get(f"{field_name}_id")
+    if previous_id is None or previous_id == values.get(f"{field_name}_id"):
+        return None
+
+    related_model = sender._meta.get_field(field_name).related_model
+    if not path:
+        return related_model.objects.filter(pk=previous_id).first()
+    return Organisation.objects.filter(
+        pk__in=related_model.objects.filter(pk=previous_id).values(
+            LOOKUP_SEP.join(path)
+        )
+    ).first()
+
+
+@receiver(post_init, sender=Aidant)
+@receiver(post_init, sender=Autorisation)
+@receiver(post_init, sender=CarteTOTP)
+@receiver(post_init, sender=HabilitationRequest)
+@receiver(post_init, sender=Mandat)
+@receiver(post_init, sender=Organisation)
+@receiver(post_init, sender=TOTPDevice)
+def remember_statistics_values(sender, instance, **_):
+    """Remembers the values the statistics depend on, so that saves which don't
+    change any of them, like logins, don't record a change, and so that the
+    statistics of its former department are recomputed too when `instance` moves"""
+    instance._statistics_values = get_statistics_values(sender, instance)
+
+
+def pop_statistics_changes(sender, instance, created: bool) -> tuple[dict, dict]:
+    """:returns: the previous values the statistics depend on and the current
+    ones, or empty dicts if none of them changed"""
+    previous_values = instance.__dict__.get("_statistics_values", {})
+    values = get_statistics_values(sender, instance)
+    instance._statistics_values = values
+    if not created and all(
+        previous_values.get(name, DEFERRED) == value for name, value in values.items()
     ):
+        return {}, {}
+    return previous_values, values
+
+
+@receiver(post_save, sender=Aidant)
+@receiver(post_save, sender=Autorisation)
+@receiver(post_save, sender=CarteTOTP)
+@receiver(post_save, sender=HabilitationRequest)
+@receiver(post_save, sender=Mandat)
+@receiver(post_save, sender=TOTPDevice)
+def record_statistics_change(sender, instance, created: bool, **_):
+    previous_values, values = pop_statistics_changes(sender, instance, created)
+    if not values:
         return
 
-    instance.aidant.activity_tracking_warning_at = None
-    instance.aidant.save(update_fields=("activity_tracking_warning_at",))
+    StatisticsChange.record(
+        get_statistics_organisation(sender, instance),
+        get_previous_statistics_organisation(sender, previous_values, values),
+    )
+
+
+@receiver(post_delete, sender=Aidant)
+@receiver(post_delete, sender=Autorisation)
+@receiver(post_delete, sender=CarteTOTP)
+@receiver(post_delete, sender=HabilitationRequest)
+@receiver(post_delete, sender=Mandat)
+@receiver(post_delete, sender=TOTPDevice)
+def record_statistics_change_on_delete(sender, instance, **_):
+    StatisticsChange.record(get_statistics_organisation(sender, instance))
+
+
+@receiver(m2m_changed, sender=Aidant.organisations.through)
+def record_statistics_change_on_aidant_organisations(
+    sender, instance, action: str, reverse: bool, pk_set, **_
+):
+    # `Aidant.save()` adds the current organisation on every save, most often
+    # with nothing to add
+    if action not in ("post_add", "post_remove", "pre_clear") or (
+        action != "pre_clear" and not pk_set
+    ):
+        return
+
+    if reverse:
+        # `instance` is the organisation
+        StatisticsChange.record(instance)
+    elif action == "pre_clear":
+        StatisticsChange.record(*instance.organisations.all())
+    else:
+        StatisticsChange.record(*Organisation.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=Organisation)
+def record_statistics_change_on_organisation(
+    sender, instance: Organisation, created: bool, **_
+):
+    previous_values, values = pop_statistics_changes(sender, instance, created)
+    if not values:
+        return
+
+    # Along with the department the organisation was in before it moved
+    StatisticsChange.record_departments(
+        instance.department_insee_code,
+        previous_values.get("department_insee_code"),
+    )
+
+
+@receiver(post_delete, sender=Organisation)
+def record_statistics_change_on_organisation_delete(
+    sender, instance: Organisation, **_
+):
+    StatisticsChange.record(instance)
 
 
 @receiver(user_logged_in)
@@ -8,21 +8,40 @@ class RemoteConsentWaitingRoom extends BaseController {
         "csrfToken": String,
     }
 
+    connect () {
+        if (this.pollTimeoutValue > 0) this.schedulePoll(0);
+    }
+
+    disconnect () {
+        clearTimeout(this.timeoutId);
+        if (this.abortController) this.abortController.abort();
+    }
+
     poll () {
         const form = new FormData();
         form.set("csrfmiddlewaretoken", this.csrfTokenValue);
 
-        fetch(this.pollValue, {body: form, method: "post"})
+        this.abortController = new AbortController();
+        fetch(this.pollValue, {body: form, method: "post", signal: this.abortController.signal})
             .then(response => response.ok ? response.json() : Promise.reject())
-            .then(result => { if (result.connectionStatus === "OK") window.location.href = this.nextValue; });
+            .then(result => {
+                if (result.connectionStatus === "OK") {
+                    window.location.href = this.nextValue;
+                    return;
+                }
+                // When push is available, the server holds the request until
+                // a response arrives so the next one can be sent right away
+                this.schedulePoll(result.longPoll ? 0 : this.pollTimeoutValue);
+            })
+            .catch(error => {
+                if (error && error.name === "AbortError") return;
+                this.schedulePoll(this.pollTimeoutValue);
+            });
     }
 
-    pollTimeoutValueChanged (value) {
-        if (this.intervalId) clearInterval(this.intervalId);
-        if (value > 0) {
-            clearInterval(this.intervalId);
-            this.intervalId = setInterval(this.poll.bind(this), value);
-        }
+    schedulePoll (delay) {
+        clearTimeout(this.timeoutId);
+        this.timeoutId = setTimeout(this.poll.bind(this), delay);
     }
 }
 
@@ -1,8 +1,23 @@
+from .public import compute_public_statistics
 from .reboarding import compute_reboarding_statistics_and_synchro_grist
-from .statistics import compute_all_statistics, compute_statistics
+from .series import (
+    downsample_statistics_series,
+    get_statistics_series,
+    record_statistics_series,
+)
+from .statistics import (
+    compute_all_statistics,
+    compute_changed_statistics,
+    compute_statistics,
+)
 
 __all__ = [
     compute_all_statistics,
+    compute_changed_statistics,
+    compute_public_statistics,
     compute_reboarding_statistics_and_synchro_grist,
     compute_statistics,
+    downsample_statistics_series,
+    get_statistics_series,
+    record_statistics_series,
 ]
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db.models import Count, Exists, OuterRef
+
+from django_otp.plugins.otp_totp.models import TOTPDevice
+
+from aidants_connect_common.constants import JournalActionKeywords
+
+from ..models import Aidant, Journal, Mandat, Organisation, PublicStatistiques
+
+
+def compute_public_statistics() -> PublicStatistiques:
+    """Computes a new snapshot of the public statistics and drops the older ones.
+
+    If anything fails, the previous snapshot is kept and still served."""
+    autorisation_use_qs = Journal.objects.excluding_staff().filter(
+        action=JournalActionKeywords.USE_AUTORISATION
+    )
+    active_aidants_qs = Aidant.objects.exclude(
+        organisation__name=settings.STAFF_ORGANISATION_NAME
+    ).filter(is_active=True, can_create_mandats=True)
+
+    demarches = list(
+        autorisation_use_qs.values("demarche")
+        .annotate(total=Count("demarche"))
+        .order_by("total")
+        .values_list("demarche", "total")
+    )
+
+    snapshot = PublicStatistiques.objects.create(
+        number_demarches=sum(total for _, total in demarches),
+        number_usagers_helped=autorisation_use_qs.values("usager").distinct().count(),
+        number_mandats=Mandat.objects.exclude(
+            organisation__name=settings.STAFF_ORGANISATION_NAME
+        ).count(),
+        number_accredited_aidants=active_aidants_qs.filter(
+            Exists(TOTPDevice.objects.filter(user_id=OuterRef("pk")))
+        ).count(),
+        number_future_aidants=active_aidants_qs.filter(carte_totp__isnull=True).count(),
+        number_accredited_organisations=Organisation.objects.accredited()
+        .exclude(name=settings.STAFF_ORGANISATION_NAME)
+        .count(),
+        number_future_organisations=Organisation.objects.not_yet_accredited()
+        .exclude(name=settings.STAFF_ORGANISATION_NAME)
+        .count(),
+        demarches=demarches,
+    )
+    PublicStatistiques.objects.filter(pk__lt=snapshot.pk).delete()
+
+    return snapshot
@@ -1,12 +1,39 @@
+import time
+from collections import defaultdict
+from itertools import groupby
+from logging import getLogger
+from operator import attrgetter
+
 from django.conf import settings
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, Q
 from django.utils.timezone import datetime, timedelta
 
 from grist_api import GristDocAPI
+from requests import RequestException
 
 from aidants_connect_common.constants import JournalActionKeywords
 
-from ..models import Aidant, Journal, ReboardingAidantStatistiques
+from ..models import Aidant, Journal, ReboardingAidantStatistiques, StatisticsChange
+
+logger = getLogger()
+
+REBOARDING_TABLE_NAME = "Version_finale_webinaire_rattrapage_1_"
+
+REBOARDING_STATISTICS_FIELDS = [
+    "connexions_before_reboarding",
+    "connexions_j30_after",
+    "connexions_j90_after",
+    "created_mandats_before_reboarding",
+    "created_mandats_j30_after",
+    "created_mandats_j90_after",
+    "demarches_before_reboarding",
+    "demarches_j30_after",
+    "demarches_j90_after",
+    "usagers_before_reboarding",
+    "usagers_j30_after",
+    "usagers_j90_after",
+]
 
 
 def get_date_from_grist_string(date_string):
@@ -22,130 +49,187 @@ def compute_reboarding_statistics_and_synchro_grist():
     api_grist = GristDocAPI(doc_id, api_key, server=server)
     reboarding_rable = api_grist.fetch_table(table_id)
 
+    # Grist row ids of each reboarding session, identified by the aidant's email
+    # and the date of the session
+    sessions: dict[tuple, list[int]] = defaultdict(list)
     for one_row in reboarding_rable:
         if one_row.Date_webinaire is not None:
             if isinstance(one_row.Date_webinaire, int):
                 date_reboarding = datetime.fromtimestamp(one_row.Date_webinaire).date()
             else:
-                date_reboarding = datetime.strptime(
-                    one_row.Date_webinaire, "['%Y-%m-%d %H:%M']"
-                )
+                date_reboarding = get_date_from_grist_string(
+                    one_row.Date_webinaire
+                ).date()
 
             email_aidant = (
                 one_row.Email_renseigner_celui_utilise_lors_de_l_habilitation_Aidants_Connect_  # noqa
             )
-            aidant = Aidant.objects.filter(email=email_aidant).first()
-            if aidant:
-                (
-                    reboarding_stats,
-                    created,
-                ) = ReboardingAidantStatistiques.objects.get_or_create(
-                    aidant=aidant, reboarding_session_date=date_reboarding
-                )
-
-                if created:
-                    if aidant.deactivation_warning_at:
-                        reboarding_stats.warning_date = aidant.deactivation_warning_at
-                        aidant.deactivation_warning_at = None
-                        aidant.save()
-                        reboarding_stats.save()
-
-                reboarding_stats = compute_reboarding_statistics_for_aidant(
-                    reboarding_stats
-                )
-                synchro_grist_data(api_grist, one_row.id, reboarding_stats)
-
-
-def synchro_grist_data(
-    api_grist: GristDocAPI, row_id: int, stats: ReboardingAidantStatistiques
-):
-    dict_update_grist = {"id": row_id}
-
-    dict_update_grist["Avant_session_nombre_connexions"] = (
-        stats.connexions_before_reboarding
+            sessions[email_aidant, date_reboarding].append(one_row.id)
+
+    aidants = {
+        aidant.email: aidant
+        for aidant in Aidant.objects.select_related("organisation").filter(
+            email__in={email for email, _ in sessions}
+        )
+    }
+    sessions = {
+        (aidants[email], date_reboarding): row_ids
+        for (email, date_reboarding), row_ids in sessions.items()
+        if email in aidants
+    }
+
+    with transaction.atomic():
+        all_stats = get_or_create_reboarding_statistics(list(sessions))
+        compute_reboarding_statistics(all_stats.values())
+        ReboardingAidantStatistiques.objects.bulk_update(
+            all_stats.values(), ["warning_date", *REBOARDING_STATISTICS_FIELDS]
+        )
+
+    update_grist_records(
+        api_grist,
+        REBOARDING_TABLE_NAME,
+        [
+            get_grist_record(row_id, all_stats[aidant.pk, date_reboarding])
+            for (aidant, date_reboarding), row_ids in sessions.items()
+            for row_id in row_ids
+        ],
     )
-    dict_update_grist["J30_nombre_connexions"] = stats.connexions_j30_after
-    dict_update_grist["J90_nombre_connexions"] = stats.connexions_j90_after
 
-    dict_update_grist["Avant_session_nombre_de_mandats_crees"] = (
-        stats.created_mandats_before_reboarding
-    )
-    dict_update_grist["J30_nombre_de_mandats_crees"] = stats.created_mandats_j30_after
-    dict_update_grist["J90_nombre_de_mandats_crees"] = stats.created_mandats_j90_after
-
-    dict_update_grist["Avant_session_nombre_de_demarches_realisees"] = (
-        stats.demarches_before_reboarding
-    )
-    dict_update_grist["J30_nombre_de_demarches_realisees"] = stats.demarches_j30_after
-    dict_update_grist["J90_nombre_de_demarches_realisees"] = stats.demarches_j90_after
 
-    dict_update_grist["Avant_session_nombre_usagers_accompagnes"] = (
-        stats.usagers_before_reboarding
+def get_or_create_reboarding_statistics(
+    sessions: list[tuple[Aidant, datetime]],
+) -> dict[tuple[int, datetime], ReboardingAidantStatistiques]:
+    """
+    :param sessions: aidants and the dates of their reboarding session
+    :returns: the statistics of each session, by aidant id and date
+    """
+    all_stats = {
+        (stats.aidant_id, stats.reboarding_session_date): stats
+        for stats in ReboardingAidantStatistiques.objects.filter(
+            aidant__in={aidant for aidant, _ in sessions}
+        )
+    }
+    new_stats = ReboardingAidantStatistiques.objects.bulk_create(
+        ReboardingAidantStatistiques(aidant=aidant, reboarding_session_date=date)
+        for aidant, date in sessions
+        if (aidant.pk, date) not in all_stats
     )
-    dict_update_grist["J30_nombre_usagers_accompagnes"] = stats.usagers_j30_after
-    dict_update_grist["J90_nombre_usagers_accompagnes"] = stats.usagers_j90_after
 
-    api_grist.update_records(
-        "Version_finale_webinaire_rattrapage_1_", [dict_update_grist]
-    )
+    # The aidants warned about their inactivity are no longer warned once they
+    # followed a reboarding session
+    warned_aidants = [
+        stats.aidant for stats in new_stats if stats.aidant.deactivation_warning_at
+    ]
+    for stats in new_stats:
+        if stats.aidant.deactivation_warning_at:
+            stats.warning_date = stats.aidant.deactivation_warning_at
+        all_stats[stats.aidant_id, stats.reboarding_session_date] = stats
+    if warned_aidants:
+        Aidant.objects.filter(pk__in=[aidant.pk for aidant in warned_aidants]).update(
+            deactivation_warning_at=None
+        )
+        for aidant in warned_aidants:
+            aidant.deactivation_warning_at = None
+        StatisticsChange.record(*(aidant.organisation for aidant in warned_aidants))
+
+    return all_stats
+
+
+def compute_reboarding_statistics(all_stats):
+    """Computes the figures of each statistics of `all_stats`, with one query per
+    reboarding session date. The statistics are not saved."""
+    by_date = attrgetter("reboarding_session_date")
+    for boarding_date, date_stats in groupby(sorted(all_stats, key=by_date), by_date):
+        date_stats = list(date_stats)
+        date_j30 = boarding_date + timedelta(days=30)
+        date_j90 = boarding_date + timedelta(days=90)
+        before = Q(creation_date__lte=boarding_date)
+        q_30 = Q(creation_date__gte=boarding_date) & Q(creation_date__lte=date_j30)
+        q_90 = Q(creation_date__gte=boarding_date) & Q(creation_date__lte=date_j90)
+        connexion = Q(action=JournalActionKeywords.CONNECT_AIDANT)
+        mandat = Q(action=JournalActionKeywords.CREATE_ATTESTATION)
+        demarche = Q(action=JournalActionKeywords.USE_AUTORISATION)
+
+        figures = {
+            row.pop("aidant_id"): row
+            for row in Journal.objects.filter(
+                connexion | mandat | demarche,
+                aidant__in=[stats.aidant_id for stats in date_stats],
+            )
+            .values("aidant_id")
+            .annotate(
+                connexions_before_reboarding=Count("pk", filter=connexion & before),
+                connexions_j30_after=Count("pk", filter=connexion & q_30),
+                connexions_j90_after=Count("pk", filter=connexion & q_90),
+                created_mandats_before_reboarding=Count("pk", filter=mandat & before),
+                created_mandats_j30_after=Count("pk", filter=mandat & q_30),
+                created_mandats_j90_after=Count("pk", filter=mandat & q_90),
+                demarches_before_reboarding=Count("pk", filter=demarche & before),
+                demarches_j30_after=Count("pk", filter=demarche & q_30),
+                demarches_j90_after=Count("pk", filter=demarche & q_90),
+                usagers_before_reboarding=Count(
+                    "usager", filter=demarche & before, distinct=True
+                ),
+                usagers_j30_after=Count(
+                    "usager", filter=demarche & q_30, distinct=True
+                ),
+                usagers_j90_after=Count(
+                    "usager", filter=demarche & q_90, distinct=True
+                ),
+            )
+        }
+        for stats in date_stats:
+            aidant_figures = figures.get(stats.aidant_id, {})
+            for name in REBOARDING_STATISTICS_FIELDS:
+                setattr(stats, name, aidant_figures.get(name, 0))
 
 
 def compute_reboarding_statistics_for_aidant(
     stats: ReboardingAidantStatistiques,
 ) -> ReboardingAidantStatistiques:
-    aidant = stats.aidant
-    boarding_date = stats.reboarding_session_date
-    date_j30 = boarding_date + timedelta(days=30)
-    date_j90 = boarding_date + timedelta(days=90)
-    q_30 = Q(creation_date__gte=boarding_date) & Q(creation_date__lte=date_j30)
-    q_90 = Q(creation_date__gte=boarding_date) & Q(creation_date__lte=date_j90)
-
-    qs_connexion = Journal.objects.filter(
-        action=JournalActionKeywords.CONNECT_AIDANT, aidant=aidant
-    )
-    qs_mandats = Journal.objects.filter(
-        action=JournalActionKeywords.CREATE_ATTESTATION, aidant=aidant
-    )
-    qs_demarches = Journal.objects.filter(
-        action=JournalActionKeywords.USE_AUTORISATION, aidant=aidant
-    )
-    qs_usagers = Journal.objects.filter(
-        action=JournalActionKeywords.USE_AUTORISATION, aidant=aidant
-    )
-
-    stats.connexions_before_reboarding = qs_connexion.filter(
-        creation_date__lte=boarding_date
-    ).count()
-    stats.connexions_j30_after = qs_connexion.filter(q_30).count()
-    stats.connexions_j90_after = qs_connexion.filter(q_90).count()
-
-    stats.created_mandats_before_reboarding = qs_mandats.filter(
-        creation_date__lte=boarding_date
-    ).count()
-    stats.created_mandats_j30_after = qs_mandats.filter(q_30).count()
-    stats.created_mandats_j90_after = qs_mandats.filter(q_90).count()
-
-    stats.demarches_before_reboarding = qs_demarches.filter(
-        creation_date__lte=boarding_date
-    ).count()
-    stats.demarches_j30_after = qs_demarches.filter(q_30).count()
-    stats.demarches_j90_after = qs_demarches.filter(q_90).count()
-
-    nb_b = (
-        qs_usagers.filter(creation_date__lte=boarding_date)
-        .values_list("usager_id", flat=True)
-        .distinct()
-        .count()
-    )
-    nb_j30 = (
-        qs_usagers.filter(q_30).values_list("usager_id", flat=True).distinct().count()
-    )
-    nb_j90 = (
-        qs_usagers.filter(q_90).values_list("usager_id", flat=True).distinct().count()
-    )
-    stats.usagers_before_reboarding = nb_b
-    stats.usagers_j30_after = nb_j30
-    stats.usagers_j90_after = nb_j90
-
+    compute_reboarding_statistics([stats])
     stats.save()
     return stats
+
+
+def get_grist_record(row_id: int, stats: ReboardingAidantStatistiques) -> dict:
+    return {
+        "id": row_id,
+        "Avant_session_nombre_connexions": stats.connexions_before_reboarding,
+        "J30_nombre_connexions": stats.connexions_j30_after,
+        "J90_nombre_connexions": stats.connexions_j90_after,
+        "Avant_session_nombre_de_mandats_crees": (
+            stats.created_mandats_before_reboarding
+        ),
+        "J30_nombre_de_mandats_crees": stats.created_mandats_j30_after,
+        "J90_nombre_de_mandats_crees": stats.created_mandats_j90_after,
+        "Avant_session_nombre_de_demarches_realisees": (
+            stats.demarches_before_reboarding
+        ),
+        "J30_nombre_de_demarches_realisees": stats.demarches_j30_after,
+        "J90_nombre_de_demarches_realisees": stats.demarches_j90_after,
+        "Avant_session_nombre_usagers_accompagnes": stats.usagers_before_reboarding,
+        "J30_nombre_usagers_accompagnes": stats.usagers_j30_after,
+        "J90_nombre_usagers_accompagnes": stats.usagers_j90_after,
+    }
+
+
+def update_grist_records(api_grist: GristDocAPI, table_name: str, records: list):
+    """Updates `records` in chunks of `settings.GRIST_UPDATE_CHUNK_SIZE` rows,
+    retrying each chunk up to `settings.GRIST_UPDATE_MAX_ATTEMPTS` times"""
+    chunk_size = settings.GRIST_UPDATE_CHUNK_SIZE
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start : start + chunk_size]
+        for attempt in range(settings.GRIST_UPDATE_MAX_ATTEMPTS):
+            try:
+                api_grist.update_records(table_name, chunk)
+                break
+            except RequestException:
+                if attempt + 1 == settings.GRIST_UPDATE_MAX_ATTEMPTS:
+                    raise
+                logger.warning(
+                    f"Updating {len(chunk)} records of Grist table {table_name} "
+                    f"failed, retrying",
+                    exc_info=True,
+                )
+                time.sleep(settings.GRIST_UPDATE_RETRY_DELAY * 2**attempt)
@@ -0,0 +1,113 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Collection, Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import TruncMonth
+from django.utils.timezone import localdate
+
+from dateutil.relativedelta import relativedelta
+
+from ..models import AidantStatistiquesbyDepartment, StatisticsSeries
+
+_UNIQUE_FIELDS = ["departement", "family", "granularity", "date"]
+
+
+def record_statistics_series(
+    dep_stats: Iterable[AidantStatistiquesbyDepartment], day: date | None = None
+):
+    """Records the figures of `dep_stats` as the ones of `day`, today by default,
+    replacing the figures already recorded for this day"""
+    day = day or localdate()
+    StatisticsSeries.objects.bulk_create(
+        [
+            StatisticsSeries(
+                departement_id=stat.departement_id,
+                family=family,
+                granularity=StatisticsSeries.Granularity.DAY,
+                date=day,
+                values={name: getattr(stat, name) for name in figures},
+            )
+            for stat in dep_stats
+            for family, figures in StatisticsSeries.FAMILY_FIGURES.items()
+        ],
+        update_conflicts=True,
+        unique_fields=_UNIQUE_FIELDS,
+        update_fields=["values"],
+    )
+
+
+def downsample_statistics_series(today: date | None = None) -> int:
+    """
+    Replaces the daily figures older than
+    `settings.STATISTICS_SERIES_DAILY_RETENTION_DAYS` with the figures of the last
+    day of their month, and drops the monthly figures older than
+    `settings.STATISTICS_SERIES_MONTHLY_RETENTION_MONTHS`, if set.
+
+    :returns: the number of daily figures downsampled
+    """
+    today = today or localdate()
+    old_days = StatisticsSeries.objects.filter(
+        granularity=StatisticsSeries.Granularity.DAY,
+        date__lt=today
+        - timedelta(days=settings.STATISTICS_SERIES_DAILY_RETENTION_DAYS),
+    )
+
+    with transaction.atomic():
+        # Days downsampled on a previous run are older than these ones, so the
+        # figures of the month are replaced
+        StatisticsSeries.objects.bulk_create(
+            [
+                StatisticsSeries(
+                    departement_id=last_day.departement_id,
+                    family=last_day.family,
+                    granularity=StatisticsSeries.Granularity.MONTH,
+                    date=last_day.month,
+                    values=last_day.values,
+                )
+                for last_day in old_days.annotate(month=TruncMonth("date"))
+                .order_by("departement", "family", "month", "-date")
+                .distinct("departement", "family", "month")
+            ],
+            update_conflicts=True,
+            unique_fields=_UNIQUE_FIELDS,
+            update_fields=["values"],
+        )
+        downsampled, _ = old_days.delete()
+
+        if settings.STATISTICS_SERIES_MONTHLY_RETENTION_MONTHS:
+            StatisticsSeries.objects.filter(
+                granularity=StatisticsSeries.Granularity.MONTH,
+                date__lt=(
+                    today
+                    - relativedelta(
+                        months=settings.STATISTICS_SERIES_MONTHLY_RETENTION_MONTHS
+                    )
+                ).replace(day=1),
+            ).delete()
+
+    return downsampled
+
+
+def get_statistics_series(
+    start: date,
+    end: date,
+    family: StatisticsSeries.Family,
+    departments: Collection[str] | None = None,
+) -> dict[str, list[tuple[date, dict[str, int]]]]:
+    """
+    :param departments: INSEE codes of the departments, all of them by default
+    :returns: for each department, the figures of `family` between `start` and
+        `end`, ordered by date; older figures are monthly
+    """
+    queryset = StatisticsSeries.objects.between(start, end).filter(family=family)
+    if departments is not None:
+        queryset = queryset.filter(departement__in=departments)
+
+    series = defaultdict(list)
+    for department, day, values in queryset.values_list(
+        "departement", "date", "values"
+    ):
+        series[department].append((day, values))
+    return dict(series)
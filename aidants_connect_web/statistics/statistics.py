@@ -1,7 +1,11 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
 from typing import Union
 
 from django.conf import settings
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef, PositiveIntegerField, Q
+from django.utils.timezone import now
 
 from aidants_connect_common.constants import (
     JournalActionKeywords,
@@ -20,26 +24,425 @@ from ..models import (
     Journal,
     Mandat,
     Organisation,
+    StatisticsChange,
 )
+from .series import record_statistics_series
+
+FIGURES = [
+    field.name
+    for field in AidantStatistiques._meta.concrete_fields
+    if isinstance(field, PositiveIntegerField)
+]
+# Figures which depend on the department of two different objects, so they can't be
+# summed up over departments
+CROSS_DEPARTMENT_FIGURES = [
+    "number_aidant_who_have_created_mandat",
+    "number_organisation_with_accredited_aidants",
+]
 
 
 def compute_all_statistics():
-    global_stat = compute_statistics(AidantStatistiques())
-    dep_stats = []
-    region_stats = []
-    for one_dep in Department.objects.all():
-        dep_stats.append(
-            compute_statistics(AidantStatistiquesbyDepartment(departement=one_dep))
+    # Read before the figures: changes recorded later are left for the next run
+    change_ids = list(StatisticsChange.objects.values_list("pk", flat=True))
+    statistics = StatisticsByDepartment()
+
+    with transaction.atomic():
+        global_stat = statistics.fill(AidantStatistiques(is_reconciliation=True))
+        global_stat.save()
+
+        dep_stats = AidantStatistiquesbyDepartment.objects.bulk_create(
+            statistics.fill(
+                AidantStatistiquesbyDepartment(departement=one_dep),
+                {one_dep.insee_code},
+            )
+            for one_dep in Department.objects.all()
         )
 
-    for one_region in Region.objects.all():
-        region_stats.append(
-            compute_statistics(AidantStatistiquesbyRegion(region=one_region))
+        region_stats = AidantStatistiquesbyRegion.objects.bulk_create(
+            statistics.fill(
+                AidantStatistiquesbyRegion(region=one_region),
+                {dep.insee_code for dep in one_region.department.all()},
+            )
+            for one_region in Region.objects.prefetch_related("department")
         )
 
+        record_statistics_series(dep_stats)
+        StatisticsChange.objects.filter(pk__in=change_ids).delete()
+
     return [global_stat] + dep_stats + region_stats
 
 
+def compute_changed_statistics():
+    """
+    Same as `compute_all_statistics`, only recomputing the regions in which a
+    department recorded a change (see `StatisticsChange`) since the last snapshot.
+    The figures of the other regions and departments are copied from the last
+    snapshot, and the national figures are updated with the difference.
+
+    Changes may go unrecorded, when objects are updated in bulk or are outside any
+    department, so everything is recomputed when the last full computation is older
+    than `settings.STATISTICS_RECONCILIATION_DAYS`.
+    """
+    started_at = now()
+    last_stat = AidantStatistiques.objects.order_by("-created_at").first()
+    last_reconciliation = AidantStatistiques.objects.filter(
+        is_reconciliation=True
+    ).aggregate(date=Max("created_at"))["date"]
+    if (
+        last_stat is None
+        or last_reconciliation is None
+        or started_at - last_reconciliation
+        >= timedelta(days=settings.STATISTICS_RECONCILIATION_DAYS)
+    ):
+        return compute_all_statistics()
+
+    # Read before the figures: changes recorded later are left for the next run
+    change_ids, changes = set(), set()
+    for pk, code in StatisticsChange.objects.values_list("pk", "department_insee_code"):
+        change_ids.add(pk)
+        changes.add(code)
+    last_dep_stats = {
+        stat.departement_id: stat
+        for stat in AidantStatistiquesbyDepartment.objects.order_by(
+            "departement", "-created_at"
+        ).distinct("departement")
+    }
+    last_region_stats = {
+        stat.region_id: stat
+        for stat in AidantStatistiquesbyRegion.objects.order_by(
+            "region", "-created_at"
+        ).distinct("region")
+    }
+    regions = {
+        region: {dep.insee_code for dep in region.department.all()}
+        for region in Region.objects.prefetch_related("department")
+    }
+    # Figures of a region depend on all of its departments
+    changed_regions = {
+        region
+        for region, departments in regions.items()
+        if region.insee_code not in last_region_stats
+        or not departments.isdisjoint(changes)
+        or not departments.issubset(last_dep_stats)
+    }
+    changed_departments = set().union(*(regions[region] for region in changed_regions))
+    statistics = StatisticsByDepartment(changed_departments)
+
+    def copy(source, ostat):
+        for name in FIGURES:
+            setattr(ostat, name, getattr(source, name))
+        return ostat
+
+    with transaction.atomic():
+        dep_stats = AidantStatistiquesbyDepartment.objects.bulk_create(
+            (
+                statistics.fill(
+                    AidantStatistiquesbyDepartment(departement_id=code), {code}
+                )
+                if code in changed_departments
+                else copy(
+                    last_dep_stats[code],
+                    AidantStatistiquesbyDepartment(departement_id=code),
+                )
+            )
+            for departments in regions.values()
+            for code in sorted(departments)
+        )
+
+        region_stats = AidantStatistiquesbyRegion.objects.bulk_create(
+            (
+                statistics.fill(AidantStatistiquesbyRegion(region=region), departments)
+                if region in changed_regions
+                else copy(
+                    last_region_stats[region.insee_code],
+                    AidantStatistiquesbyRegion(region=region),
+                )
+            )
+            for region, departments in regions.items()
+        )
+
+        global_stat = copy(last_stat, AidantStatistiques(is_reconciliation=False))
+        for stat in dep_stats:
+            if stat.departement_id not in changed_departments:
+                continue
+            last_dep_stat = last_dep_stats.get(stat.departement_id)
+            for name in FIGURES:
+                if name not in CROSS_DEPARTMENT_FIGURES:
+                    setattr(
+                        global_stat,
+                        name,
+                        getattr(global_stat, name)
+                        + getattr(stat, name)
+                        - (getattr(last_dep_stat, name) if last_dep_stat else 0),
+                    )
+        statistics.fill_national_cross_department_figures(global_stat)
+        global_stat.save()
+
+        record_statistics_series(dep_stats)
+        StatisticsChange.objects.filter(pk__in=change_ids).delete()
+
+    return [global_stat] + dep_stats + region_stats
+
+
+class StatisticsByDepartment:
+    """Computes the same figures as `compute_statistics` for every department at
+    once, with a few grouped queries. Regional and national figures are derived
+    from the departmental ones.
+
+    When `departments` is given, only the figures of these departments, identified
+    by their INSEE codes, are computed."""
+
+    def __init__(self, departments: set | None = None):
+        self.departments = departments
+        stafforg = settings.STAFF_ORGANISATION_NAME
+        self.ads = ads = Aidant.objects.exclude(organisation__name=stafforg)
+        self.orgas = orgas = Organisation.objects.exclude(name=stafforg)
+        self.operational = operational = Q(is_active=True, can_create_mandats=True)
+        communes_in_zrr = list(
+            Commune.objects.filter(zrr=True).values_list("insee_code", flat=True)
+        )
+
+        # Each counter maps a department INSEE code to the figure for this
+        # department. Objects not attached to any department are counted under
+        # `None` so that they are included in the national figures.
+        self.counters: dict[str, Counter] = {}
+
+        self._count_by(
+            ads,
+            "organisation__department_insee_code",
+            number_aidants=Q(),
+            number_aidants_is_active=Q(is_active=True),
+            number_responsable=Q(is_active=True, can_create_mandats=False),
+            number_aidant_can_create_mandat=operational,
+            number_aidants_without_totp=operational & Q(carte_totp__isnull=True),
+            number_aidant_with_login=operational & Q(last_login__isnull=False),
+            number_operational_aidants=operational & Q(carte_totp__isnull=False),
+            number_trained_aidant_since_begining=Q(can_create_mandats=True),
+            number_aidants_in_zrr=Q(organisation__city_insee_code__in=communes_in_zrr),
+            number_old_aidants_warned=Q(
+                deactivation_warning_at__isnull=False, is_active=True
+            ),
+            number_old_inactive_aidants_warned=Q(
+                deactivation_warning_at__isnull=False, is_active=False
+            ),
+        )
+        # Counted separately since an aidant may have several devices
+        self._count_by(
+            ads.filter(totpdevice__name__startswith=OTP_APP_DEVICE_NAME % ""),
+            "organisation__department_insee_code",
+            number_aidants_with_otp_app=Q(),
+        )
+        self._count_by(
+            HabilitationRequest.objects.all(),
+            "organisation__department_insee_code",
+            number_future_aidant=~Q(
+                status__in=[
+                    ReferentRequestStatuses.STATUS_REFUSED,
+                    ReferentRequestStatuses.STATUS_CANCELLED,
+                    ReferentRequestStatuses.STATUS_VALIDATED,
+                ]
+            ),
+            number_future_trained_aidant=Q(formation_done=True)
+            & ~Q(status=ReferentRequestStatuses.STATUS_VALIDATED),
+        )
+        self._count_by(
+            OrganisationRequest.objects.all(),
+            "organisation__department_insee_code",
+            nb_orga_requests=~Q(status=RequestStatusConstants.VALIDATED.name),
+            nb_validated_orga_requests=Q(status=RequestStatusConstants.VALIDATED.name),
+        )
+        self._count_by(
+            orgas,
+            "department_insee_code",
+            nb_structures=Q(),
+            number_orgas_in_zrr=Q(city_insee_code__in=communes_in_zrr),
+        )
+        self._count_by(
+            orgas.filter(journal_entries__action__in=StatisticsChange.JOURNAL_ACTIONS),
+            "department_insee_code",
+            distinct=True,
+            number_organisation_with_at_least_one_ac_usage=Q(),
+        )
+        self._count_by(
+            Journal.objects.filter(action=JournalActionKeywords.USE_AUTORISATION),
+            "organisation__department_insee_code",
+            number_usage_of_ac=Q(),
+        )
+        self._count_by(
+            Mandat.objects.seperatly_revoked(),
+            "organisation__department_insee_code",
+            revoked_mandats=Q(),
+        )
+
+        # The following figures depend on the department of two different objects
+        # so they can't be summed up over departments.
+
+        # Operational aidants who created a mandate, grouped by the department of
+        # their current organisation, with the departments of the organisations in
+        # which they created mandates
+        mandate_departments: dict[int, set] = defaultdict(set)
+        for aidant_id, department in (
+            self._in_departments(
+                Journal.objects.filter(action=JournalActionKeywords.CREATE_ATTESTATION),
+                "aidant__organisation__department_insee_code",
+            )
+            .values_list("aidant_id", "organisation__department_insee_code")
+            .distinct()
+        ):
+            mandate_departments[aidant_id].add(department)
+        self.mandate_creators: dict[str, list[set]] = defaultdict(list)
+        for aidant_id, department in self._in_departments(
+            ads.filter(operational), "organisation__department_insee_code"
+        ).values_list("pk", "organisation__department_insee_code"):
+            if aidant_id in mandate_departments:
+                self.mandate_creators[department].append(mandate_departments[aidant_id])
+
+        # Organisations with accredited aidants, grouped by department, with the
+        # departments of these aidants' current organisation
+        self.accredited_organisations: dict[str, dict[int, set]] = defaultdict(
+            lambda: defaultdict(set)
+        )
+        for organisation_id, department, aidant_department in (
+            self._in_departments(
+                Aidant.organisations.through.objects.filter(
+                    organisation__in=orgas,
+                    aidant__in=ads.filter(operational, carte_totp__isnull=False),
+                ),
+                "organisation__department_insee_code",
+            )
+            .values_list(
+                "organisation_id",
+                "organisation__department_insee_code",
+                "aidant__organisation__department_insee_code",
+            )
+            .distinct()
+        ):
+            self.accredited_organisations[department][organisation_id].add(
+                aidant_department
+            )
+
+    def _in_departments(self, queryset, key: str):
+        if self.departments is None:
+            return queryset
+        return queryset.filter(**{f"{key}__in": self.departments})
+
+    def _count_by(self, queryset, key: str, distinct=False, **counters: Q):
+        for name in counters:
+            self.counters[name] = Counter()
+
+        for row in (
+            self._in_departments(queryset, key)
+            .values(key)
+            .annotate(
+                **{
+                    name: Count("pk", filter=condition, distinct=distinct)
+                    for name, condition in counters.items()
+                }
+            )
+        ):
+            for name in counters:
+                self.counters[name][row[key]] += row[name]
+
+    def _total(self, name: str, departments: set | None) -> int:
+        counter = self.counters[name]
+        if departments is None:
+            return sum(counter.values())
+        return sum(counter[department] for department in departments)
+
+    def fill(
+        self,
+        ostat: Union[
+            AidantStatistiques,
+            AidantStatistiquesbyDepartment,
+            AidantStatistiquesbyRegion,
+        ],
+        departments: set | None = None,
+    ):
+        """Sets the figures of `ostat` for the `departments` whose INSEE codes are
+        given, or for the whole country if `departments` is `None`"""
+        for name in [
+            "number_aidants",
+            "number_aidants_is_active",
+            "number_responsable",
+            "number_aidant_can_create_mandat",
+            "number_aidants_without_totp",
+            "number_aidant_with_login",
+            "number_operational_aidants",
+            "number_future_aidant",
+            "number_trained_aidant_since_begining",
+            "number_future_trained_aidant",
+            "number_organisation_with_at_least_one_ac_usage",
+            "number_usage_of_ac",
+            "number_orgas_in_zrr",
+            "number_aidants_in_zrr",
+            "number_old_aidants_warned",
+            "number_old_inactive_aidants_warned",
+            "number_aidants_with_otp_app",
+            "revoked_mandats",
+        ]:
+            setattr(ostat, name, self._total(name, departments))
+
+        nb_structures = self._total("nb_structures", departments)
+        ostat.number_organisation_requests = nb_structures + self._total(
+            "nb_orga_requests", departments
+        )
+        ostat.number_validated_organisation_requests = nb_structures + self._total(
+            "nb_validated_orga_requests", departments
+        )
+
+        if departments is None:
+            ostat.number_aidant_who_have_created_mandat = sum(
+                len(creators) for creators in self.mandate_creators.values()
+            )
+            ostat.number_organisation_with_accredited_aidants = sum(
+                len(organisations)
+                for organisations in self.accredited_organisations.values()
+            )
+        else:
+            ostat.number_aidant_who_have_created_mandat = sum(
+                1
+                for department in departments
+                for mandate_departments in self.mandate_creators.get(department, [])
+                if not departments.isdisjoint(mandate_departments)
+            )
+            ostat.number_organisation_with_accredited_aidants = sum(
+                1
+                for department in departments
+                for aidant_departments in self.accredited_organisations.get(
+                    department, {}
+                ).values()
+                if not departments.isdisjoint(aidant_departments)
+            )
+
+        return ostat
+
+    def fill_national_cross_department_figures(self, ostat: AidantStatistiques):
+        """Sets the national figures which can't be derived from departmental ones,
+        when only some departments are computed"""
+        ostat.number_aidant_who_have_created_mandat = (
+            self.ads.filter(self.operational)
+            .filter(
+                Exists(
+                    Journal.objects.filter(
+                        action=JournalActionKeywords.CREATE_ATTESTATION,
+                        aidant=OuterRef("pk"),
+                    )
+                )
+            )
+            .count()
+        )
+        ostat.number_organisation_with_accredited_aidants = (
+            Aidant.organisations.through.objects.filter(
+                organisation__in=self.orgas,
+                aidant__in=self.ads.filter(self.operational, carte_totp__isnull=False),
+            )
+            .values("organisation_id")
+            .distinct()
+            .count()
+        )
+        return ostat
+
+
 def compute_statistics(
     ostat: Union[
         AidantStatistiques,
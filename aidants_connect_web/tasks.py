@@ -1,17 +1,19 @@
 import csv
+import gzip
 from collections import defaultdict
 from datetime import timedelta
 from inspect import signature
-from io import StringIO
-from itertools import chain
 from logging import Logger
+from tempfile import TemporaryFile
 from typing import List
 
 from django.conf import settings
+from django.core.files import File
 from django.core.mail import send_mail
-from django.db.models import Count, Q
+from django.db import transaction
+from django.db.models import CharField, Count, Exists, Min, OuterRef, Prefetch, Q, Value
 from django.db.models.constants import LOOKUP_SEP
-from django.db.models.functions import Lower, Trim
+from django.db.models.functions import Cast, Concat, Lower, Trim
 from django.template.defaultfilters import pluralize
 from django.urls import reverse
 from django.utils import timezone
@@ -22,10 +24,24 @@ from celery.app.trace import SUCCESS
 from celery.signals import task_postrun
 from celery.utils.log import get_task_logger
 from django_otp.plugins.otp_static.models import StaticDevice, StaticToken
+from django_otp.plugins.otp_totp.models import TOTPDevice
+from kombu.exceptions import OperationalError
+from phonenumbers import PhoneNumber, PhoneNumberFormat, format_number
+from phonenumbers import parse as parse_phone
+from requests import RequestException
 
 from aidants_connect_common.constants import JournalActionKeywords
-from aidants_connect_common.models import Commune, Department
+from aidants_connect_common.models import Commune, Department, FormationAttendant
 from aidants_connect_common.utils import build_url, model_fields, render_email
+from aidants_connect_common.utils.bulk_email import build_email, send_emails
+from aidants_connect_common.utils.sms_api import SmsApi
+from aidants_connect_web.constants import (
+    OTP_APP_DEVICE_NAME,
+    HabilitationRequestCourseType,
+    OutgoingEmailStatus,
+    ReferentRequestStatuses,
+    SmsStatus,
+)
 from aidants_connect_web.models import (
     Aidant,
     Connection,
@@ -33,15 +49,20 @@ from aidants_connect_web.models import (
     HabilitationRequest,
     Journal,
     Mandat,
+    MandatTransfer,
     Notification,
     Organisation,
+    OutgoingEmail,
+    StatisticsChange,
     Usager,
 )
 from aidants_connect_web.models.other_models import ReferentsFormation
 from aidants_connect_web.models.utils import LiveStormApi
 from aidants_connect_web.statistics import (
-    compute_all_statistics,
+    compute_changed_statistics,
+    compute_public_statistics,
     compute_reboarding_statistics_and_synchro_grist,
+    downsample_statistics_series,
 )
 from aidants_connect_web.synchro_grist.sync_formation import get_formations_from_grist
 from aidants_connect_web.synchro_grist.synchro_attendant import push_attendees_in_grist
@@ -67,6 +88,29 @@ def delete_expired_connections(*, logger=None):
     return deleted_connections_count
 
 
+@shared_task
+def create_journal_partitions(*, logger=None):
+    logger: Logger = logger or get_task_logger(__name__)
+
+    logger.info("Creating journal partitions...")
+    partitions = Journal.ensure_partitions()
+    logger.info(f"Journal partitions available: {', '.join(partitions)}")
+
+    return partitions
+
+
+@shared_task
+def backfill_journal_metadata(*, after: int = 0, batch_size: int = 1000, logger=None):
+    logger: Logger = logger or get_task_logger(__name__)
+
+    # Entries already converted are skipped, so an interrupted backfill can simply be
+    # started again, optionally from the last id it logged.
+    logger.info("Backfilling journal metadata...")
+    while (after := Journal.backfill_metadata(after, batch_size)) is not None:
+        logger.info(f"Journal metadata backfilled up to entry #{after}")
+    logger.info("Journal metadata backfill done")
+
+
 @shared_task
 def delete_duplicated_static_tokens(*, logger=None):
     logger: Logger = logger or get_task_logger(__name__)
@@ -106,6 +150,20 @@ def get_recipient_list_for_organisation(organisation):
     )
 
 
+def dispatch_in_batches(task, items: list, *, logger=None):
+    """
+    Splits items in batches of `settings.BULK_EMAIL_BATCH_SIZE`, each processed by
+    its own `task` subtask.
+    """
+    size = settings.BULK_EMAIL_BATCH_SIZE
+    for start in range(0, len(items), size):
+        batch = items[start : start + size]
+        if settings.BULK_EMAIL_ASYNC_DISPATCH:
+            task.delay(batch)
+        else:
+            task.apply((batch,), {"logger": logger}, throw=True)
+
+
 @shared_task
 def notify_soon_expired_mandates():
     mandates_qset = Mandat.find_soon_expired(settings.MANDAT_EXPIRED_SOON)
@@ -202,15 +260,16 @@ def notify_new_habilitation_requests(*, logger=None):
         },
     )
 
-    send_mail(
+    message = build_email(
         from_email=settings.DEFAULT_FROM_EMAIL,
         recipient_list=recipient_list,
         subject=(
             f"[Aidants Connect] {habilitation_requests_count} nouveaux aidants à former"
         ),
-        message=text_message,
+        text_message=text_message,
         html_message=html_message,
     )
+    send_emails([("new_habilitation_requests", message)], logger=logger)
 
 
 @shared_task()
@@ -256,18 +315,33 @@ def notify_no_totp_workers():
 
             workers_without_totp_dict[manager_email]["users"].append(item)
 
-    for manager_email, context in workers_without_totp_dict.items():
-        text_message, html_message = render_email(
-            "email/notify_no_totp_workers.mjml", context
-        )
+    dispatch_in_batches(
+        notify_no_totp_workers_batch, list(workers_without_totp_dict.items())
+    )
 
-        send_mail(
-            from_email=settings.WORKERS_NO_TOTP_NOTIFY_EMAIL_FROM,
-            recipient_list=[manager_email],
-            subject=settings.WORKERS_NO_TOTP_NOTIFY_EMAIL_SUBJECT,
-            message=text_message,
-            html_message=html_message,
-        )
+
+@shared_task(rate_limit=settings.BULK_EMAIL_BATCH_RATE_LIMIT)
+def notify_no_totp_workers_batch(notifications: list[tuple[str, dict]], *, logger=None):
+    logger: Logger = logger or get_task_logger(__name__)
+
+    def build_emails():
+        for manager_email, context in notifications:
+            text_message, html_message = render_email(
+                "email/notify_no_totp_workers.mjml", context
+            )
+            yield manager_email, build_email(
+                from_email=settings.WORKERS_NO_TOTP_NOTIFY_EMAIL_FROM,
+                recipient_list=[manager_email],
+                subject=settings.WORKERS_NO_TOTP_NOTIFY_EMAIL_SUBJECT,
+                text_message=text_message,
+                html_message=html_message,
+            )
+
+    report = send_emails(build_emails(), logger=logger)
+    logger.info(
+        f"Notified {len(report.sent)} referents of aidants without TOTP card, "
+        f"{len(report.failed)} failed"
+    )
 
 
 @shared_task
@@ -275,7 +349,24 @@ def compute_aidants_statistics(*, logger=None):
     logger: Logger = logger or get_task_logger(__name__)
 
     logger.info("Compute Aidants Stastistics...")
-    compute_all_statistics()
+    global_stat = compute_changed_statistics()[0]
+    logger.info(
+        "Aidants statistics computed"
+        f"{' from scratch' if global_stat.is_reconciliation else ''} "
+        f"@ {global_stat.created_at}"
+    )
+    downsampled = downsample_statistics_series()
+    logger.info(f"Downsampled {downsampled} daily statistics to monthly ones")
+
+
+@shared_task
+def refresh_public_statistics(*, logger=None):
+    logger: Logger = logger or get_task_logger(__name__)
+
+    # On failure, the public page keeps on serving the previous snapshot
+    logger.info("Refreshing public statistics...")
+    snapshot = compute_public_statistics()
+    logger.info(f"Public statistics refreshed @ {snapshot.created_at}")
 
 
 @shared_task
@@ -310,15 +401,16 @@ def email_welcome_aidant(aidant_email: str, *, logger=None):
         },
     )
 
-    send_mail(
+    OutgoingEmail.enqueue(
         from_email=settings.EMAIL_WELCOME_AIDANT_FROM,
         subject=settings.EMAIL_WELCOME_AIDANT_SUBJECT,
         recipient_list=[aidant_email],
         message=text_message,
         html_message=html_message,
+        dedup_key="welcome_aidant",
     )
 
-    logger.info(f"Welcome email sent to {aidant_email}")
+    logger.info(f"Welcome email queued for {aidant_email}")
 
 
 @shared_task
@@ -328,40 +420,63 @@ def email_old_aidants(*, logger=None):
 
     logger: Logger = logger or get_task_logger(__name__)
 
-    aidants = Aidant.objects.deactivation_warnable().all()
+    aidants_ids = list(
+        Aidant.objects.deactivation_warnable().values_list("pk", flat=True)
+    )
 
     logger.info(
-        f"Sending warning notice for {len(aidants)} aidants not connected recently"
+        f"Sending warning notice for {len(aidants_ids)} aidants "
+        "not connected recently"
     )
 
-    for aidant in aidants:
-        text_message, html_message = render_email(
-            "email/old_aidant_deactivation_warning.mjml",
-            {
-                "email_title": "Votre compte va être désactivé, réagissez !",
-                "user": aidant,
-                "webinaire_sub_form": settings.WEBINAIRE_SUBFORM_URL,
-            },
-        )
+    dispatch_in_batches(email_old_aidants_batch, aidants_ids, logger=logger)
 
-        send_mail(
-            from_email=settings.EMAIL_AIDANT_DEACTIVATION_WARN_FROM,
-            subject=settings.EMAIL_AIDANT_DEACTIVATION_WARN_SUBJECT,
-            recipient_list=[aidant.email],
-            message=text_message,
-            html_message=html_message,
-        )
 
-        aidant.deactivation_warning_at = timezone.now()
-        aidant.save()
+@shared_task(rate_limit=settings.BULK_EMAIL_BATCH_RATE_LIMIT)
+def email_old_aidants_batch(aidants_ids: list[int], *, logger=None):
+    logger: Logger = logger or get_task_logger(__name__)
 
+    # Aidants warned since the batch was queued are skipped
+    aidants = {
+        aidant.pk: aidant
+        for aidant in Aidant.objects.deactivation_warnable()
+        .filter(pk__in=aidants_ids)
+        .select_related("organisation")
+    }
+
+    def build_emails():
+        for aidant in aidants.values():
+            text_message, html_message = render_email(
+                "email/old_aidant_deactivation_warning.mjml",
+                {
+                    "email_title": "Votre compte va être désactivé, réagissez !",
+                    "user": aidant,
+                    "webinaire_sub_form": settings.WEBINAIRE_SUBFORM_URL,
+                },
+            )
+            yield aidant.pk, build_email(
+                from_email=settings.EMAIL_AIDANT_DEACTIVATION_WARN_FROM,
+                subject=settings.EMAIL_AIDANT_DEACTIVATION_WARN_SUBJECT,
+                recipient_list=[aidant.email],
+                text_message=text_message,
+                html_message=html_message,
+            )
+
+    report = send_emails(build_emails(), logger=logger)
+
+    Aidant.objects.filter(pk__in=report.sent).update(
+        deactivation_warning_at=timezone.now()
+    )
+    StatisticsChange.record(*(aidants[pk].organisation for pk in report.sent))
+
+    for pk in report.sent:
         logger.info(
-            f"Sent warning notice for aidant {aidant.get_full_name()} "
+            f"Sent warning notice for aidant {aidants[pk].get_full_name()} "
             "not connected recently"
         )
 
     logger.info(
-        f"Sent warning notice for {len(aidants)} aidants not connected recently"
+        f"Sent warning notice for {len(report.sent)} aidants not connected recently"
     )
 
 
@@ -372,32 +487,52 @@ def deactivate_warned_aidants(*, logger=None):
 
     logger: Logger = logger or get_task_logger(__name__)
 
-    @shared_task
-    def email_one_aidant(a: Aidant):
-        text_message, html_message = render_email(
-            "email/old_aidant_deactivation_notice.mjml",
-            {
-                "email_title": "Votre compte a été désactivé",
-                "user": a,
-                "cgu_url": build_url(reverse("cgu")),
-            },
-        )
+    aidants_ids = list(Aidant.objects.deactivable().values_list("pk", flat=True))
 
-        send_mail(
-            from_email=settings.EMAIL_AIDANT_DEACTIVATION_NOTICE_FROM,
-            subject=settings.EMAIL_AIDANT_DEACTIVATION_NOTICE_SUBJECT,
-            recipient_list=[a.email],
-            message=text_message,
-            html_message=html_message,
-        )
+    logger.info(f"Deactivating {len(aidants_ids)} aidants")
 
-    deactivable = Aidant.objects.deactivable()
+    dispatch_in_batches(deactivate_warned_aidants_batch, aidants_ids, logger=logger)
 
-    for aidant in deactivable:
-        aidant.deactivate()
-        email_one_aidant(aidant)
 
-    logger.info(f"Deactivated {len(deactivable)} aidants")
+@shared_task(rate_limit=settings.BULK_EMAIL_BATCH_RATE_LIMIT)
+def deactivate_warned_aidants_batch(aidants_ids: list[int], *, logger=None):
+    logger: Logger = logger or get_task_logger(__name__)
+
+    aidants = list(
+        Aidant.objects.deactivable()
+        .filter(pk__in=aidants_ids)
+        .select_related("organisation")
+    )
+    Aidant.objects.filter(pk__in=[aidant.pk for aidant in aidants]).update(
+        is_active=False
+    )
+    # The bulk update sends no post_save signal
+    StatisticsChange.record(*(aidant.organisation for aidant in aidants))
+
+    def build_emails():
+        for aidant in aidants:
+            text_message, html_message = render_email(
+                "email/old_aidant_deactivation_notice.mjml",
+                {
+                    "email_title": "Votre compte a été désactivé",
+                    "user": aidant,
+                    "cgu_url": build_url(reverse("cgu")),
+                },
+            )
+            yield aidant.pk, build_email(
+                from_email=settings.EMAIL_AIDANT_DEACTIVATION_NOTICE_FROM,
+                subject=settings.EMAIL_AIDANT_DEACTIVATION_NOTICE_SUBJECT,
+                recipient_list=[aidant.email],
+                text_message=text_message,
+                html_message=html_message,
+            )
+
+    report = send_emails(build_emails(), logger=logger)
+
+    logger.info(
+        f"Deactivated {len(aidants)} aidants, "
+        f"{len(report.failed)} of which could not be notified"
+    )
 
 
 @shared_task
@@ -460,11 +595,17 @@ def export_for_bizdevs(request_pk: int, *, logger=None) -> str:
             "organisation__nb_usager",
         )
 
-        def __init__(self, a: Aidant):
+        def __init__(self, a: Aidant, page: "Page"):
             self.aidant = a
+            self.page = page
+            self.journal = page.journal_counts.get(a.pk, {})
+            self.habilitation_requests = page.habilitation_requests.get(a.email, [])
+
+        def _first_habilitation_request(self, predicate=lambda hr: True):
+            return next(filter(predicate, self.habilitation_requests), None)
 
         def referent(self):
-            return self.aidant.responsable_de.exists()
+            return self.aidant.export_is_referent
 
         referent.csv_column = "Est référent"
 
@@ -474,29 +615,33 @@ def export_for_bizdevs(request_pk: int, *, logger=None) -> str:
         last_modification_date.csv_column = "Derniere Modification Aidant"
 
         def course_type(self):
-            return self.aidant.get_course_type
+            hr = self._first_habilitation_request(
+                lambda hr: hr.status == ReferentRequestStatuses.STATUS_VALIDATED
+            )
+            if hr and hr.course_type in HabilitationRequestCourseType.values:
+                return HabilitationRequestCourseType(hr.course_type).label
+            return ""
 
         course_type.csv_column = "Type de Parcours"
 
         def connexion_mode_choosed(self):
-            return self.aidant.connexion_mode
+            hr = self._first_habilitation_request(lambda hr: hr.connexion_mode != "")
+            return hr.connexion_mode_label if hr else ""
 
         connexion_mode_choosed.csv_column = "Moyen de connexion choisi"
 
         def connexion_mode_activated(self):
             if self.aidant.has_a_carte_totp:
                 return HabilitationRequest.CONNEXION_MODE_CARD
-            if self.aidant.has_otp_app:
+            if self.has_otp_app():
                 return HabilitationRequest.CONNEXION_MODE_PHONE
             return ""
 
         connexion_mode_activated.csv_column = "Moyen de connexion Activé"
 
         def formation_date(self):
-            hr = (
-                HabilitationRequest.objects.filter(email=self.aidant.email)
-                .exclude(date_formation__isnull=True)
-                .first()
+            hr = self._first_habilitation_request(
+                lambda hr: hr.date_formation is not None
             )
             if hr:
                 return hr.date_formation.strftime("%d-%m-%Y")
@@ -505,16 +650,11 @@ def export_for_bizdevs(request_pk: int, *, logger=None) -> str:
         formation_date.csv_column = "Date de formation"
 
         def formation_organisation(self):
-            try:
-                from aidants_connect_common.models import FormationAttendant
-
-                hr = HabilitationRequest.objects.filter(email=self.aidant.email).first()
-                if hr:
-                    fa = FormationAttendant.objects.filter(attendant=hr).first()
-                    if fa and fa.formation and fa.formation.organisation:
-                        return fa.formation.organisation.name
-            except Exception:
-                return "ERREUR"
+            hr = self._first_habilitation_request()
+            if hr:
+                fa = next(iter(hr.formations.all()), None)
+                if fa and fa.formation and fa.formation.organisation:
+                    return fa.formation.organisation.name
             return "NC"
 
         formation_organisation.csv_column = "Nom Organisme de formation"
@@ -554,84 +694,53 @@ def export_for_bizdevs(request_pk: int, *, logger=None) -> str:
         totp_card_drifted.csv_column = "Importance de décalage de la carte"
 
         def totp_card_date_activated(self):
-            try:
-                Journal.objects.filter(
-                    action=JournalActionKeywords.CARD_ASSOCIATION, aidant=self.aidant
-                ).order_by("creation_date")[0].creation_date
-            except (Journal.DoesNotExist, IndexError):
-                return None
+            return self.journal.get("totp_card_date_activated")
 
         totp_card_date_activated.csv_column = "Date activation carte TOTP"
 
         def has_otp_app(self):
-            return self.aidant.has_otp_app
+            return self.aidant.export_has_otp_app
 
         has_otp_app.csv_column = "App OTP"
 
         def has_connected_once(self):
-            return Journal.objects.filter(
-                aidant=self.aidant, action=JournalActionKeywords.CONNECT_AIDANT
-            ).exists()
+            return self.journal.get("nb_connections", 0) > 0
 
         has_connected_once.csv_column = "S'est connecté⋅e au moins 1 fois"
 
         def nb_mandat_created(self):
-            return Journal.objects.filter(
-                aidant=self.aidant,
-                action=JournalActionKeywords.CREATE_ATTESTATION,
-            ).count()
+            return self.journal.get("nb_mandat_created", 0)
 
         nb_mandat_created.csv_column = "Nombre de mandats créés"
 
         def nb_mandat_remote_created(self):
-            return Journal.objects.filter(
-                aidant=self.aidant,
-                action=JournalActionKeywords.CREATE_ATTESTATION,
-                is_remote_mandat=True,
-            ).count()
+            return self.journal.get("nb_mandat_remote_created", 0)
 
         nb_mandat_remote_created.csv_column = "Nombre de mandats à distance créés"
 
         def nb_mandat_revoked(self):
-            return (
-                Journal.objects.filter(
-                    aidant=self.aidant,
-                    action=JournalActionKeywords.CREATE_ATTESTATION,
-                )
-                .exclude(mandat__autorisations__revocation_date__isnull=True)
-                .count()
-            )
+            return self.page.revoked_mandats_counts.get(self.aidant.pk, 0)
 
         nb_mandat_revoked.csv_column = "Nombre de mandats révoqués"
 
         def nb_mandat_renewed(self):
-            return Journal.objects.filter(
-                action=JournalActionKeywords.INIT_RENEW_MANDAT,
-                aidant=self.aidant,
-            ).count()
+            return self.journal.get("nb_mandat_renewed", 0)
 
         nb_mandat_renewed.csv_column = "Nombre de mandats renouvelés"
 
         def nb_demarches(self):
-            return Journal.objects.filter(
-                action=JournalActionKeywords.USE_AUTORISATION,
-                aidant=self.aidant,
-            ).count()
+            return self.journal.get("nb_demarches", 0)
 
         nb_demarches.csv_column = "Nombre de démarches rélisées"
 
         def organisation__nb_usager(self):
-            return Usager.objects.active().visible_by(self.aidant).count()
+            return usagers_counts.get(self.aidant.organisation_id, 0)
 
         organisation__nb_usager.csv_column = "Organisation: Nombre d'usagers"
 
         def organisation__region(self):
-            qs = Department.objects.filter(
-                insee_code=self.aidant.organisation.department_insee_code
-            )
-            if not qs.exists():
-                return None
-            return qs[0].insee_code
+            insee_code = self.aidant.organisation.department_insee_code
+            return insee_code if insee_code in departments else None
 
         organisation__region.csv_column = "Organisation: Code INSEE de la région"
 
@@ -703,6 +812,80 @@ def export_for_bizdevs(request_pk: int, *, logger=None) -> str:
                     )
             return result
 
+    class Page:
+        """Fetches everything the serializer needs for a page of aidants
+        with a fixed number of queries, whatever the size of the page"""
+
+        def __init__(self, aidants: list[Aidant]):
+            self.aidants = aidants
+            self.journal_counts = {
+                item.pop("aidant_id"): item
+                for item in Journal.objects.filter(
+                    aidant__in=aidants,
+                    action__in=(
+                        JournalActionKeywords.CARD_ASSOCIATION,
+                        JournalActionKeywords.CONNECT_AIDANT,
+                        JournalActionKeywords.CREATE_ATTESTATION,
+                        JournalActionKeywords.INIT_RENEW_MANDAT,
+                        JournalActionKeywords.USE_AUTORISATION,
+                    ),
+                )
+                .values("aidant_id")
+                .annotate(
+                    totp_card_date_activated=Min(
+                        "creation_date",
+                        filter=Q(action=JournalActionKeywords.CARD_ASSOCIATION),
+                    ),
+                    nb_connections=Count(
+                        "pk", filter=Q(action=JournalActionKeywords.CONNECT_AIDANT)
+                    ),
+                    nb_mandat_created=Count(
+                        "pk", filter=Q(action=JournalActionKeywords.CREATE_ATTESTATION)
+                    ),
+                    nb_mandat_remote_created=Count(
+                        "pk",
+                        filter=Q(
+                            action=JournalActionKeywords.CREATE_ATTESTATION,
+                            is_remote_mandat=True,
+                        ),
+                    ),
+                    nb_mandat_renewed=Count(
+                        "pk", filter=Q(action=JournalActionKeywords.INIT_RENEW_MANDAT)
+                    ),
+                    nb_demarches=Count(
+                        "pk", filter=Q(action=JournalActionKeywords.USE_AUTORISATION)
+                    ),
+                )
+                .order_by()
+            }
+            self.revoked_mandats_counts = dict(
+                Journal.objects.filter(
+                    aidant__in=aidants,
+                    action=JournalActionKeywords.CREATE_ATTESTATION,
+                )
+                .exclude(mandat__autorisations__revocation_date__isnull=True)
+                .values("aidant_id")
+                .annotate(nb=Count("pk"))
+                .order_by()
+                .values_list("aidant_id", "nb")
+            )
+            self.habilitation_requests = defaultdict(list)
+            for hr in (
+                HabilitationRequest.objects.filter(
+                    email__in={aidant.email for aidant in aidants}
+                )
+                .prefetch_related(
+                    Prefetch(
+                        "formations",
+                        queryset=FormationAttendant.objects.select_related(
+                            "formation__organisation"
+                        ).order_by("pk"),
+                    )
+                )
+                .order_by("pk")
+            ):
+                self.habilitation_requests[hr.email].append(hr)
+
     logger: Logger = logger or get_task_logger(__name__)
 
     request = ExportRequest.objects.get(pk=request_pk)
@@ -714,32 +897,71 @@ def export_for_bizdevs(request_pk: int, *, logger=None) -> str:
 
     logger.info(f"Starting export for user {request.aidant.get_full_name()} @ {now()}")
 
-    with StringIO() as f:
-        try:
-            writer = csv.writer(f)
-            writer.writerow(Serializer.header())
+    # The file is written to a local temporary file, then saved to the storage
+    # once complete so that an interrupted export never leaves a truncated file
+    # to download
+    try:
+        departments = set(Department.objects.values_list("insee_code", flat=True))
+        usagers_counts = dict(
+            Mandat.objects.filter(usager__in=Usager.objects.active())
+            .values("organisation_id")
+            .annotate(nb=Count("usager_id", distinct=True))
+            .order_by()
+            .values_list("organisation_id", "nb")
+        )
 
-            qs = Aidant.objects.order_by("organisation__name").prefetch_related(
-                "organisation"
+        qs = (
+            Aidant.objects.select_related(
+                "organisation__type", "carte_totp__totp_device"
             )
-            nb_aidants = qs.count()
-            paging_iterator = chain(range(0, nb_aidants, 500), [nb_aidants])
+            .annotate(
+                export_is_referent=Exists(
+                    Aidant.responsable_de.through.objects.filter(
+                        aidant_id=OuterRef("pk")
+                    )
+                ),
+                export_has_otp_app=Exists(
+                    TOTPDevice.objects.filter(
+                        user_id=OuterRef("pk"),
+                        name=Concat(
+                            Value(OTP_APP_DEVICE_NAME % ""),
+                            Cast(OuterRef("pk"), output_field=CharField()),
+                        ),
+                    )
+                ),
+            )
+            .order_by("organisation__name", "pk")
+        )
+        nb_aidants = qs.count()
+
+        with TemporaryFile() as tmp_file:
+            with gzip.open(tmp_file, "wt", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(Serializer.header())
+
+                for start in range(
+                    0, nb_aidants, settings.EXPORT_FOR_BIZDEVS_PAGE_SIZE
+                ):
+                    page = Page(
+                        list(qs[start : start + settings.EXPORT_FOR_BIZDEVS_PAGE_SIZE])
+                    )
+                    writer.writerows(
+                        Serializer(aidant, page).values() for aidant in page.aidants
+                    )
 
-            first = next(paging_iterator)
-            for second in paging_iterator:
-                for aidant in qs[first:second]:
-                    writer.writerow(Serializer(aidant).values())
-                first = second
+            tmp_file.seek(0)
+            request.file.save(request.filename, File(tmp_file), save=False)
+            request.save(update_fields=("file",))
 
-            logger.info(
-                f"Finished export for user {request.aidant.get_full_name()} @ {now()}"
-            )
-            return f.getvalue()
-        except Exception:
-            logger.error(
-                f"Error on export for user {request.aidant.get_full_name()} @ {now()}"
-            )
-            raise
+        logger.info(
+            f"Finished export for user {request.aidant.get_full_name()} @ {now()}"
+        )
+        return request.file.name
+    except Exception:
+        logger.error(
+            f"Error on export for user {request.aidant.get_full_name()} @ {now()}"
+        )
+        raise
 
 
 @task_postrun.connect(sender=export_for_bizdevs)
@@ -764,29 +986,86 @@ def export_for_bizdevs_postrun(args, kwargs, state, *_1, **_2):
 
 
 @shared_task
-def email_activity_tracking_warning(*, logger=None):
+def transfer_mandats(transfer_id: int, *, logger=None):
     logger: Logger = logger or get_task_logger(__name__)
 
-    aidants = Aidant.objects.without_activity_for_90_days().filter(
-        activity_tracking_warning_at=None
-    )
-    for aidant in aidants.all():
-        text_message, html_message = render_email(
-            "email/activity_tracking_warning.mjml", {"user": aidant}
+    transfer = MandatTransfer.objects.select_related("organisation").get(pk=transfer_id)
+    if not transfer.is_ongoing:
+        return
+
+    def report_progress(processed_count: int):
+        MandatTransfer.objects.filter(pk=transfer.pk).update(
+            processed_count=processed_count
         )
 
-        send_mail(
-            from_email=settings.EMAIL_ACTIVITY_TRACKING_WARN_FROM,
-            subject="Accompagnez vos usagers avec Aidants Connect",
-            recipient_list=[aidant.email],
-            message=text_message,
-            html_message=html_message,
+    try:
+        _, failed_ids = Mandat.transfer_to_organisation(
+            transfer.organisation, transfer.mandat_ids, on_progress=report_progress
         )
+    except Exception:
+        logger.exception(f"Mandate transfer {transfer.pk} failed")
+        transfer.state = MandatTransfer.MandatTransferState.ERROR
+        transfer.save(update_fields=("state",))
+        return
+
+    transfer.failed_ids = failed_ids
+    transfer.processed_count = len(transfer.mandat_ids)
+    transfer.state = MandatTransfer.MandatTransferState.DONE
+    transfer.save(update_fields=("failed_ids", "processed_count", "state"))
+
+    logger.info(
+        f"Transferred {len(transfer.mandat_ids) - len(failed_ids)} mandates "
+        f"to organisation {transfer.organisation.pk}"
+    )
+
+
+@shared_task
+def email_activity_tracking_warning(*, logger=None):
+    logger: Logger = logger or get_task_logger(__name__)
+
+    aidants_ids = list(
+        Aidant.objects.without_activity_for_90_days()
+        .filter(activity_tracking_warning_at=None)
+        .values_list("pk", flat=True)
+    )
+
+    dispatch_in_batches(
+        email_activity_tracking_warning_batch, aidants_ids, logger=logger
+    )
+
+    logger.info(f"Emailing activity warning to {len(aidants_ids)} aidants")
+
+
+@shared_task(rate_limit=settings.BULK_EMAIL_BATCH_RATE_LIMIT)
+def email_activity_tracking_warning_batch(aidants_ids: list[int], *, logger=None):
+    logger: Logger = logger or get_task_logger(__name__)
+
+    # Aidants warned since the batch was queued are skipped
+    aidants = Aidant.objects.filter(
+        pk__in=aidants_ids, activity_tracking_warning_at=None
+    )
+
+    def build_emails():
+        for aidant in aidants:
+            text_message, html_message = render_email(
+                "email/activity_tracking_warning.mjml", {"user": aidant}
+            )
+            yield aidant.pk, build_email(
+                from_email=settings.EMAIL_ACTIVITY_TRACKING_WARN_FROM,
+                subject="Accompagnez vos usagers avec Aidants Connect",
+                recipient_list=[aidant.email],
+                text_message=text_message,
+                html_message=html_message,
+            )
 
-        aidant.activity_tracking_warning_at = now()
-        aidant.save(update_fields=("activity_tracking_warning_at",))
+    report = send_emails(build_emails(), logger=logger)
 
-    logger.info(f"Emailed activity warning to {aidants.count()} aidants")
+    Aidant.objects.filter(pk__in=report.sent).update(activity_tracking_warning_at=now())
+
+    logger.info(
+        f"Emailed activity warning to {len(report.sent)} aidants, "
+        f"{len(report.failed)} failed"
+    )
 
 
 @shared_task
@@ -1000,3 +1279,159 @@ def send_email_annonce_formateur_pap(hab_request_id, logger):
 @shared_task
 def email_annonce_formateur_pap(hab_request_id, *, logger=None):
     send_email_annonce_formateur_pap(hab_request_id, logger=logger)
+
+
+@shared_task(
+    bind=True,
+    max_retries=settings.SMS_SEND_MAX_RETRIES,
+    rate_limit=settings.SMS_SEND_RATE_LIMIT,
+    acks_late=True,
+)
+def send_remote_consent_sms(
+    self, user_phone: str, consent_request_id: str, message: str, *, logger=None
+):
+    logger: Logger = logger or get_task_logger(__name__)
+
+    phone = parse_phone(user_phone)
+    attempts = self.request.retries + 1
+    try:
+        SmsApi().send_sms(phone, consent_request_id, message)
+    except SmsApi.ApiRequestExpection as e:
+        # The SMS was rejected by the provider; sending it again won't change that
+        error = e
+    except (SmsApi.HttpRequestExpection, RequestException) as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(
+                exc=e,
+                countdown=settings.SMS_SEND_RETRY_DELAY * 2**self.request.retries,
+            )
+        error = e
+    else:
+        Journal.log_sms_status(
+            phone, consent_request_id, SmsStatus.SENT, attempts=attempts
+        )
+        return SmsStatus.SENT
+
+    logger.error(
+        f"Could not send SMS for consent request {consent_request_id!r} "
+        f"after {attempts} attempt{pluralize(attempts)}: {error}"
+    )
+    Journal.log_sms_status(
+        phone, consent_request_id, SmsStatus.FAILED, attempts=attempts, error=f"{error}"
+    )
+    return SmsStatus.FAILED
+
+
+def dispatch_remote_consent_sms(
+    user_phone: PhoneNumber, consent_request_id: str, message: str
+):
+    """
+    Queues an SMS to be sent by the Celery workers, once the current transaction
+    is committed so that they can read the journal entry of the request.
+
+    :raises kombu.exceptions.OperationalError: if the broker is unavailable, when
+            the transaction is committed. The SMS is then journalized as failed.
+    """
+    args = (
+        format_number(user_phone, PhoneNumberFormat.E164),
+        consent_request_id,
+        message,
+    )
+    if not settings.SMS_ASYNC_DISPATCH:
+        send_remote_consent_sms.apply(args)
+        return
+
+    def queue():
+        try:
+            send_remote_consent_sms.delay(*args)
+        except OperationalError as e:
+            Journal.log_sms_status(
+                user_phone,
+                consent_request_id,
+                SmsStatus.FAILED,
+                attempts=0,
+                error=f"{e}",
+            )
+            raise
+
+    transaction.on_commit(queue)
+
+
+@shared_task(rate_limit=settings.OUTGOING_EMAIL_RATE_LIMIT, acks_late=True)
+def send_outgoing_email(email_id: int, *, logger=None):
+    logger: Logger = logger or get_task_logger(__name__)
+
+    with transaction.atomic():
+        # Skips emails already sent or being sent by another worker
+        email = (
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(pk=email_id, status=OutgoingEmailStatus.PENDING)
+            .first()
+        )
+        if email is None:
+            return None
+
+        available_at = email.recipient_available_at()
+        if available_at is not None:
+            # Too many emails were sent to this address lately
+            email.next_attempt_at = available_at
+            email.save(update_fields={"next_attempt_at"})
+            return email.status
+
+        report = send_emails([(email.pk, email.build())], logger=logger)
+        email.attempts += 1
+        if report.sent:
+            email.status = OutgoingEmailStatus.SENT
+            email.sent_at = now()
+            email.last_error = ""
+        else:
+            email.last_error = report.failed[email.pk]
+            if email.attempts < settings.OUTGOING_EMAIL_MAX_ATTEMPTS:
+                email.next_attempt_at = now() + timedelta(
+                    seconds=settings.OUTGOING_EMAIL_RETRY_DELAY
+                    * 2 ** (email.attempts - 1)
+                )
+            else:
+                email.status = OutgoingEmailStatus.FAILED
+                logger.error(
+                    f"Gave up sending email {email.pk} to {email.recipient} "
+                    f"after {email.attempts} attempts"
+                )
+        email.save()
+
+    return email.status
+
+
+@shared_task
+def send_pending_outgoing_emails(*, logger=None):
+    # Retries the emails which couldn't be sent and the ones which dispatch was lost
+    logger: Logger = logger or get_task_logger(__name__)
+
+    emails_ids = list(
+        OutgoingEmail.objects.due()
+        .order_by("next_attempt_at")
+        .values_list("pk", flat=True)
+    )
+    for email_id in emails_ids:
+        dispatch_outgoing_email(email_id, logger=logger)
+
+    logger.info(f"Dispatched {len(emails_ids)} pending email{pluralize(emails_ids)}")
+
+
+def dispatch_outgoing_email(email_id: int, *, logger=None):
+    """
+    Queues an email of the outbox to be sent by the Celery workers.
+
+    If the broker is unavailable, the email will be dispatched again by
+    `send_pending_outgoing_emails`.
+    """
+    logger: Logger = logger or get_task_logger(__name__)
+
+    if not settings.OUTGOING_EMAIL_ASYNC_DISPATCH:
+        send_outgoing_email.apply((email_id,), {"logger": logger})
+        return
+
+    try:
+        send_outgoing_email.delay(email_id)
+    except OperationalError as e:
+        logger.error(f"Could not queue email {email_id}: {e}")
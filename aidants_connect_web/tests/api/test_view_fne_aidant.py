@@ -1,10 +1,17 @@
 import json
 
 from django.urls import reverse
+from django.utils.timezone import now
 
+from dateutil.relativedelta import relativedelta
 from rest_framework.test import APITestCase
 
-from aidants_connect_web.tests.factories import AidantFactory, OrganisationFactory
+from aidants_connect_web.tests.factories import (
+    AidantFactory,
+    AttestationJournalFactory,
+    MandatFactory,
+    OrganisationFactory,
+)
 
 
 class FNEAidantViewSetTests(APITestCase):
@@ -55,7 +62,102 @@ class FNEAidantViewSetTests(APITestCase):
         d_response = json.loads(response.content)
 
         self.assertEqual(200, response.status_code)
-        self.assertEqual(2, d_response["count"])
+        self.assertEqual(
+            [self.aidant.id, self.aidant_two.id],
+            [item["id"] for item in d_response["results"]],
+        )
+        self.assertIsNone(d_response["next"])
+
+    def test_metrics_are_the_same_as_the_models_ones(self):
+        self.client.force_login(self.root)
+        self.orga_aidant.responsables.add(self.aidant)
+        for months_ago, count in [(0, 2), (1, 1), (3, 3), (7, 1)]:
+            for _ in range(count):
+                AttestationJournalFactory(
+                    aidant=self.aidant,
+                    organisation=self.orga_aidant,
+                    creation_date=now() - relativedelta(months=months_ago),
+                )
+        MandatFactory(organisation=self.orga_aidant)
+
+        response = self.client.get(
+            reverse("fne_aidants-detail", args=(self.aidant.id,)), format="json"
+        )
+        data = json.loads(response.content)
+
+        self.assertEqual(self.aidant.get_supports_number(), data["get_supports_number"])
+        self.assertEqual(7, data["get_supports_number"])
+        self.assertEqual(
+            self.aidant.get_supports_number_for_current_month(),
+            data["get_supports_number_for_current_month"],
+        )
+        per_month = self.aidant.get_supports_number_last_six_months()
+        self.assertEqual(
+            {f"{i}": count for i, count in per_month.items()},
+            data["get_supports_number_last_six_months"],
+        )
+        self.assertTrue(data["is_manager"])
+        self.assertEqual(
+            self.orga_aidant.num_mandats, data["organisation"]["num_mandats"]
+        )
+        self.assertEqual(
+            [self.aidant.id], [item["id"] for item in data["organisation"]["referents"]]
+        )
+
+        response = self.client.get(
+            reverse("fne_aidants-detail", args=(self.aidant_two.id,)), format="json"
+        )
+        data = json.loads(response.content)
+        self.assertEqual(0, data["get_supports_number"])
+        self.assertEqual(
+            {f"{i}": 0 for i in range(6)}, data["get_supports_number_last_six_months"]
+        )
+        self.assertFalse(data["is_manager"])
+
+    def test_list_queries_dont_depend_on_the_number_of_aidants(self):
+        self.client.force_login(self.root)
+        url = reverse("fne_aidants-list")
+
+        # Session, user, aidants, organisations, referents
+        with self.assertNumQueries(5):
+            self.client.get(url, format="json")
+
+        for _ in range(5):
+            aidant = AidantFactory(organisation=OrganisationFactory())
+            aidant.organisation.responsables.add(aidant)
+            AttestationJournalFactory(aidant=aidant, organisation=aidant.organisation)
+
+        with self.assertNumQueries(5):
+            response = self.client.get(url, format="json")
+        self.assertEqual(7, len(json.loads(response.content)["results"]))
+
+    def test_incremental_sync(self):
+        self.client.force_login(self.root)
+        url = reverse("fne_aidants-list")
+
+        response = self.client.get(url, {"page_size": 1}, format="json")
+        page = json.loads(response.content)
+        self.assertEqual([self.aidant.id], [item["id"] for item in page["results"]])
+
+        # Modified during the sync: moved to the end
+        self.aidant.profession = "Médiateur numérique"
+        self.aidant.save()
+
+        response = self.client.get(page["next"], format="json")
+        page = json.loads(response.content)
+        self.assertEqual([self.aidant_two.id], [item["id"] for item in page["results"]])
+
+        response = self.client.get(page["next"], format="json")
+        page = json.loads(response.content)
+        self.assertEqual([self.aidant.id], [item["id"] for item in page["results"]])
+        self.assertIsNone(page["next"])
+
+        # Next sync starts from the last modification date seen
+        response = self.client.get(
+            url, {"updated_at__gte": page["results"][0]["updated_at"]}, format="json"
+        )
+        page = json.loads(response.content)
+        self.assertEqual([self.aidant.id], [item["id"] for item in page["results"]])
 
     def test_detail_post_disallowed(self):
         self.client.force_login(self.root)
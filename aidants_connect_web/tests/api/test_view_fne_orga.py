@@ -38,7 +38,6 @@ class FNEOrganisationViewSetTests(APITestCase):
         self.assertEqual(200, response.status_code)
         self.assertDictEqual(
             {
-                "count": 10,
                 "next": None,
                 "previous": None,
                 "results": [
@@ -68,7 +67,7 @@ class FNEOrganisationViewSetTests(APITestCase):
                         "france_services_label": orga.france_services_label,
                         "france_services_number": orga.france_services_number,
                     }
-                    for orga in self.orgas
+                    for orga in sorted(self.orgas, key=lambda o: (o.updated_at, o.pk))
                 ],
             },
             json.loads(response.content),
@@ -137,7 +136,6 @@ class FNEOrganisationViewSetTests(APITestCase):
         self.assertEqual(200, response.status_code)
         self.assertDictEqual(
             {
-                "count": 1,
                 "next": None,
                 "previous": None,
                 "results": [
@@ -190,7 +188,6 @@ class FNEOrganisationViewSetTests(APITestCase):
         self.assertEqual(200, response.status_code)
         self.assertDictEqual(
             {
-                "count": 1,
                 "next": None,
                 "previous": None,
                 "results": [
@@ -245,7 +242,6 @@ class FNEOrganisationViewSetTests(APITestCase):
         self.assertEqual(200, response.status_code)
         self.assertDictEqual(
             {
-                "count": 1,
                 "next": None,
                 "previous": None,
                 "results": [
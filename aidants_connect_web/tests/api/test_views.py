@@ -1,7 +1,11 @@
+import csv
 import json
+from io import StringIO
 from typing import List
 
+from django.core.cache import cache
 from django.urls import reverse
+from django.utils.http import http_date
 
 from rest_framework.test import APITestCase
 
@@ -16,6 +20,9 @@ class OrganisationViewSetTests(APITestCase):
             sorted([OrganisationFactory() for _ in range(8)], key=lambda i: i.pk)
         )
 
+    def setUp(self):
+        cache.clear()
+
     def test_list_post_disallowed(self):
         response = self.client.post(reverse("organisation-list"), {}, format="json")
         self.assertEqual(405, response.status_code)
@@ -111,3 +118,92 @@ class OrganisationViewSetTests(APITestCase):
             },
             json.loads(response.content),
         )
+
+    def test_list_conditional_get(self):
+        url = reverse("organisation-list")
+        response = self.client.get(url, format="json")
+        self.assertEqual(200, response.status_code)
+        etag = response.headers["ETag"]
+        last_modified = response.headers["Last-Modified"]
+        self.assertEqual(
+            http_date(int(max(orga.updated_at for orga in self.orgas).timestamp())),
+            last_modified,
+        )
+
+        response = self.client.get(url, format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b"", response.content)
+
+        response = self.client.get(
+            url, format="json", HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(304, response.status_code)
+
+        self.orgas[1].name = "Nouveau nom"
+        self.orgas[1].save()
+
+        response = self.client.get(url, format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response.headers["ETag"])
+        self.assertEqual(
+            "Nouveau nom", json.loads(response.content)["results"][0]["nom"]
+        )
+
+    def test_list_is_served_from_snapshot(self):
+        url = reverse("organisation-list")
+        with self.assertNumQueries(2):
+            first_response = self.client.get(url, format="json")
+
+        # Only the last change is queried
+        with self.assertNumQueries(1):
+            response = self.client.get(url, format="json")
+        self.assertEqual(first_response.content, response.content)
+
+        # Every write invalidates the snapshot and changes the ETag, from the
+        # database state only
+        etag = response.headers["ETag"]
+        Organisation.objects.filter(pk=self.orgas[1].pk).update(name="Nouveau nom")
+        response = self.client.get(url, format="json")
+        self.assertEqual(
+            "Nouveau nom", json.loads(response.content)["results"][0]["nom"]
+        )
+        self.assertNotEqual(etag, response.headers["ETag"])
+
+        etag = response.headers["ETag"]
+        self.orgas[2].city = "Nouvelle commune"
+        self.orgas[2].save(update_fields={"city"})
+        response = self.client.get(url, format="json")
+        self.assertEqual(
+            "Nouvelle commune", json.loads(response.content)["results"][1]["commune"]
+        )
+        self.assertNotEqual(etag, response.headers["ETag"])
+
+    def test_export(self):
+        url = reverse("organisation-export")
+
+        response = self.client.get(url, {"format": "ndjson"})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            "application/x-ndjson; charset=utf-8", response.headers["Content-Type"]
+        )
+        self.assertEqual(
+            'attachment; filename="organisations.ndjson"',
+            response.headers["Content-Disposition"],
+        )
+        lines = response.content.decode().splitlines()
+        self.assertEqual(
+            [str(orga.uuid) for orga in self.orgas[1:]],
+            [json.loads(line)["id"] for line in lines],
+        )
+
+        response = self.client.get(url, {"format": "csv"})
+        self.assertEqual(200, response.status_code)
+        rows = list(csv.DictReader(StringIO(response.content.decode())))
+        self.assertEqual(
+            [str(orga.uuid) for orga in self.orgas[1:]], [row["id"] for row in rows]
+        )
+
+        response = self.client.get(
+            url, {"format": "csv"}, HTTP_IF_NONE_MATCH=response.headers["ETag"]
+        )
+        self.assertEqual(304, response.status_code)
@@ -267,6 +267,8 @@ class JournalFactory(DjangoModelFactory):
         obj = super(JournalFactory, cls)._create(model_class, *args, **kwargs)
         if creation_date is not None:
             Journal.objects.filter(pk=obj.pk).update(creation_date=creation_date)
+            if obj.aidant_id is not None:
+                get_user_model().objects.refresh_last_activity([obj.aidant_id])
         return obj
 
 
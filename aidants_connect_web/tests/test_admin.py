@@ -1,9 +1,17 @@
+import gzip
+from tempfile import TemporaryDirectory
+from unittest import mock
+from uuid import uuid4
+
 from django.contrib.admin.sites import AdminSite
 from django.core import mail
-from django.test import TestCase, tag
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings, tag
 from django.test.client import RequestFactory
 from django.utils.timezone import now
 
+from celery.result import AsyncResult
+
 from aidants_connect_common.admin import DepartmentFilter, RegionFilter
 from aidants_connect_common.constants import AuthorizationDurations
 from aidants_connect_common.models import Region
@@ -11,18 +19,21 @@ from aidants_connect_habilitation.models import Manager
 from aidants_connect_web.admin import (
     AidantAdmin,
     HabilitationRequestAdmin,
+    JournalAdmin,
     OrganisationAdmin,
 )
 from aidants_connect_web.admin.aidant import (
     AidantInPreDesactivationZoneFilter,
     AidantWithMandatsFilter,
 )
+from aidants_connect_web.admin.other_models import ExportRequestAdmin
 from aidants_connect_web.constants import (
     HabilitationRequestCourseType,
     ReferentRequestStatuses,
 )
 from aidants_connect_web.models import (
     Aidant,
+    ExportRequest,
     HabilitationRequest,
     Journal,
     Mandat,
@@ -416,3 +427,78 @@ class HabilitationRequestAdminTests(TestCase):
                 for manager in self.habilitation_request.organisation.responsables.all()
             )
         )
+
+
+@tag("admin")
+class JournalAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.journal_admin = JournalAdmin(Journal, AdminSite())
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.rf = RequestFactory()
+        cls.responsable = AidantFactory()
+        cls.aidant = AidantFactory(organisation=cls.responsable.organisation)
+        cls.association = Journal.log_card_association(
+            cls.responsable, cls.aidant, "123456"
+        )
+        Journal.log_card_association(cls.responsable, cls.responsable, "ABCDEF")
+
+    def test_search_metadata(self):
+        request = self.rf.get("/")
+        for search_term in [
+            f"aidant_id={self.aidant.id}",
+            "serial_number = 123456",
+        ]:
+            queryset, may_have_duplicates = self.journal_admin.get_search_results(
+                request, Journal.objects.all(), search_term
+            )
+            self.assertEqual([self.association], list(queryset))
+            self.assertFalse(may_have_duplicates)
+
+
+@tag("admin")
+class ExportRequestAdminTests(TestCase):
+    def setUp(self):
+        media_root = TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.export_admin = ExportRequestAdmin(ExportRequest, AdminSite())
+        self.aidant = AidantFactory(is_staff=True)
+        with mock.patch(
+            "aidants_connect_web.tasks.export_for_bizdevs.apply_async",
+            return_value=AsyncResult(str(uuid4())),
+        ):
+            self.export_request = ExportRequest.objects.create(aidant=self.aidant)
+        self.content = gzip.compress(b"prenom,nom\r\n")
+        self.export_request.file.save(
+            self.export_request.filename, ContentFile(self.content), save=False
+        )
+        self.export_request.state = ExportRequest.ExportRequestState.DONE
+        self.export_request.save()
+
+    def test_download_reads_the_file_from_the_storage(self):
+        request = RequestFactory().get("/")
+        request.user = self.aidant
+
+        response = self.export_admin.download(request, self.export_request.pk)
+
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn(
+            self.export_request.filename.removesuffix(".gz"),
+            response.headers["Content-Disposition"],
+        )
+
+    def test_file_link(self):
+        self.assertIn("Télécharger", self.export_admin.file_link(self.export_request))
+
+        self.export_request.file.delete(save=False)
+        self.assertEqual(
+            self.export_admin.file_link(self.export_request), "Le fichier n'existe plus"
+        )
@@ -19,7 +19,12 @@ from aidants_connect_overrides.management.commands.createsuperuser import (
     ORGANISATION_NAME_ARG,
     ORGANISATION_NAME_ENV,
 )
-from aidants_connect_web.models import Aidant, Connection, HabilitationRequest
+from aidants_connect_web.models import (
+    Aidant,
+    Connection,
+    HabilitationRequest,
+    MandatTemplate,
+)
 from aidants_connect_web.tests.factories import (
     AidantFactory,
     CarteTOTPFactory,
@@ -367,3 +372,35 @@ class NotifyNoTotpWorkersTests(TestCase):
         self.assertIn(f"{aidant_without_carte}", message.body)
         self.assertNotIn(f"{aidant_with_carte}", message.body)
         self.assertNotIn("vous-même", message.body)
+
+
+@tag("commands")
+class IndexMandatTemplatesTests(TestCase):
+    def test_index_mandat_templates(self):
+        MandatTemplate.objects.create(
+            path=settings.MANDAT_TEMPLATE_PATH, sha256="outdated"
+        )
+        MandatTemplate.objects.create(
+            path=os.path.join(settings.MANDAT_TEMPLATE_DIR, "removed.html"),
+            sha256="removed",
+        )
+
+        call_command("index_mandat_templates")
+        call_command("index_mandat_templates")
+
+        template_dir = os.path.join(
+            os.path.dirname(os.path.dirname(__file__)),
+            "templates",
+            settings.MANDAT_TEMPLATE_DIR,
+        )
+        self.assertEqual(
+            sorted(
+                os.path.join(settings.MANDAT_TEMPLATE_DIR, filename)
+                for filename in os.listdir(template_dir)
+            ),
+            sorted(MandatTemplate.objects.values_list("path", flat=True)),
+        )
+        self.assertNotEqual(
+            "outdated",
+            MandatTemplate.objects.get(path=settings.MANDAT_TEMPLATE_PATH).sha256,
+        )
@@ -13,7 +13,7 @@ from selenium.webdriver.support.wait import WebDriverWait
 
 from aidants_connect_common.tests.testcases import FunctionalTestCase
 from aidants_connect_web.admin import MandatAdmin
-from aidants_connect_web.models import Aidant, Mandat
+from aidants_connect_web.models import Aidant, Mandat, MandatTransfer
 from aidants_connect_web.tests.factories import (
     AdminFactory,
     AidantFactory,
@@ -112,8 +112,8 @@ class ViewAutorisationsTests(FunctionalTestCase):
 
     @mock.patch("aidants_connect_web.models.Mandat.transfer_to_organisation")
     def test_some_mandates_can_t_be_transferred(self, transfer_to_organisation: Mock):
-        def side_effect(_, ids: Collection):
-            return len(ids) != 0, ids
+        def side_effect(_, ids: Collection, on_progress=None):
+            return len(ids) != 0, [int(mandate_id) for mandate_id in ids]
 
         transfer_to_organisation.side_effect = side_effect
 
@@ -125,9 +125,13 @@ class ViewAutorisationsTests(FunctionalTestCase):
 
         transfer_to_organisation.stop()
 
+        transfer = MandatTransfer.objects.get()
         self.assertTrue(
             self.selenium.current_url.endswith(
-                f"{reverse('otpadmin:aidants_connect_web_mandat_transfer')}"
+                reverse(
+                    "otpadmin:aidants_connect_web_mandat_transfer_progress",
+                    kwargs={"transfer_id": transfer.pk},
+                )
             )
         )
 
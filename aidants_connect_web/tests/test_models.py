@@ -5,10 +5,12 @@ from uuid import uuid4
 from zoneinfo import ZoneInfo
 
 from django.conf import settings
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
 from django.db.models.signals import post_save, pre_save
 from django.db.utils import IntegrityError
-from django.test import TestCase, tag
+from django.test import TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.utils.timezone import now
 
@@ -44,9 +46,11 @@ from aidants_connect_web.models import (
     Journal,
     LogEmailSending,
     Mandat,
+    MandatTemplate,
     Notification,
     Organisation,
     OrganisationType,
+    OutgoingEmail,
     StructureChangeRequest,
     Usager,
 )
@@ -448,6 +452,127 @@ class MandatModelTests(TestCase):
 
         self.assertEqual(mandate.was_explicitly_revoked, True)
 
+    def test_annotate_revocation(self):
+        revocation_date = timezone.now() - timedelta(days=1)
+        mandates = {}
+        for name, revocation_dates in {
+            "valid": [None, None],
+            "one_revoked": [revocation_date, None],
+            "all_revoked": [revocation_date - timedelta(hours=1), revocation_date],
+            "no_auths": [],
+        }.items():
+            mandates[name] = MandatFactory(
+                organisation=self.aidant_1.organisation,
+                usager=self.usager_1,
+                expiration_date=timezone.now() + timedelta(days=6),
+            )
+            for procedure, auth_revocation_date in zip(
+                ["transports", "logement"], revocation_dates
+            ):
+                AutorisationFactory(
+                    mandat=mandates[name],
+                    demarche=procedure,
+                    revocation_date=auth_revocation_date,
+                )
+
+        with self.assertNumQueries(1):
+            annotated = Mandat.objects.annotate_revocation().in_bulk(
+                [mandate.pk for mandate in mandates.values()]
+            )
+            for mandate in annotated.values():
+                mandate.revocation_date
+                mandate.was_explicitly_revoked
+                mandate.is_active
+
+        for name, mandate in mandates.items():
+            with self.subTest(name):
+                self.assertEqual(
+                    mandate.revocation_date, annotated[mandate.pk].revocation_date
+                )
+                self.assertEqual(
+                    mandate.was_explicitly_revoked,
+                    annotated[mandate.pk].was_explicitly_revoked,
+                )
+                self.assertEqual(mandate.is_active, annotated[mandate.pk].is_active)
+
+        self.assertEqual(
+            revocation_date, annotated[mandates["all_revoked"].pk].revocation_date
+        )
+        self.assertTrue(annotated[mandates["all_revoked"].pk].was_explicitly_revoked)
+
+    @override_settings(MANDAT_TRANSFER_BATCH_SIZE=2)
+    def test_transfer_to_organisation(self):
+        previous_organisation = self.aidant_1.organisation
+        organisation = OrganisationFactory()
+        mandates = [
+            MandatFactory(organisation=previous_organisation, usager=usager)
+            for usager in (self.usager_1, self.usager_2, UsagerFactory())
+        ]
+        already_transferred = MandatFactory(organisation=organisation)
+        AttestationJournalFactory(
+            aidant=self.aidant_1,
+            usager=self.usager_1,
+            mandat=mandates[0],
+            attestation_hash="previous_hash",
+        )
+        # Attestation created before entries were linked to their mandate
+        AttestationJournalFactory(
+            aidant=self.aidant_1,
+            usager=self.usager_2,
+            attestation_hash="legacy_hash",
+        )
+        ids = [*(mandate.pk for mandate in mandates), already_transferred.pk, 0]
+        progress = []
+
+        failure, failed_ids = Mandat.transfer_to_organisation(
+            organisation, [str(mandate_id) for mandate_id in ids], progress.append
+        )
+
+        self.assertTrue(failure)
+        self.assertEqual([0], failed_ids)
+        self.assertEqual([2, 4, 5], progress)
+        self.assertEqual(
+            4, Mandat.objects.filter(pk__in=ids, organisation=organisation).count()
+        )
+
+        entries = Journal.objects.filter(
+            action=JournalActionKeywords.TRANSFER_MANDAT
+        ).order_by("mandat_id")
+        self.assertEqual(
+            [
+                (
+                    mandate.pk,
+                    organisation.pk,
+                    {
+                        "previous_organisation_id": previous_organisation.pk,
+                        "previous_hash": previous_hash,
+                    },
+                )
+                for mandate, previous_hash in zip(
+                    mandates, ["previous_hash", "legacy_hash", None]
+                )
+            ],
+            [
+                (entry.mandat_id, entry.organisation_id, entry.metadata)
+                for entry in entries
+            ],
+        )
+
+    @override_settings(MANDAT_TRANSFER_BATCH_SIZE=10)
+    def test_transfer_to_organisation_runs_a_constant_number_of_queries(self):
+        organisation = OrganisationFactory()
+
+        def transfer(nb_mandates: int):
+            ids = [
+                MandatFactory(organisation=self.aidant_1.organisation).pk
+                for _ in range(nb_mandates)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                Mandat.transfer_to_organisation(organisation, ids)
+            return len(queries)
+
+        self.assertEqual(transfer(2), transfer(8))
+
     def test__get_template_path_from_journal_hash_nominal(self):
         tpl_name = "20200511_mandat.html"
         procedures = ["transports", "logement"]
@@ -597,6 +722,87 @@ class MandatModelTests(TestCase):
 
         self.assertEqual(result, f"aidants_connect_web/mandat_templates/{tpl_name}")
 
+    def test_get_mandate_template_path_records_the_template_found(self):
+        tpl_path = path_join(settings.MANDAT_TEMPLATE_DIR, "20201209_mandat.html")
+        procedures = ["transports", "logement"]
+        expiration_date = timezone.now() + timedelta(days=6)
+        AttestationJournalFactory(
+            aidant=self.aidant_1,
+            organisation=self.aidant_1.organisation,
+            usager=self.usager_1,
+            demarche=",".join(procedures),
+            attestation_hash=generate_attestation_hash(
+                self.aidant_1,
+                self.usager_1,
+                procedures,
+                expiration_date,
+                mandat_template_path=tpl_path,
+            ),
+        )
+        mandate = MandatFactory(
+            organisation=self.aidant_1.organisation,
+            usager=self.usager_1,
+            expiration_date=expiration_date,
+            template_path=None,
+        )
+        for procedure in procedures:
+            AutorisationFactory(mandat=mandate, demarche=procedure)
+        MandatTemplate.index_templates()
+
+        # Templates are looked up in the index, without reading them
+        with patch("builtins.open") as open_mock:
+            self.assertEqual(tpl_path, mandate.get_mandate_template_path())
+        open_mock.assert_not_called()
+
+        mandate = Mandat.objects.get(pk=mandate.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(tpl_path, mandate.get_mandate_template_path())
+
+    def test_mandat_templates_are_indexed_on_first_use(self):
+        index = MandatTemplate.get_index()
+
+        self.assertEqual(
+            MandatTemplate.objects.count(),
+            len(index),
+        )
+        self.assertEqual(
+            generate_file_sha256_hash(f"templates/{settings.MANDAT_TEMPLATE_PATH}"),
+            index[settings.MANDAT_TEMPLATE_PATH],
+        )
+        self.assertEqual(
+            index[settings.MANDAT_TEMPLATE_PATH],
+            MandatTemplate.objects.get(path=settings.MANDAT_TEMPLATE_PATH).sha256,
+        )
+
+    def test_mandat_templates_are_reindexed_when_templates_change(self):
+        MandatTemplate.index_templates()
+        MandatTemplate.objects.filter(path=settings.MANDAT_TEMPLATE_PATH).delete()
+        removed_path = path_join(settings.MANDAT_TEMPLATE_DIR, "removed.html")
+        MandatTemplate.objects.create(path=removed_path, sha256="removed")
+
+        index = MandatTemplate.get_index()
+
+        self.assertIn(settings.MANDAT_TEMPLATE_PATH, index)
+        self.assertNotIn(removed_path, index)
+        self.assertFalse(MandatTemplate.objects.filter(path=removed_path).exists())
+
+        # Up to date, so not indexed again
+        with patch.object(MandatTemplate, "index_templates") as index_mock:
+            self.assertEqual(index, MandatTemplate.get_index())
+        index_mock.assert_not_called()
+
+    def test_identical_mandat_templates_are_indexed_separately(self):
+        paths = MandatTemplate.list_template_paths()[:2]
+        with patch(
+            "aidants_connect_web.models.mandat.generate_file_sha256_hash",
+            return_value="identical",
+        ):
+            MandatTemplate.index_templates()
+
+        index = MandatTemplate.get_index()
+
+        self.assertEqual(["identical", "identical"], [index[path] for path in paths])
+
     def test_find_soon_expired(self):
         self.valid_1 = MandatFactory(
             duree_keyword=AuthorizationDurations.LONG,
@@ -2130,6 +2336,207 @@ class JournalModelTests(TestCase):
                     additional_information="message",
                 )
 
+    @freeze_time("2099-06-15 12:00:00")
+    def test_ensure_partitions(self):
+        def partition_of(entry: Journal):
+            return (
+                Journal.objects.filter(pk=entry.pk)
+                .annotate(partition=RawSQL("tableoid::regclass::text", []))
+                .get()
+                .partition
+            )
+
+        entry = Journal.log_connection(self.aidant_thierry)
+        self.assertEqual("aidants_connect_web_journal_default", partition_of(entry))
+
+        self.assertEqual(
+            [
+                "aidants_connect_web_journal_2099_06",
+                "aidants_connect_web_journal_2099_07",
+            ],
+            Journal.ensure_partitions(months_ahead=1),
+        )
+        # Entries already stored in the default partition were moved
+        self.assertEqual("aidants_connect_web_journal_2099_06", partition_of(entry))
+
+        # Calling it again is a no-op
+        self.assertEqual(
+            ["aidants_connect_web_journal_2099_06"],
+            Journal.ensure_partitions(months_ahead=0),
+        )
+
+        entry = Journal.log_connection(self.aidant_thierry)
+        self.assertEqual("aidants_connect_web_journal_2099_06", partition_of(entry))
+
+    def test_update_aidants_activity(self):
+        aidant = AidantFactory(
+            organisation=self.aidant_thierry.organisation,
+            activity_tracking_warning_at=timezone.now(),
+        )
+        self.assertIsNone(aidant.get_last_action_timestamp())
+
+        with freeze_time("2024-01-01 12:00:00"):
+            entry = Journal.log_connection(aidant)
+        self.assertEqual(entry.creation_date, aidant.get_last_action_timestamp())
+        self.assertIsNone(aidant.last_activity_at)
+        self.assertIsNotNone(aidant.activity_tracking_warning_at)
+
+        with freeze_time("2024-01-02 12:00:00"):
+            entry = Journal.log_autorisation_use(
+                aidant,
+                self.usager_ned,
+                "Revenus",
+                "token",
+                self.first_autorisation,
+            )
+        aidant.refresh_from_db()
+        self.assertEqual(entry.creation_date, aidant.last_action_at)
+        self.assertEqual(entry.creation_date, aidant.last_activity_at)
+        self.assertIsNone(aidant.activity_tracking_warning_at)
+
+        Aidant.objects.filter(pk=aidant.pk).update(
+            last_action_at=None, last_activity_at=None
+        )
+        Aidant.objects.refresh_last_activity([aidant.pk])
+        aidant.refresh_from_db()
+        self.assertEqual(entry.creation_date, aidant.last_action_at)
+        self.assertEqual(entry.creation_date, aidant.last_activity_at)
+
+    def test_update_aidants_activity_within_granularity(self):
+        aidant = AidantFactory(organisation=self.aidant_thierry.organisation)
+        with freeze_time("2024-01-01 12:00:00"):
+            first_entry = Journal.log_connection(aidant)
+
+        with freeze_time("2024-01-01 12:00:30"):
+            # The aidant's row is not written again
+            Journal.log_connection(aidant)
+        aidant.refresh_from_db()
+        self.assertEqual(first_entry.creation_date, aidant.last_action_at)
+
+        with freeze_time("2024-01-01 12:00:40"):
+            entry = Journal.log_autorisation_use(
+                aidant,
+                self.usager_ned,
+                "Revenus",
+                "token",
+                self.first_autorisation,
+            )
+        aidant.refresh_from_db()
+        self.assertEqual(entry.creation_date, aidant.last_action_at)
+        self.assertEqual(entry.creation_date, aidant.last_activity_at)
+
+    def test_buffered(self):
+        aidant = AidantFactory(
+            organisation=self.aidant_thierry.organisation,
+            activity_tracking_warning_at=timezone.now(),
+        )
+        autorisations = list(self.first_mandat.autorisations.all())
+        count = Journal.objects.count()
+
+        # One INSERT for the entries and one UPDATE for the activity tracking, within
+        # a savepoint
+        with self.assertNumQueries(4):
+            with Journal.buffered():
+                connection_entry = Journal.log_connection(aidant)
+                for autorisation in autorisations:
+                    Journal.log_autorisation_use(
+                        aidant, self.usager_ned, "Revenus", "token", autorisation
+                    )
+                with Journal.buffered():
+                    Journal.log_mandat_cancel(self.first_mandat, aidant)
+                self.assertIsNone(connection_entry.pk)
+
+        self.assertIsNotNone(connection_entry.pk)
+        self.assertEqual(count + 3, Journal.objects.count())
+        self.assertIsNone(aidant.activity_tracking_warning_at)
+        aidant.refresh_from_db()
+        self.assertIsNone(aidant.activity_tracking_warning_at)
+        self.assertEqual(
+            Journal.objects.filter(aidant=aidant).latest("creation_date").creation_date,
+            aidant.last_action_at,
+        )
+
+        with self.assertRaises(NotImplementedError):
+            connection_entry.save()
+
+    def test_buffered_discards_entries_on_error(self):
+        count = Journal.objects.count()
+        with self.assertRaises(ValueError):
+            with Journal.buffered():
+                Journal.log_connection(self.aidant_thierry)
+                raise ValueError()
+        self.assertEqual(count, Journal.objects.count())
+
+        # Entries are written directly outside of the block
+        Journal.log_connection(self.aidant_thierry)
+        self.assertEqual(count + 1, Journal.objects.count())
+
+    def test_find_card_association_logs_for_user(self):
+        aidant = AidantFactory(organisation=self.aidant_thierry.organisation)
+        entry = Journal.log_card_association(self.aidant_thierry, aidant, "SN42")
+        Journal.log_card_association(self.aidant_thierry, self.aidant_thierry, "SN1")
+        Journal.log_card_dissociation(self.aidant_thierry, aidant, "SN42", "perdue")
+
+        self.assertEqual(
+            {"aidant_id": aidant.id, "serial_number": "SN42"}, entry.metadata
+        )
+        self.assertEqual(
+            [entry], list(Journal.objects.find_card_association_logs_for_user(aidant))
+        )
+
+    def test_backfill_metadata(self):
+        aidant = AidantFactory(organisation=self.aidant_thierry.organisation)
+        legacy_infos = {
+            JournalActionKeywords.CARD_ASSOCIATION: (
+                f"aidant.id = {aidant.id}, sn = SN42",
+                {"aidant_id": aidant.id, "serial_number": "SN42"},
+            ),
+            JournalActionKeywords.CARD_DISSOCIATION: (
+                f"aidant.id = {aidant.id}, sn = SN42, reason = perdue"
+                "Add by clean_journal_entries_and_delete_mandats :\n Relatif à…",
+                {"aidant_id": aidant.id, "serial_number": "SN42", "reason": "perdue"},
+            ),
+            JournalActionKeywords.TRANSFER_MANDAT: (
+                "previous_organisation = 3, previous_hash = None",
+                {"previous_organisation_id": 3, "previous_hash": None},
+            ),
+            JournalActionKeywords.SWITCH_ORGANISATION: (
+                "previous organisation : A (#1) -new organisation : B (#2)",
+                {"previous_organisation_id": 1, "new_organisation_id": 2},
+            ),
+            JournalActionKeywords.IMPORT_TOTP_CARDS: (
+                "3 ajouts - 4 modifications",
+                {"added": 3, "updated": 4},
+            ),
+        }
+        entries = {
+            action: Journal.objects.create(
+                action=action, aidant=aidant, additional_information=info
+            )
+            for action, (info, _) in legacy_infos.items()
+        }
+        unparsable = Journal.objects.create(
+            action=JournalActionKeywords.CARD_ASSOCIATION,
+            aidant=aidant,
+            additional_information="Nothing to see here",
+        )
+
+        after = Journal.backfill_metadata(batch_size=3)
+        self.assertEqual(entries[JournalActionKeywords.TRANSFER_MANDAT].pk, after)
+        after = Journal.backfill_metadata(after, batch_size=3)
+        self.assertEqual(unparsable.pk, after)
+        self.assertIsNone(Journal.backfill_metadata(after, batch_size=3))
+
+        for action, (_, expected) in legacy_infos.items():
+            entries[action].refresh_from_db()
+            self.assertEqual(expected, entries[action].metadata)
+        unparsable.refresh_from_db()
+        self.assertEqual({}, unparsable.metadata)
+        self.assertEqual(
+            [unparsable.pk],
+            list(Journal.objects.without_metadata().values_list("pk", flat=True)),
+        )
+
 
 @tag("models", "habilitation_request")
 class HabilitationRequestForSandboxTests(TestCase):
@@ -2214,6 +2621,31 @@ class HabilitationRequestTests(TestCase):
                 ReferentRequestStatuses.STATUS_VALIDATED.value,
             )
 
+    def test_validation_emails_are_recorded_once(self):
+        habilitation_request = HabilitationRequestFactory(
+            status=ReferentRequestStatuses.STATUS_PROCESSING.value
+        )
+        referent = AidantFactory(organisation=habilitation_request.organisation)
+        habilitation_request.organisation.responsables.add(referent)
+
+        self.assertTrue(habilitation_request.validate_and_create_aidant())
+        aidant = Aidant.objects.get(email=habilitation_request.email)
+        self.assertEqual(
+            {
+                f"aidant_activated:{habilitation_request.pk}:{referent.email}",
+                f"aidant_created:{habilitation_request.pk}:{aidant.email}",
+            },
+            set(OutgoingEmail.objects.values_list("dedup_key", flat=True)),
+        )
+
+        # The same activation doesn't notify twice
+        from aidants_connect_web.signals import aidant_activated
+
+        aidant_activated.send(
+            HabilitationRequest, aidant=aidant, hrequest=habilitation_request
+        )
+        self.assertEqual(2, OutgoingEmail.objects.count())
+
     def test_switch_classic_to_pap(self):
         hr_processing = HabilitationRequestFactory(
             status=ReferentRequestStatuses.STATUS_PROCESSING.value
@@ -1,7 +1,10 @@
+from datetime import date, timedelta
+from unittest import mock
+
 from django.conf import settings
-from django.test import TestCase, tag
+from django.test import TestCase, override_settings, tag
 from django.utils import timezone
-from django.utils.timezone import now
+from django.utils.timezone import localdate, now
 
 from dateutil.relativedelta import relativedelta
 from django_otp.plugins.otp_totp.models import TOTPDevice
@@ -14,14 +17,26 @@ from aidants_connect_web.models import (
     AidantStatistiques,
     AidantStatistiquesbyDepartment,
     AidantStatistiquesbyRegion,
+    StatisticsChange,
+    StatisticsSeries,
+)
+from aidants_connect_web.statistics import (
+    compute_all_statistics,
+    compute_changed_statistics,
+    compute_statistics,
+    downsample_statistics_series,
+    get_statistics_series,
+    record_statistics_series,
 )
-from aidants_connect_web.statistics import compute_statistics
+from aidants_connect_web.statistics.statistics import FIGURES
 from aidants_connect_web.tests.factories import (
     AidantFactory,
     AttestationJournalFactory,
+    AutorisationFactory,
     CarteTOTPFactory,
     HabilitationRequestFactory,
     JournalFactory,
+    MandatFactory,
     OrganisationFactory,
 )
 
@@ -247,6 +262,162 @@ class AllStatisticsTests(TestCase):
         nstats = compute_statistics(AidantStatistiques())
         self.assertEqual(nstats.number_organisation_with_accredited_aidants, 4)
 
+    def test_compute_all_statistics(self):
+        # An aidant who created mandates in another region than the one of their
+        # current organisation
+        AttestationJournalFactory(
+            aidant=self.ad_with_totp_dep_11, organisation=self.orga_ad_dep_21
+        )
+        self.ad_with_totp_dep_11.organisations.add(self.orga_ad_dep_12)
+
+        fields = [
+            field.name
+            for field in AidantStatistiques._meta.fields
+            if field.name.startswith("number") or field.name == "revoked_mandats"
+        ]
+
+        def figures(stats):
+            return {name: getattr(stats, name) for name in fields}
+
+        with self.assertNumQueries(22):
+            all_stats = compute_all_statistics()
+
+        self.assertEqual(
+            1 + Department.objects.count() + Region.objects.count(), len(all_stats)
+        )
+        for stats in all_stats:
+            self.assertIsNotNone(stats.pk)
+            if isinstance(stats, AidantStatistiquesbyDepartment):
+                expected = compute_statistics(
+                    AidantStatistiquesbyDepartment(departement=stats.departement)
+                )
+            elif isinstance(stats, AidantStatistiquesbyRegion):
+                expected = compute_statistics(
+                    AidantStatistiquesbyRegion(region=stats.region)
+                )
+            else:
+                expected = compute_statistics(AidantStatistiques())
+            self.assertEqual(figures(expected), figures(stats))
+
+    def assert_figures_are_computed(self, all_stats):
+        fields = [
+            field.name
+            for field in AidantStatistiques._meta.fields
+            if field.name.startswith("number") or field.name == "revoked_mandats"
+        ]
+
+        def figures(stats):
+            return {name: getattr(stats, name) for name in fields}
+
+        for stats in all_stats:
+            if isinstance(stats, AidantStatistiquesbyDepartment):
+                expected = compute_statistics(
+                    AidantStatistiquesbyDepartment(departement=stats.departement)
+                )
+            elif isinstance(stats, AidantStatistiquesbyRegion):
+                expected = compute_statistics(
+                    AidantStatistiquesbyRegion(region=stats.region)
+                )
+            else:
+                expected = compute_statistics(AidantStatistiques())
+            self.assertEqual(figures(expected), figures(stats), stats)
+
+    def test_compute_changed_statistics(self):
+        compute_all_statistics()
+        self.assertFalse(StatisticsChange.objects.exists())
+
+        JournalFactory(
+            organisation=self.orga_ad_dep_21,
+            aidant=self.ad_with_totp_dep_21,
+            action=JournalActionKeywords.USE_AUTORISATION,
+        )
+        new_aidant = AidantFactory(organisation=self.orga_ad_dep_12, last_login=now())
+        CarteTOTPFactory(aidant=new_aidant)
+        AttestationJournalFactory(aidant=new_aidant, organisation=self.orga_ad_dep_21)
+        self.assertEqual(
+            {"912", "921"},
+            set(
+                StatisticsChange.objects.values_list("department_insee_code", flat=True)
+            ),
+        )
+
+        all_stats = compute_changed_statistics()
+
+        self.assertFalse(all_stats[0].is_reconciliation)
+        self.assertEqual(
+            1 + Department.objects.count() + Region.objects.count(), len(all_stats)
+        )
+        self.assert_figures_are_computed(all_stats)
+        self.assertFalse(StatisticsChange.objects.exists())
+
+    def test_compute_changed_statistics_copies_unchanged_regions(self):
+        compute_all_statistics()
+        last_dep_11_stats = AidantStatistiquesbyDepartment.objects.get(
+            departement=self.dep_11
+        )
+        # Not recorded as a change
+        Aidant.objects.filter(organisation=self.orga_ad_dep_11).update(last_login=None)
+        JournalFactory(
+            organisation=self.orga_ad_dep_21,
+            aidant=self.ad_with_totp_dep_21,
+            action=JournalActionKeywords.USE_AUTORISATION,
+        )
+
+        all_stats = compute_changed_statistics()
+
+        dep_11_stats = next(
+            stats
+            for stats in all_stats
+            if isinstance(stats, AidantStatistiquesbyDepartment)
+            and stats.departement_id == self.dep_11.pk
+        )
+        self.assertNotEqual(last_dep_11_stats.pk, dep_11_stats.pk)
+        self.assertEqual(
+            last_dep_11_stats.number_aidant_with_login,
+            dep_11_stats.number_aidant_with_login,
+        )
+        self.assert_figures_are_computed(
+            stats
+            for stats in all_stats
+            if getattr(stats, "region", None) == self.region_two
+            or getattr(stats, "departement", None) == self.dep_21
+        )
+
+    def test_compute_changed_statistics_reconciles_periodically(self):
+        self.assertTrue(compute_changed_statistics()[0].is_reconciliation)
+        self.assertFalse(compute_changed_statistics()[0].is_reconciliation)
+
+        AidantStatistiques.objects.update(
+            created_at=now()
+            - relativedelta(days=settings.STATISTICS_RECONCILIATION_DAYS)
+        )
+        # Not recorded as a change
+        Aidant.objects.filter(organisation=self.orga_ad_dep_11).update(last_login=None)
+
+        all_stats = compute_changed_statistics()
+        self.assertTrue(all_stats[0].is_reconciliation)
+        self.assert_figures_are_computed(all_stats)
+
+    def test_changes_recorded_during_computation_are_kept(self):
+        compute_all_statistics()
+        StatisticsChange.record(self.orga_ad_dep_21)
+
+        def record_concurrent_change(*_):
+            StatisticsChange.record(self.orga_ad_dep_11)
+
+        with mock.patch(
+            "aidants_connect_web.statistics.statistics.record_statistics_series",
+            side_effect=record_concurrent_change,
+        ):
+            compute_changed_statistics()
+
+        self.assertEqual(
+            ["911"],
+            list(
+                StatisticsChange.objects.values_list("department_insee_code", flat=True)
+            ),
+        )
+
     def test_global_computing_new_statistics(self):
         stats = compute_statistics(AidantStatistiques())
 
@@ -344,3 +515,216 @@ class AllStatisticsTests(TestCase):
 
         self.assertEqual(stats.number_orgas_in_zrr, 0)
         self.assertEqual(stats.number_aidants_in_zrr, 0)
+
+
+@tag("statistics")
+class StatisticsChangeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.orga_dep_11 = OrganisationFactory(department_insee_code="911")
+        cls.orga_dep_12 = OrganisationFactory(department_insee_code="912")
+        cls.aidant = AidantFactory(organisation=cls.orga_dep_11)
+
+    def setUp(self):
+        StatisticsChange.objects.all().delete()
+
+    def assert_changed_departments(self, expected):
+        self.assertEqual(
+            expected,
+            set(
+                StatisticsChange.objects.values_list("department_insee_code", flat=True)
+            ),
+        )
+        StatisticsChange.objects.all().delete()
+
+    def test_move_records_both_departments(self):
+        self.aidant.organisation = self.orga_dep_12
+        self.aidant.save()
+        self.assert_changed_departments({"911", "912"})
+
+        mandat = MandatFactory(organisation=self.orga_dep_12)
+        StatisticsChange.objects.all().delete()
+        mandat.organisation = self.orga_dep_11
+        mandat.save(update_fields=["organisation"])
+        self.assert_changed_departments({"911", "912"})
+
+    def test_saves_not_changing_statistics_are_not_recorded(self):
+        self.aidant.last_login = now()
+        self.aidant.save(update_fields=["last_login"])
+        # The aidant logged in for the first time
+        self.assert_changed_departments({"911"})
+
+        self.aidant.last_login = now()
+        self.aidant.save(update_fields=["last_login"])
+        self.aidant.first_name = "Camille"
+        self.aidant.save()
+        self.orga_dep_11.address = "1 rue de la Paix"
+        self.orga_dep_11.save()
+        self.assert_changed_departments(set())
+
+        self.aidant.is_active = False
+        self.aidant.save()
+        self.assert_changed_departments({"911"})
+
+    def test_organisation_move_records_both_departments(self):
+        self.orga_dep_12.department_insee_code = "913"
+        self.orga_dep_12.save()
+        self.assert_changed_departments({"912", "913"})
+
+    def test_deletions_are_recorded(self):
+        mandat = MandatFactory(organisation=self.orga_dep_11)
+        autorisation = AutorisationFactory(mandat=mandat)
+        habilitation_request = HabilitationRequestFactory(organisation=self.orga_dep_12)
+        StatisticsChange.objects.all().delete()
+
+        autorisation.delete()
+        self.assert_changed_departments({"911"})
+        habilitation_request.delete()
+        self.assert_changed_departments({"912"})
+        AidantFactory(organisation=self.orga_dep_12).delete()
+        self.assert_changed_departments({"912"})
+
+    def test_card_and_device_changes_are_recorded(self):
+        card = CarteTOTPFactory()
+        self.assert_changed_departments(set())
+
+        card.aidant = self.aidant
+        card.save()
+        self.assert_changed_departments({"911"})
+
+        device = TOTPDevice.objects.create(user=self.aidant)
+        self.assert_changed_departments({"911"})
+        device.delete()
+        self.assert_changed_departments({"911"})
+
+        card.unlink_aidant()
+        self.assert_changed_departments({"911"})
+
+    def test_organisations_changes_are_recorded(self):
+        self.aidant.organisations.add(self.orga_dep_12)
+        self.assert_changed_departments({"912"})
+
+        self.aidant.organisations.remove(self.orga_dep_12)
+        self.assert_changed_departments({"912"})
+
+        self.orga_dep_12.aidants.add(self.aidant)
+        self.assert_changed_departments({"912"})
+
+        self.aidant.organisations.clear()
+        self.assert_changed_departments({"911", "912"})
+
+    def test_changes_are_only_inserted(self):
+        StatisticsChange.record(self.orga_dep_12, self.orga_dep_11)
+        StatisticsChange.record(self.orga_dep_11)
+        self.assertEqual(
+            ["911", "911", "912"],
+            list(
+                StatisticsChange.objects.order_by("department_insee_code").values_list(
+                    "department_insee_code", flat=True
+                )
+            ),
+        )
+
+
+@tag("statistics")
+class StatisticsSeriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        region = Region.objects.create(insee_code="91", name="Region 1")
+        cls.dep_11 = Department.objects.create(
+            insee_code="911", region=region, name="Dep 911"
+        )
+        cls.dep_12 = Department.objects.create(
+            insee_code="912", region=region, name="Dep 912"
+        )
+
+    def record(self, day: date, number_usage_of_ac: int):
+        record_statistics_series(
+            [
+                AidantStatistiquesbyDepartment(
+                    departement=department, number_usage_of_ac=number_usage_of_ac
+                )
+                for department in [self.dep_11, self.dep_12]
+            ],
+            day,
+        )
+
+    def test_families_cover_all_figures(self):
+        self.assertEqual(
+            sorted(FIGURES),
+            sorted(
+                name
+                for figures in StatisticsSeries.FAMILY_FIGURES.values()
+                for name in figures
+            ),
+        )
+
+    def test_statistics_computation_records_the_day(self):
+        compute_all_statistics()
+        compute_changed_statistics()
+
+        self.assertEqual(
+            Department.objects.count() * len(StatisticsSeries.Family),
+            StatisticsSeries.objects.filter(
+                granularity=StatisticsSeries.Granularity.DAY, date=localdate()
+            ).count(),
+        )
+        point = StatisticsSeries.objects.get(
+            departement=self.dep_11, family=StatisticsSeries.Family.USAGE
+        )
+        self.assertEqual({"number_usage_of_ac": 0, "revoked_mandats": 0}, point.values)
+
+    @override_settings(STATISTICS_SERIES_DAILY_RETENTION_DAYS=30)
+    def test_downsample_and_query(self):
+        today = date(2024, 6, 15)
+        self.record(date(2024, 1, 10), 1)
+        self.record(date(2024, 1, 20), 2)
+        self.record(date(2024, 2, 5), 3)
+        self.record(today - timedelta(days=1), 4)
+
+        self.assertEqual(
+            3 * 2 * len(StatisticsSeries.Family), downsample_statistics_series(today)
+        )
+        # Idempotent
+        self.assertEqual(0, downsample_statistics_series(today))
+
+        series = get_statistics_series(
+            date(2024, 1, 15), today, StatisticsSeries.Family.USAGE, ["911"]
+        )
+        self.assertEqual(["911"], list(series))
+        self.assertEqual(
+            [
+                (date(2024, 1, 1), 2),
+                (date(2024, 2, 1), 3),
+                (today - timedelta(days=1), 4),
+            ],
+            [(day, values["number_usage_of_ac"]) for day, values in series["911"]],
+        )
+        self.assertEqual(
+            ["911", "912"],
+            sorted(
+                get_statistics_series(
+                    today - timedelta(days=1), today, StatisticsSeries.Family.USAGE
+                )
+            ),
+        )
+
+    @override_settings(
+        STATISTICS_SERIES_DAILY_RETENTION_DAYS=30,
+        STATISTICS_SERIES_MONTHLY_RETENTION_MONTHS=3,
+    )
+    def test_monthly_retention(self):
+        today = date(2024, 6, 15)
+        self.record(date(2024, 1, 10), 1)
+        self.record(date(2024, 4, 10), 2)
+
+        downsample_statistics_series(today)
+
+        self.assertEqual(
+            [date(2024, 4, 1)],
+            list(
+                StatisticsSeries.objects.values_list("date", flat=True)
+                .order_by("date")
+                .distinct()
+            ),
+        )
@@ -1,10 +1,21 @@
-from django.test import TestCase, tag
+from unittest import mock
+from unittest.mock import MagicMock
+
+from django.db import connection
+from django.test import TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now, timedelta
 
+from requests import ConnectionError
+
 from aidants_connect_common.constants import JournalActionKeywords
 from aidants_connect_web.models import ReboardingAidantStatistiques
 from aidants_connect_web.statistics.reboarding import (
+    REBOARDING_TABLE_NAME,
+    compute_reboarding_statistics,
+    compute_reboarding_statistics_and_synchro_grist,
     compute_reboarding_statistics_for_aidant,
+    update_grist_records,
 )
 from aidants_connect_web.tests.factories import (
     AidantFactory,
@@ -158,3 +169,112 @@ class ReboardingStatisticsTests(TestCase):
         self.assertEqual(stats.usagers_before_reboarding, 1)
         self.assertEqual(stats.usagers_j30_after, 1)
         self.assertEqual(stats.usagers_j90_after, 2)
+
+    def test_compute_reboarding_statistics_queries_once_per_date(self):
+        def count_queries(aidants):
+            all_stats = [
+                ReboardingAidantStatistiques(
+                    aidant=aidant, reboarding_session_date=self.reboarding_session_date
+                )
+                for aidant in aidants
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                compute_reboarding_statistics(all_stats)
+            return len(queries), all_stats
+
+        self.assertEqual(count_queries([self.cloud])[0], 1)
+        num_queries, (cloud, jaskier, *_) = count_queries(
+            [self.cloud, self.jaskier, *AidantFactory.create_batch(3)]
+        )
+        self.assertEqual(num_queries, 1)
+        self.assertEqual(cloud.connexions_before_reboarding, 1)
+        self.assertEqual(cloud.usagers_j90_after, 2)
+        self.assertEqual(jaskier.connexions_before_reboarding, 1)
+        self.assertEqual(jaskier.connexions_j30_after, 0)
+
+    @mock.patch("aidants_connect_web.statistics.reboarding.GristDocAPI")
+    def test_compute_reboarding_statistics_and_synchro_grist(self, api_grist_mock):
+        warning_date = now() - timedelta(days=40)
+        self.jaskier.deactivation_warning_at = warning_date
+        self.jaskier.save()
+        session_date = self.reboarding_session_date.date()
+        timestamp = int(now().replace(year=session_date.year).timestamp())
+        rows = [
+            MagicMock(
+                id=1,
+                Date_webinaire=f"['{session_date:%Y-%m-%d} 10:00']",
+                Email_renseigner_celui_utilise_lors_de_l_habilitation_Aidants_Connect_=(  # noqa
+                    self.cloud.email
+                ),
+            ),
+            MagicMock(
+                id=2,
+                Date_webinaire=f"['{session_date:%Y-%m-%d} 14:00']",
+                Email_renseigner_celui_utilise_lors_de_l_habilitation_Aidants_Connect_=(  # noqa
+                    self.jaskier.email
+                ),
+            ),
+            MagicMock(
+                id=3,
+                Date_webinaire=timestamp,
+                Email_renseigner_celui_utilise_lors_de_l_habilitation_Aidants_Connect_=(  # noqa
+                    "unknown@ccas.fr"
+                ),
+            ),
+            MagicMock(
+                id=4,
+                Date_webinaire=None,
+                Email_renseigner_celui_utilise_lors_de_l_habilitation_Aidants_Connect_=(  # noqa
+                    self.cloud.email
+                ),
+            ),
+        ]
+        api_grist_mock.return_value.fetch_table.return_value = rows
+
+        compute_reboarding_statistics_and_synchro_grist()
+        # Running again updates the statistics already created
+        compute_reboarding_statistics_and_synchro_grist()
+
+        self.assertEqual(ReboardingAidantStatistiques.objects.count(), 2)
+        cloud_stats = ReboardingAidantStatistiques.objects.get(aidant=self.cloud)
+        self.assertEqual(cloud_stats.reboarding_session_date, session_date)
+        self.assertEqual(cloud_stats.connexions_j30_after, 2)
+        jaskier_stats = ReboardingAidantStatistiques.objects.get(aidant=self.jaskier)
+        self.assertEqual(jaskier_stats.warning_date, warning_date)
+        self.jaskier.refresh_from_db()
+        self.assertIsNone(self.jaskier.deactivation_warning_at)
+
+        update_records = api_grist_mock.return_value.update_records
+        self.assertEqual(update_records.call_count, 2)
+        table_name, records = update_records.call_args.args
+        self.assertEqual(table_name, REBOARDING_TABLE_NAME)
+        self.assertEqual(
+            {record["id"]: record["J30_nombre_connexions"] for record in records},
+            {1: 2, 2: 0},
+        )
+
+    @override_settings(
+        GRIST_UPDATE_CHUNK_SIZE=2,
+        GRIST_UPDATE_MAX_ATTEMPTS=2,
+        GRIST_UPDATE_RETRY_DELAY=0,
+    )
+    def test_update_grist_records(self):
+        api_grist = MagicMock()
+        records = [{"id": row_id} for row_id in range(5)]
+
+        update_grist_records(api_grist, "Table", records)
+        self.assertEqual(
+            [call.args for call in api_grist.update_records.call_args_list],
+            [("Table", records[0:2]), ("Table", records[2:4]), ("Table", records[4:])],
+        )
+
+        api_grist.reset_mock()
+        api_grist.update_records.side_effect = [ConnectionError(), None, None, None]
+        update_grist_records(api_grist, "Table", records)
+        self.assertEqual(api_grist.update_records.call_count, 4)
+
+        api_grist.reset_mock()
+        api_grist.update_records.side_effect = ConnectionError()
+        with self.assertRaises(ConnectionError):
+            update_grist_records(api_grist, "Table", records)
+        self.assertEqual(api_grist.update_records.call_count, 2)
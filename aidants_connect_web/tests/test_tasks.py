@@ -1,12 +1,16 @@
+import gzip
 import logging
 from datetime import datetime, timedelta
+from tempfile import TemporaryDirectory
 from textwrap import dedent
 from unittest import mock
 from unittest.mock import MagicMock
 from uuid import uuid4
 
 from django.core import mail
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.utils.timezone import now
 
@@ -14,16 +18,25 @@ import pytz
 from celery.result import AsyncResult
 from dateutil.relativedelta import relativedelta
 from freezegun import freeze_time
+from kombu.exceptions import OperationalError
+from phonenumbers import parse as parse_phone
 
-from aidants_connect_common.constants import AuthorizationDurations
+from aidants_connect_common.constants import (
+    AuthorizationDurations,
+    JournalActionKeywords,
+)
 from aidants_connect_common.tests.factories import (
     FormationFactory,
     FormationOrganizationFactory,
 )
+from aidants_connect_common.utils.sms_api import SmsApi
 from aidants_connect_habilitation.tasks import update_pix_and_create_aidant
 from aidants_connect_web.constants import (
     HabilitationRequestCourseType,
+    OutgoingEmailStatus,
     ReferentRequestStatuses,
+    RemoteConsentMethodChoices,
+    SmsStatus,
 )
 from aidants_connect_web.models import (
     Aidant,
@@ -32,11 +45,20 @@ from aidants_connect_web.models import (
     HabilitationRequest,
     Journal,
     Mandat,
+    MandatTransfer,
+    OutgoingEmail,
+    StatisticsChange,
 )
 from aidants_connect_web.tasks import (
+    deactivate_warned_aidants,
+    dispatch_remote_consent_sms,
     email_old_aidants,
+    email_old_aidants_batch,
     export_for_bizdevs,
     get_recipient_list_for_organisation,
+    send_pending_outgoing_emails,
+    send_remote_consent_sms,
+    transfer_mandats,
 )
 from aidants_connect_web.tests.factories import (
     AidantFactory,
@@ -266,8 +288,71 @@ class EmailOldAidants(TestCase):
         self.aidants_selected.refresh_from_db()
         self.assertEqual(NOW, self.aidants_selected.deactivation_warning_at)
 
+    @freeze_time(NOW)
+    @override_settings(
+        FF_DEACTIVATE_OLD_AIDANT=True,
+        BULK_EMAIL_BATCH_SIZE=1,
+        EMAIL_BACKEND="aidants_connect_common.tests.test_bulk_email.FlakyEmailBackend",
+    )
+    def test_aidants_are_only_marked_as_warned_when_the_email_was_sent(self):
+        refused = AidantFactory(
+            email="refused@aidantsconnect.beta.gouv.fr",
+            is_active=True,
+            last_login=timezone.now() - relativedelta(months=5),
+            deactivation_warning_at=None,
+        )
+        refused_totp = CarteTOTPFactory(aidant=refused)
+        CarteTOTP.objects.filter(pk=refused_totp.pk).update(
+            created_at=timezone.now() - relativedelta(months=7)
+        )
+
+        logger = MagicMock()
+        with mock.patch.object(
+            email_old_aidants_batch, "apply", wraps=email_old_aidants_batch.apply
+        ) as apply_mock:
+            email_old_aidants(logger=logger)
+
+        logger.error.assert_called_once()
+
+        self.assertEqual(2, apply_mock.call_count)
+        self.assertEqual([[self.aidants_selected.email]], [m.to for m in mail.outbox])
+        self.aidants_selected.refresh_from_db()
+        self.assertEqual(NOW, self.aidants_selected.deactivation_warning_at)
+        refused.refresh_from_db()
+        self.assertIsNone(refused.deactivation_warning_at)
+
+    @freeze_time(NOW)
+    @override_settings(FF_DEACTIVATE_OLD_AIDANT=True)
+    def test_deactivate_warned_aidants_records_statistics_change(self):
+        warned = AidantFactory(
+            organisation=OrganisationFactory(department_insee_code="912"),
+            is_active=True,
+            last_login=timezone.now() - relativedelta(months=6),
+            deactivation_warning_at=timezone.now() - relativedelta(months=2),
+        )
+        StatisticsChange.objects.all().delete()
+
+        deactivate_warned_aidants(logger=MagicMock())
+
+        warned.refresh_from_db()
+        self.assertFalse(warned.is_active)
+        self.assertEqual([[warned.email]], [m.to for m in mail.outbox])
+        self.assertEqual(
+            ["912"],
+            list(
+                StatisticsChange.objects.values_list("department_insee_code", flat=True)
+            ),
+        )
+
 
 class ExportForBizdevs(TestCase):
+    def setUp(self):
+        media_root = TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
     @classmethod
     def setUpTestData(cls):
         cls.staff_aidant_org = OrganisationFactory(
@@ -340,11 +425,17 @@ class ExportForBizdevs(TestCase):
         ) as export_for_bizdevs_mock:
             # Prevent running the export when creating the request
             request = ExportRequest.objects.create(aidant=self.staff_aidant)
-            export_for_bizdevs_mock.assert_called_with(
-                (request.pk,), compression="zlib"
-            )
+            export_for_bizdevs_mock.assert_called_with((request.pk,))
+
+        file_name = export_for_bizdevs(request.pk)
+        request.refresh_from_db()
+        self.assertEqual(request.file.name, file_name)
+        with (
+            request.file.open("rb"),
+            gzip.open(request.file, "rt", encoding="utf-8") as f,
+        ):
+            result = f.read()
 
-        result = export_for_bizdevs(request.pk)
         self.assertEqual(
             dedent(
                 f"""
@@ -355,3 +446,294 @@ class ExportForBizdevs(TestCase):
             # Replace Windows' newline separator by Unix'
             result.replace("\r\n", "\n").strip(),
         )
+
+    def test_export_for_bizdevs_runs_a_bounded_number_of_queries(self):
+        def count_queries():
+            with mock.patch.object(
+                export_for_bizdevs,
+                "apply_async",
+                return_value=AsyncResult(str(uuid4())),
+            ):
+                request = ExportRequest.objects.create(aidant=self.staff_aidant)
+            with CaptureQueriesContext(connection) as queries:
+                export_for_bizdevs(request.pk)
+            return len(queries)
+
+        nb_queries = count_queries()
+
+        for _ in range(3):
+            aidant = AidantFactory(organisation=OrganisationFactory())
+            HabilitationRequestFactory(
+                email=aidant.email, organisation=aidant.organisation
+            )
+            Journal.log_connection(aidant)
+
+        self.assertEqual(nb_queries, count_queries())
+
+
+class SendRemoteConsentSms(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aidant = AidantFactory()
+        cls.consent_request_id = str(uuid4())
+        Journal.log_user_consent_request_sms_sent(
+            aidant=cls.aidant,
+            demarche=["argent"],
+            duree=AuthorizationDurations.MONTH,
+            remote_constent_method=RemoteConsentMethodChoices.SMS,
+            user_phone=parse_phone("0 800 840 800", "FR"),
+            consent_request_id=cls.consent_request_id,
+            message="Bonjour",
+        )
+
+    def send(self, logger=None):
+        return send_remote_consent_sms.apply(
+            ("+33800840800", self.consent_request_id, "Bonjour"), {"logger": logger}
+        )
+
+    def get_status_entries(self):
+        return Journal.objects.filter(
+            action=JournalActionKeywords.REMOTE_SMS_STATUS,
+            consent_request_id=self.consent_request_id,
+        )
+
+    @mock.patch("aidants_connect_web.tasks.SmsApi")
+    def test_success_is_journalized(self, sms_api_mock: MagicMock):
+        sms_api_mock.ApiRequestExpection = SmsApi.ApiRequestExpection
+        sms_api_mock.HttpRequestExpection = SmsApi.HttpRequestExpection
+
+        self.assertEqual(SmsStatus.SENT, self.send().get())
+
+        entry = self.get_status_entries().get()
+        self.assertEqual(self.aidant, entry.aidant)
+        self.assertEqual("+33800840800", entry.user_phone)
+        self.assertEqual({"status": "sent", "attempts": 1}, entry.metadata)
+
+    @mock.patch("aidants_connect_web.tasks.SmsApi")
+    def test_rejected_sms_is_not_sent_again(self, sms_api_mock: MagicMock):
+        sms_api_mock.ApiRequestExpection = SmsApi.ApiRequestExpection
+        sms_api_mock.HttpRequestExpection = SmsApi.HttpRequestExpection
+        sms_api_mock.return_value.send_sms.side_effect = SmsApi.ApiRequestExpection(
+            "INVALID_PHONE", "Invalid phone number"
+        )
+
+        logger = MagicMock()
+        self.assertEqual(SmsStatus.FAILED, self.send(logger).get())
+        logger.error.assert_called_once()
+
+        self.assertEqual(1, sms_api_mock.return_value.send_sms.call_count)
+        entry = self.get_status_entries().get()
+        self.assertEqual("failed", entry.metadata["status"])
+        self.assertEqual(1, entry.metadata["attempts"])
+
+    @override_settings(SMS_SEND_RETRY_DELAY=0)
+    @mock.patch("aidants_connect_web.tasks.SmsApi")
+    def test_transient_errors_are_retried(self, sms_api_mock: MagicMock):
+        sms_api_mock.ApiRequestExpection = SmsApi.ApiRequestExpection
+        sms_api_mock.HttpRequestExpection = SmsApi.HttpRequestExpection
+        sms_api_mock.return_value.send_sms.side_effect = [
+            SmsApi.HttpRequestExpection(503, "Service Unavailable"),
+            SmsApi.HttpRequestExpection(503, "Service Unavailable"),
+            None,
+        ]
+
+        self.assertEqual(SmsStatus.SENT, self.send().get())
+
+        self.assertEqual(3, sms_api_mock.return_value.send_sms.call_count)
+        entry = self.get_status_entries().get()
+        self.assertEqual({"status": "sent", "attempts": 3}, entry.metadata)
+
+    @override_settings(SMS_ASYNC_DISPATCH=True)
+    @mock.patch.object(send_remote_consent_sms, "delay")
+    def test_sms_is_queued_once_committed(self, delay_mock: MagicMock):
+        with self.captureOnCommitCallbacks(execute=True):
+            dispatch_remote_consent_sms(
+                parse_phone("0 800 840 800", "FR"), self.consent_request_id, "Bonjour"
+            )
+            delay_mock.assert_not_called()
+
+        delay_mock.assert_called_once_with(
+            "+33800840800", self.consent_request_id, "Bonjour"
+        )
+
+    @override_settings(SMS_ASYNC_DISPATCH=True)
+    @mock.patch.object(send_remote_consent_sms, "delay")
+    def test_queueing_failure_is_journalized(self, delay_mock: MagicMock):
+        delay_mock.side_effect = OperationalError("Broker unavailable")
+
+        with self.assertRaises(OperationalError):
+            with self.captureOnCommitCallbacks(execute=True):
+                dispatch_remote_consent_sms(
+                    parse_phone("0 800 840 800", "FR"),
+                    self.consent_request_id,
+                    "Bonjour",
+                )
+
+        entry = self.get_status_entries().get()
+        self.assertEqual("failed", entry.metadata["status"])
+        self.assertEqual(0, entry.metadata["attempts"])
+
+
+class SendOutgoingEmail(TestCase):
+    def enqueue(self, recipient="camille@ac.fr", dedup_key=None):
+        return OutgoingEmail.enqueue(
+            from_email="ac@aidantsconnect.beta.gouv.fr",
+            recipient_list=[recipient],
+            subject="Sujet",
+            message="Bonjour",
+            html_message="<p>Bonjour</p>",
+            dedup_key=dedup_key,
+        )
+
+    def test_email_is_sent_when_recorded(self):
+        [email] = self.enqueue()
+        email.refresh_from_db()
+
+        self.assertEqual(OutgoingEmailStatus.SENT, email.status)
+        self.assertEqual(1, email.attempts)
+        self.assertEqual(1, len(mail.outbox))
+        self.assertEqual(["camille@ac.fr"], mail.outbox[0].to)
+        self.assertEqual([("<p>Bonjour</p>", "text/html")], mail.outbox[0].alternatives)
+
+    def test_email_is_recorded_once_per_dedup_key(self):
+        self.assertEqual(1, len(self.enqueue(dedup_key="event:1")))
+        self.assertEqual([], self.enqueue(dedup_key="event:1"))
+        self.assertEqual(1, len(self.enqueue("dominique@ac.fr", dedup_key="event:1")))
+
+        self.assertEqual(2, OutgoingEmail.objects.count())
+        self.assertEqual(2, len(mail.outbox))
+
+    @override_settings(OUTGOING_EMAIL_ASYNC_DISPATCH=True)
+    @mock.patch("aidants_connect_web.tasks.send_outgoing_email.delay")
+    def test_email_is_dispatched_once_committed(self, delay_mock: MagicMock):
+        with self.captureOnCommitCallbacks() as callbacks:
+            [email] = self.enqueue()
+            delay_mock.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+        delay_mock.assert_called_once_with(email.pk)
+
+    @override_settings(OUTGOING_EMAIL_ASYNC_DISPATCH=True)
+    @mock.patch("aidants_connect_web.tasks.send_outgoing_email.delay")
+    def test_broker_outage_leaves_email_pending(self, delay_mock: MagicMock):
+        delay_mock.side_effect = OperationalError("Connection refused")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            [email] = self.enqueue()
+
+        email.refresh_from_db()
+        self.assertEqual(OutgoingEmailStatus.PENDING, email.status)
+        self.assertEqual(0, email.attempts)
+
+        # Dispatched again by the periodic task
+        with freeze_time(email.next_attempt_at):
+            send_pending_outgoing_emails(logger=MagicMock())
+        self.assertEqual(2, delay_mock.call_count)
+
+    @override_settings(
+        EMAIL_BACKEND="aidants_connect_common.tests.test_bulk_email.FlakyEmailBackend",
+        OUTGOING_EMAIL_MAX_ATTEMPTS=2,
+    )
+    def test_failed_email_is_retried_then_given_up(self):
+        [email] = self.enqueue("disconnect@ac.fr")
+        email.refresh_from_db()
+        self.assertEqual(OutgoingEmailStatus.PENDING, email.status)
+        self.assertEqual(1, email.attempts)
+        self.assertIn("Connection unexpectedly closed", email.last_error)
+
+        # Not due yet
+        send_pending_outgoing_emails(logger=MagicMock())
+        email.refresh_from_db()
+        self.assertEqual(1, email.attempts)
+
+        logger = MagicMock()
+        with freeze_time(email.next_attempt_at):
+            send_pending_outgoing_emails(logger=logger)
+        email.refresh_from_db()
+        self.assertEqual(OutgoingEmailStatus.FAILED, email.status)
+        self.assertEqual(2, email.attempts)
+        self.assertEqual(0, len(mail.outbox))
+
+    @override_settings(
+        OUTGOING_EMAIL_RECIPIENT_LIMIT=2, OUTGOING_EMAIL_RECIPIENT_PERIOD=3600
+    )
+    def test_emails_to_the_same_recipient_are_rate_limited(self):
+        with freeze_time("2026-10-01 10:00:00"):
+            self.enqueue()
+        with freeze_time("2026-10-01 10:10:00"):
+            self.enqueue()
+            [email] = self.enqueue()
+            self.enqueue("dominique@ac.fr")
+
+        email.refresh_from_db()
+        self.assertEqual(OutgoingEmailStatus.PENDING, email.status)
+        self.assertEqual(0, email.attempts)
+        self.assertEqual(
+            datetime(2026, 10, 1, 11, tzinfo=pytz.utc), email.next_attempt_at
+        )
+        self.assertEqual(3, len(mail.outbox))
+
+        with freeze_time(email.next_attempt_at):
+            send_pending_outgoing_emails(logger=MagicMock())
+        email.refresh_from_db()
+        self.assertEqual(OutgoingEmailStatus.SENT, email.status)
+        self.assertEqual(4, len(mail.outbox))
+
+
+class TransferMandats(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aidant = AidantFactory()
+        cls.organisation = OrganisationFactory()
+        cls.mandates = [
+            MandatFactory(organisation=cls.aidant.organisation) for _ in range(3)
+        ]
+
+    def test_transfer_is_run_when_created(self):
+        transfer = MandatTransfer.objects.create(
+            aidant=self.aidant,
+            organisation=self.organisation,
+            mandat_ids=[*(mandate.pk for mandate in self.mandates), 0],
+        )
+
+        self.assertTrue(transfer.is_done)
+        self.assertEqual(4, transfer.processed_count)
+        self.assertEqual([0], transfer.failed_ids)
+        self.assertEqual(
+            3, Mandat.objects.filter(organisation=self.organisation).count()
+        )
+        self.assertEqual(
+            3,
+            Journal.objects.filter(
+                action=JournalActionKeywords.TRANSFER_MANDAT
+            ).count(),
+        )
+
+    def test_transfer_error(self):
+        logger = MagicMock()
+        with mock.patch.object(
+            transfer_mandats, "apply", return_value=AsyncResult(str(uuid4()))
+        ):
+            transfer = MandatTransfer.objects.create(
+                aidant=self.aidant,
+                organisation=self.organisation,
+                mandat_ids=[mandate.pk for mandate in self.mandates],
+            )
+
+        with mock.patch.object(
+            Mandat, "transfer_to_organisation", side_effect=Exception("Oopsie")
+        ):
+            transfer_mandats(transfer.pk, logger=logger)
+
+        transfer.refresh_from_db()
+        self.assertTrue(transfer.is_error)
+        logger.exception.assert_called_once()
+        self.assertEqual(
+            0, Mandat.objects.filter(organisation=self.organisation).count()
+        )
+
+        # Transfers which are over are not run again
+        transfer_mandats(transfer.pk, logger=logger)
+        transfer.refresh_from_db()
+        self.assertTrue(transfer.is_error)
@@ -1,9 +1,19 @@
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
 from django.conf import settings
 from django.test import TestCase, TransactionTestCase, tag
 
 from aidants_connect_common.models import IdGenerator
 from aidants_connect_common.utils import generate_new_datapass_id
-from aidants_connect_web.utilities import generate_sha256_hash
+from aidants_connect_web import utilities
+from aidants_connect_web.utilities import (
+    generate_file_sha256_hash,
+    generate_sha256_hash,
+    render_formation_attestation,
+)
 
 
 @tag("utilities")
@@ -22,6 +32,44 @@ class UtilitiesTests(TestCase):
         self.assertEqual(generate_sha256_hash("123salt".encode()), hash_123salt)
         self.assertEqual(len(generate_sha256_hash("123salt".encode())), 64)
 
+    def test_generate_file_sha256_hash_is_memoised_until_the_file_changes(self):
+        hash_123 = "a665a45920422f9d417e4867efdc4fb8a04a1f3fff1fa07e998e86f7f7a27ae3"
+        with TemporaryDirectory() as directory:
+            file_path = Path(directory) / "template.html"
+            file_path.write_bytes(b"123")
+
+            with mock.patch("builtins.open", wraps=open) as open_mock:
+                self.assertEqual(hash_123, generate_file_sha256_hash(file_path))
+                self.assertEqual(hash_123, generate_file_sha256_hash(file_path))
+            self.assertEqual(1, open_mock.call_count)
+
+            file_path.write_bytes(b"123salt")
+            mtime = file_path.stat().st_mtime_ns
+            os.utime(file_path, ns=(mtime, mtime + 1_000_000_000))
+            self.assertEqual(
+                generate_sha256_hash(b"123salt"), generate_file_sha256_hash(file_path)
+            )
+
+    def test_render_formation_attestation_is_cached_and_built_in_memory(self):
+        utilities.attestation_render_cache.clear()
+        files_before = set(os.listdir("attestation"))
+
+        with mock.patch.object(
+            utilities, "PdfReader", wraps=utilities.PdfReader
+        ) as pdf_reader:
+            pdf = render_formation_attestation("Marge SIMPSON", "1 janvier 2024")
+            self.assertTrue(pdf.startswith(b"%PDF"))
+            self.assertEqual(
+                pdf, render_formation_attestation("Marge SIMPSON", "1 janvier 2024")
+            )
+            self.assertNotEqual(
+                pdf, render_formation_attestation("Lisa SIMPSON", "1 janvier 2024")
+            )
+
+        # Template and overlay, for each of the two renders
+        self.assertEqual(4, pdf_reader.call_count)
+        self.assertEqual(files_before, set(os.listdir("attestation")))
+
 
 @tag("utilities")
 class GenerateDatapassIdTests(TransactionTestCase):
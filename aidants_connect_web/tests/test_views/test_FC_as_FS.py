@@ -8,16 +8,20 @@ from django.conf import settings
 from django.test import TestCase, override_settings, tag
 from django.test.client import Client
 from django.urls import reverse
+from django.utils.timezone import now
 
 import jwt
 from freezegun import freeze_time
 
 from aidants_connect_common.constants import AuthorizationDurationChoices
+from aidants_connect_common.tests.third_party_service_mocks.franceconnect import (
+    FakeFranceConnect,
+)
 from aidants_connect_web.constants import RemoteConsentMethodChoices
 from aidants_connect_web.models import Connection, Journal, Usager
 from aidants_connect_web.tests.factories import AidantFactory, UsagerFactory
 from aidants_connect_web.utilities import generate_sha256_hash
-from aidants_connect_web.views.FC_as_FS import get_user_info
+from aidants_connect_web.views.FC_as_FS import get_user_info, get_user_infov2
 
 
 @tag("new_mandat", "FC_as_FS")
@@ -156,7 +160,9 @@ class FCCallback(TestCase):
         self.check_fc_error_with_message(response, self.connection.pk)
 
     @freeze_time(date)
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.post")
+    @mock.patch(
+        "aidants_connect_common.utils.franceconnect.FranceConnectClient.fetch_token"
+    )
     def test_wrong_nonce_when_decoding_returns_403(self, mock_post):
         mock_response = mock.Mock()
         mock_response.status_code = 200
@@ -180,7 +186,9 @@ class FCCallback(TestCase):
         self.check_fc_error_with_message(response, self.connection2.pk)
 
     @freeze_time(date)
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.post")
+    @mock.patch(
+        "aidants_connect_common.utils.franceconnect.FranceConnectClient.fetch_token"
+    )
     @mock.patch("aidants_connect_web.views.FC_as_FS.get_user_info")
     def test_request_existing_user_redirects_to_recap(
         self, mock_get_user_info, mock_post
@@ -244,7 +252,9 @@ class FCCallback(TestCase):
         self.assertEqual(last_journal_entry.action, "franceconnect_usager")
 
     @freeze_time(date)
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.post")
+    @mock.patch(
+        "aidants_connect_common.utils.franceconnect.FranceConnectClient.fetch_token"
+    )
     @mock.patch("aidants_connect_web.views.FC_as_FS.get_user_info")
     def test_request_new_user_redirects_to_recap(self, mock_get_user_info, mock_post):
         connection_number = 1
@@ -344,7 +354,9 @@ class GetUserInfoTests(TestCase):
             user_phone="0 800 840 800",
         )
 
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.get")
+    @mock.patch(
+        "aidants_connect_common.utils.franceconnect.FranceConnectClient.fetch_user_info"
+    )
     def test_well_formatted_new_user_info_outputs_usager(self, mock_get):
         mock_response = mock.Mock()
         mock_response.status_code = 200
@@ -371,7 +383,9 @@ class GetUserInfoTests(TestCase):
         self.assertEqual(usager.preferred_username, "TROIS")
         self.assertIsNone(error)
 
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.get")
+    @mock.patch(
+        "aidants_connect_common.utils.franceconnect.FranceConnectClient.fetch_user_info"
+    )
     def test_badly_formatted_new_user_info_outputs_error(self, mock_get):
         mock_response = mock.Mock()
         mock_response.status_code = 200
@@ -394,7 +408,9 @@ class GetUserInfoTests(TestCase):
         self.assertIsNone(usager)
         self.assertIn("The FranceConnect ID is not complete:", error)
 
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.get")
+    @mock.patch(
+        "aidants_connect_common.utils.franceconnect.FranceConnectClient.fetch_user_info"
+    )
     def test_empty_response_does_not_fail_badly(self, mock_get):
         mock_response = mock.Mock()
         mock_response.status_code = 200
@@ -406,7 +422,9 @@ class GetUserInfoTests(TestCase):
         self.assertIsNone(usager)
         self.assertIn("Unable to find sub in FC user info", error)
 
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.get")
+    @mock.patch(
+        "aidants_connect_common.utils.franceconnect.FranceConnectClient.fetch_user_info"
+    )
     def test_formatted_new_user_without_birthplace_outputs_usager(self, mock_get):
         mock_response = mock.Mock()
         mock_response.status_code = 200
@@ -431,7 +449,9 @@ class GetUserInfoTests(TestCase):
         self.assertEqual(usager.given_name, "Fabrice")
         self.assertIsNone(error)
 
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.get")
+    @mock.patch(
+        "aidants_connect_common.utils.franceconnect.FranceConnectClient.fetch_user_info"
+    )
     def test_formatted_existing_user_with_email_change_outputs_usager(self, mock_get):
         mock_response = mock.Mock()
         mock_response.status_code = 200
@@ -462,7 +482,9 @@ class GetUserInfoTests(TestCase):
         last_journal_entry = Journal.objects.last()
         self.assertEqual(last_journal_entry.action, "update_email_usager")
 
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.get")
+    @mock.patch(
+        "aidants_connect_common.utils.franceconnect.FranceConnectClient.fetch_user_info"
+    )
     def test_formatted_existing_user_with_phone_change_outputs_usager(self, mock_get):
         mock_response = mock.Mock()
         mock_response.status_code = 200
@@ -491,3 +513,93 @@ class GetUserInfoTests(TestCase):
 
         last_journal_entry = Journal.objects.last()
         self.assertEqual(last_journal_entry.action, "update_phone_usager")
+
+
+@tag("new_mandat", "FC_as_FS")
+class FCCallbackV2(TestCase):
+    def setUp(self):
+        self.fake = FakeFranceConnect("client_id", "client_secret").start()
+        self.addCleanup(self.fake.stop)
+        settings_override = override_settings(
+            FC_AS_FS_BASE_URL_V2=self.fake.base_url,
+            FC_AS_FS_ID_V2="client_id",
+            FC_AS_FS_SECRET_V2="client_secret",
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.aidant = AidantFactory()
+        self.connection = Connection.objects.create(
+            state="test_state",
+            connection_type="FS",
+            nonce="test_nonce",
+            expires_on=now() + timedelta(minutes=5),
+            aidant=self.aidant,
+            organisation=self.aidant.organisation,
+        )
+        self.fake.nonce = "test_nonce"
+        self.fake.user_info = {
+            "given_name": "Fabrice",
+            "family_name": "Mercier",
+            "sub": "456",
+            "birthdate": "1981-07-27",
+            "gender": Usager.GENDER_FEMALE,
+            "birthplace": "95277",
+            "birthcountry": Usager.BIRTHCOUNTRY_FRANCE,
+            "email": "test@test.com",
+        }
+
+    def test_callback_creates_usager(self):
+        self.client.force_login(self.aidant)
+
+        response = self.client.get(
+            reverse("fc_callbackv2"), data={"state": "test_state", "code": "code"}
+        )
+
+        self.assertTrue(
+            response["Location"].startswith(f"{self.fake.base_url}/session/end?")
+        )
+        self.connection.refresh_from_db()
+        self.assertEqual(self.connection.usager.given_name, "Fabrice")
+        self.assertEqual(Journal.objects.last().action, "franceconnect_usager")
+
+    def test_wrong_nonce_triggers_fc_error(self):
+        self.fake.nonce = "wrong_nonce"
+        self.client.force_login(self.aidant)
+
+        response = self.client.get(
+            reverse("fc_callbackv2"), data={"state": "test_state", "code": "code"}
+        )
+
+        self.assertRedirects(
+            response,
+            f"{reverse('espace_aidant:new_mandat')}"
+            f"?{urlencode({'connection_id': self.connection.pk})}",
+            fetch_redirect_response=False,
+        )
+
+    def test_unavailable_franceconnect_triggers_fc_error(self):
+        self.fake.stop()
+        self.client.force_login(self.aidant)
+
+        response = self.client.get(
+            reverse("fc_callbackv2"), data={"state": "test_state", "code": "code"}
+        )
+
+        self.assertRedirects(
+            response,
+            f"{reverse('espace_aidant:new_mandat')}"
+            f"?{urlencode({'connection_id': self.connection.pk})}",
+            fetch_redirect_response=False,
+        )
+
+    def test_get_user_infov2(self):
+        self.connection.access_token = self.fake.issue_tokens(
+            {"client_id": "client_id", "client_secret": "client_secret", "code": "c"}
+        )[1]["access_token"]
+
+        usager, error = get_user_infov2(self.connection)
+
+        self.assertIsNone(error)
+        self.assertEqual(usager.family_name, "Mercier")
+        self.assertEqual(usager.email, "test@test.com")
@@ -24,7 +24,7 @@ from aidants_connect_web.tests.factories import (
     MandatFactory,
     UsagerFactory,
 )
-from aidants_connect_web.utilities import generate_id_token
+from aidants_connect_web.utilities import generate_fc_as_fi_digest, generate_id_token
 from aidants_connect_web.views import id_provider
 
 
@@ -605,13 +605,13 @@ class TokenTests(TestCase):
     @classmethod
     def setUpTestData(cls):
         cls.code = "test_code"
-        cls.code_hash = make_password(cls.code, settings.FC_AS_FI_HASH_SALT)
+        cls.code_digest = generate_fc_as_fi_digest(cls.code)
         cls.usager = UsagerFactory(given_name="Joséphine")
         cls.usager.sub = "avalidsub789"
         cls.usager.save()
         cls.connection = Connection()
         cls.connection.state = "avalidstate123"
-        cls.connection.code = cls.code_hash
+        cls.connection.code_digest = cls.code_digest
         cls.connection.nonce = "avalidnonce456"
         cls.connection.usager = cls.usager
         cls.connection.expires_on = datetime(
@@ -644,13 +644,13 @@ class TokenTests(TestCase):
         response_content = response.content.decode("utf-8")
         self.assertEqual(response.status_code, 200)
         response_json = json.loads(response_content)
-        response_json["access_token"] = make_password(
-            response_json["access_token"], settings.FC_AS_FI_HASH_SALT
+        response_json["access_token"] = generate_fc_as_fi_digest(
+            response_json["access_token"]
         )
-        connection = Connection.objects.get(code=self.code_hash)
+        connection = Connection.objects.get(code_digest=self.code_digest)
 
         awaited_response = {
-            "access_token": connection.access_token,
+            "access_token": connection.access_token_digest,
             "expires_in": 3600,
             "id_token": jwt.encode(
                 generate_id_token(connection),
@@ -668,6 +668,50 @@ class TokenTests(TestCase):
         response = self.client.post("/token/", request)
         self.assertEqual(response.status_code, 200)
 
+    @freeze_time(date)
+    @override_settings(FC_AS_FI_ACCEPT_LEGACY_HASHES=True)
+    def test_legacy_code_hash(self):
+        Connection.objects.filter(pk=self.connection.pk).update(
+            code=make_password(self.code, settings.FC_AS_FI_HASH_SALT),
+            code_digest=None,
+        )
+
+        with self.settings(FC_AS_FI_ACCEPT_LEGACY_HASHES=False):
+            response = self.client.post("/token/", self.fc_request)
+            self.assertEqual(response.status_code, 403)
+
+        # The legacy hash is not derived when no unexpired connection needs it
+        with (
+            freeze_time(self.date + timedelta(days=1)),
+            mock.patch(
+                "aidants_connect_web.models.mandat.make_password"
+            ) as make_password_mock,
+        ):
+            with self.assertRaises(Connection.DoesNotExist):
+                Connection.objects.get_by_code(self.code)
+            make_password_mock.assert_not_called()
+
+        # Nor for connections created after codes were stored as digests
+        with (
+            mock.patch(
+                "aidants_connect_web.models.mandat."
+                "get_connection_digests_migration_date",
+                return_value=self.date - timedelta(days=1),
+            ),
+            mock.patch(
+                "aidants_connect_web.models.mandat.make_password"
+            ) as make_password_mock,
+        ):
+            with self.assertRaises(Connection.DoesNotExist):
+                Connection.objects.get_by_code(self.code)
+            make_password_mock.assert_not_called()
+
+        response = self.client.post("/token/", self.fc_request)
+        self.assertEqual(response.status_code, 200)
+        # The connection can now be found by its digest
+        self.connection.refresh_from_db()
+        self.assertEqual(self.code_digest, self.connection.code_digest)
+
     def test_wrong_grant_type_triggers_403(self):
         fc_request = dict(self.fc_request)
         fc_request["grant_type"] = "not_authorization_code"
@@ -749,15 +793,12 @@ class UserInfoTests(TestCase):
         )
 
         cls.access_token = "test_access_token"
-        cls.access_token_hash = make_password(
-            cls.access_token, settings.FC_AS_FI_HASH_SALT
-        )
         cls.connection = Connection.objects.create(
             state="avalidstate123",
             code="test_code",
             nonce="avalidnonde456",
             usager=cls.usager,
-            access_token=cls.access_token_hash,
+            access_token_digest=generate_fc_as_fi_digest(cls.access_token),
             expires_on=datetime(
                 2012, 1, 14, 3, 21, 34, 0, tzinfo=ZoneInfo("Europe/Paris")
             ),
@@ -806,6 +847,30 @@ class UserInfoTests(TestCase):
         self.assertEqual(journal_entries.count(), 1)
         self.assertEqual(journal_entries.first().action, "use_autorisation")
 
+    @freeze_time(date)
+    @override_settings(FC_AS_FI_ACCEPT_LEGACY_HASHES=True)
+    def test_legacy_access_token_hash(self):
+        Connection.objects.filter(pk=self.connection.pk).update(
+            access_token=make_password(self.access_token, settings.FC_AS_FI_HASH_SALT),
+            access_token_digest=None,
+        )
+
+        with self.settings(FC_AS_FI_ACCEPT_LEGACY_HASHES=False):
+            response = self.client.get(
+                "/userinfo/", **{"HTTP_AUTHORIZATION": f"Bearer {self.access_token}"}
+            )
+            self.assertEqual(response.status_code, 403)
+
+        response = self.client.get(
+            "/userinfo/", **{"HTTP_AUTHORIZATION": f"Bearer {self.access_token}"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.connection.refresh_from_db()
+        self.assertEqual(
+            generate_fc_as_fi_digest(self.access_token),
+            self.connection.access_token_digest,
+        )
+
     date_expired = date + timedelta(seconds=settings.FC_CONNECTION_AGE + 1200)
 
     @freeze_time(date_expired)
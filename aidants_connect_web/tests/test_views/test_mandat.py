@@ -1,5 +1,6 @@
 from datetime import date, datetime, timedelta
 from textwrap import dedent
+from unittest import mock
 from uuid import uuid4
 from zoneinfo import ZoneInfo
 
@@ -11,8 +12,10 @@ from django.urls import resolve, reverse
 from django.utils import formats, timezone
 
 from freezegun import freeze_time
+from redis.exceptions import ConnectionError as RedisConnectionError
 
 from aidants_connect_pico_cms.models import MandateTranslation
+from aidants_connect_web.consent_notifications import long_poll_slot
 from aidants_connect_web.constants import RemoteConsentMethodChoices
 from aidants_connect_web.forms import MandatForm
 from aidants_connect_web.models import (
@@ -617,6 +620,41 @@ class GenerateAttestationTests(TestCase):
         )
         self.assertEqual(response.status_code, 200)
 
+    def test_autorisation_qrcode_is_revalidated_by_browsers(self):
+        mandat = MandatFactory(
+            organisation=self.aidant_thierry.organisation,
+            usager=self.test_usager,
+            expiration_date=timezone.now() + timedelta(days=5),
+        )
+        Journal.log_attestation_creation(
+            aidant=self.aidant_thierry,
+            usager=self.test_usager,
+            demarches=["papiers"],
+            duree=6,
+            is_remote_mandat=False,
+            access_token="fjfgjfdkldlzlsmqqxxcn",
+            attestation_hash="a_hash",
+            mandat=mandat,
+            remote_constent_method="",
+            user_phone="",
+            consent_request_id="",
+        )
+        url = reverse("espace_aidant:new_attestation_qrcode", args=(mandat.pk,))
+        self.client.force_login(self.aidant_thierry)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("no-cache", response.headers["Cache-Control"])
+        self.assertIn("private", response.headers["Cache-Control"])
+        self.assertNotIn("immutable", response.headers["Cache-Control"])
+
+        with mock.patch(
+            "aidants_connect_web.views.mandat.render_attestation_qrcode"
+        ) as render_attestation_qrcode:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response.headers["ETag"])
+        self.assertEqual(response.status_code, 304)
+        render_attestation_qrcode.assert_not_called()
+
     def test_response_is_the_print_page(self):
         self.client.force_login(self.aidant_thierry)
 
@@ -1018,3 +1056,119 @@ class RemoteSecondStepMissingFirstStepTests(TestCase):
         messages = list(django_messages.get_messages(response.wsgi_request))
         self.assertEqual(len(messages), 1)
         self.assertIn("récapitulatif de mandat n'a pas été envoyé", messages[0].message)
+
+
+@tag("new_mandat")
+@override_settings(FF_ACTIVATE_SMS_CONSENT=True)
+class WaitingRoomJsonTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aidant = AidantFactory()
+        cls.connection = ConnectionFactory(
+            aidant=cls.aidant,
+            organisation=cls.aidant.organisation,
+            mandat_is_remote=True,
+            remote_constent_method=RemoteConsentMethodChoices.SMS.name,
+            consent_request_id=UUID,
+            user_phone="+33800840800",
+            demarches=["papiers"],
+        )
+
+    def setUp(self):
+        self.client.force_login(self.aidant)
+        session = self.client.session
+        session["connection"] = self.connection.pk
+        session.save()
+
+        self.pubsub = mock.MagicMock()
+        redis_client = mock.MagicMock()
+        redis_client.pubsub.return_value = self.pubsub
+        patcher = mock.patch(
+            "aidants_connect_web.consent_notifications._get_redis_client",
+            return_value=redis_client,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def log_consent(self):
+        Journal.log_user_consents_sms(
+            aidant=self.aidant,
+            demarche=self.connection.demarches,
+            duree=self.connection.duree_keyword,
+            remote_constent_method=self.connection.remote_constent_method,
+            user_phone=self.connection.user_phone,
+            consent_request_id=self.connection.consent_request_id,
+            message="Oui",
+        )
+
+    def test_consent_already_received(self):
+        self.log_consent()
+
+        response = self.client.post(
+            reverse("espace_aidant:new_mandat_waiting_room_json")
+        )
+
+        self.assertEqual({"connectionStatus": "OK", "longPoll": True}, response.json())
+        self.pubsub.get_message.assert_not_called()
+
+    def test_request_is_held_until_consent_is_received(self):
+        def get_message(*args, **kwargs):
+            self.log_consent()
+            return {"type": "message", "data": b"1"}
+
+        self.pubsub.get_message.side_effect = get_message
+
+        response = self.client.post(
+            reverse("espace_aidant:new_mandat_waiting_room_json")
+        )
+
+        self.assertEqual({"connectionStatus": "OK", "longPoll": True}, response.json())
+        self.pubsub.subscribe.assert_called_once_with(
+            f"aidants_connect_web.consent_notifications:{UUID}"
+        )
+        self.pubsub.close.assert_called_once()
+
+    @override_settings(WAITING_ROOM_LONG_POLL_SECONDS=1)
+    def test_request_is_released_on_timeout(self):
+        self.pubsub.get_message.return_value = None
+
+        response = self.client.post(
+            reverse("espace_aidant:new_mandat_waiting_room_json")
+        )
+
+        self.assertEqual({"connectionStatus": "NOK", "longPoll": True}, response.json())
+
+    @override_settings(WAITING_ROOM_MAX_LONG_POLLS=1)
+    def test_polls_when_too_many_requests_are_held(self):
+        self.pubsub.get_message.return_value = None
+
+        with long_poll_slot() as reserved:
+            self.assertTrue(reserved)
+            response = self.client.post(
+                reverse("espace_aidant:new_mandat_waiting_room_json")
+            )
+        self.assertEqual({"connectionStatus": "NOK"}, response.json())
+        self.pubsub.subscribe.assert_not_called()
+
+        # The slot is released once the request is answered
+        self.log_consent()
+        response = self.client.post(
+            reverse("espace_aidant:new_mandat_waiting_room_json")
+        )
+        self.assertEqual({"connectionStatus": "OK", "longPoll": True}, response.json())
+        with long_poll_slot() as reserved:
+            self.assertTrue(reserved)
+
+    def test_falls_back_to_polling_without_redis(self):
+        self.pubsub.subscribe.side_effect = RedisConnectionError
+
+        response = self.client.post(
+            reverse("espace_aidant:new_mandat_waiting_room_json")
+        )
+        self.assertEqual({"connectionStatus": "NOK"}, response.json())
+
+        self.log_consent()
+        response = self.client.post(
+            reverse("espace_aidant:new_mandat_waiting_room_json")
+        )
+        self.assertEqual({"connectionStatus": "OK"}, response.json())
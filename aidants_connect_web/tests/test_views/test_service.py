@@ -1,8 +1,10 @@
 import os
 from datetime import datetime
+from unittest import mock
 from urllib.parse import urlencode
 
 from django.conf import settings
+from django.db import DatabaseError
 from django.test import TestCase, tag
 from django.test.client import Client
 from django.urls import resolve, reverse
@@ -10,7 +12,9 @@ from django.utils import timezone
 
 from freezegun import freeze_time
 
-from aidants_connect_web.models import Journal, Organisation
+from aidants_connect_web.models import Journal, Mandat, Organisation, PublicStatistiques
+from aidants_connect_web.statistics import compute_public_statistics
+from aidants_connect_web.tasks import refresh_public_statistics
 from aidants_connect_web.tests.factories import (
     AidantFactory,
     AutorisationFactory,
@@ -311,6 +315,55 @@ class StatistiquesTests(TestCase):
         self.assertEqual(response.context["data"]["values"][0], 3)
         self.assertEqual(response.context["data"]["values"][1], 0)
 
+    def test_stats_are_served_from_the_last_snapshot(self):
+        compute_public_statistics()
+        TOTPDeviceFactory(user=AidantFactory(can_create_mandats=True, is_active=True))
+
+        response = self.client.get(reverse("statistiques"))
+        self.assertEqual(
+            response.context["deployment_section"][0]["Aidants habilités"], 1
+        )
+
+        compute_public_statistics()
+        self.assertEqual(1, PublicStatistiques.objects.count())
+        response = self.client.get(reverse("statistiques"))
+        self.assertEqual(
+            response.context["deployment_section"][0]["Aidants habilités"], 2
+        )
+
+    def test_stats_keep_the_last_snapshot_when_refresh_fails(self):
+        snapshot = compute_public_statistics()
+
+        with (
+            mock.patch.object(Mandat.objects, "exclude", side_effect=DatabaseError),
+            self.assertRaises(DatabaseError),
+        ):
+            refresh_public_statistics()
+
+        self.assertEqual(snapshot, PublicStatistiques.objects.get())
+        response = self.client.get(reverse("statistiques"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_stats_are_cacheable(self):
+        with freeze_time("2024-01-01 12:00:00"):
+            compute_public_statistics()
+
+        response = self.client.get(reverse("statistiques"))
+        self.assertEqual(
+            response.headers["Last-Modified"], "Mon, 01 Jan 2024 12:00:00 GMT"
+        )
+        self.assertIn("public", response.headers["Cache-Control"])
+        self.assertIn(
+            f"max-age={settings.PUBLIC_STATISTICS_MAX_AGE}",
+            response.headers["Cache-Control"],
+        )
+
+        response = self.client.get(
+            reverse("statistiques"),
+            headers={"If-Modified-Since": "Mon, 01 Jan 2024 12:00:00 GMT"},
+        )
+        self.assertEqual(response.status_code, 304)
+
 
 @tag("service")
 class MentionsLegalesTests(TestCase):
@@ -1,6 +1,12 @@
+from urllib.parse import urlencode
+from uuid import uuid4
+
 from django.test import TestCase, tag
 from django.urls import resolve, reverse
 
+from aidants_connect_common.constants import JournalActionKeywords
+from aidants_connect_web.constants import SmsStatus
+from aidants_connect_web.models import Journal
 from aidants_connect_web.views import sms
 
 
@@ -18,3 +24,34 @@ class CallbackTests(TestCase):
         self.assertTrue(target._check_user_consents("  Oui  .  "))
         self.assertFalse(target._check_user_consents("Oui;"))
         self.assertFalse(target._check_user_consents("Oui non"))
+
+    def test_send_report_is_journalized(self):
+        for error_code, status, content_type in (
+            (0, SmsStatus.DELIVERED, "application/json"),
+            (1, SmsStatus.UNDELIVERED, "application/json"),
+            # Form-encoded reports carry the code as a string
+            ("0", SmsStatus.DELIVERED, "application/x-www-form-urlencoded"),
+            ("1", SmsStatus.UNDELIVERED, "application/x-www-form-urlencoded"),
+        ):
+            with self.subTest(status=status, content_type=content_type):
+                consent_request_id = str(uuid4())
+                data = {
+                    "correlationId": consent_request_id,
+                    "userId": "33800840800",
+                    "status": 5,
+                    "statusMessage": "Delivered to end-user",
+                    "errorCode": error_code,
+                }
+                response = self.client.post(
+                    reverse("sms_callback"),
+                    (data if content_type == "application/json" else urlencode(data)),
+                    content_type=content_type,
+                )
+
+                self.assertEqual(200, response.status_code)
+                entry = Journal.objects.get(
+                    action=JournalActionKeywords.REMOTE_SMS_STATUS,
+                    consent_request_id=consent_request_id,
+                )
+                self.assertEqual("+33800840800", entry.user_phone)
+                self.assertEqual(status, entry.metadata["status"])
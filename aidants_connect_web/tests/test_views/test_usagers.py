@@ -1,6 +1,8 @@
 from datetime import timedelta
 
-from django.test import TestCase, tag
+from django.db import connection
+from django.test import TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
@@ -12,10 +14,7 @@ from aidants_connect_web.tests.factories import (
     RevokedOverYearMandatFactory,
     UsagerFactory,
 )
-from aidants_connect_web.views.usagers import (
-    _get_mandats_for_usagers_index,
-    _get_usagers_dict_from_mandats,
-)
+from aidants_connect_web.views.usagers import _get_mandats_for_usagers_index
 
 
 @tag("usagers")
@@ -146,34 +145,76 @@ class ViewAutorisationsTests(TestCase):
             ],
         )
 
-    def test__get_usagers_dict_from_mandats(self):
-        mandats = _get_mandats_for_usagers_index(self.aidant)
-        usagers = _get_usagers_dict_from_mandats(mandats)
-        self.assertEqual(4, usagers["total"])
-        self.assertEqual(2, usagers["with_valid_mandate_count"])
-        self.assertEqual(2, usagers["without_valid_mandate_count"])
-        usager, autorisations = usagers["with_valid_mandate"].popitem(last=False)
-        self.assertEqual(usager, self.usager_corentin)
+    def test_usagers_index_lists_mandates_by_status(self):
+        self.client.force_login(self.aidant)
+        response = self.client.get(reverse("espace_aidant:usagers"))
+
         self.assertEqual(
-            autorisations,
-            [
-                ("famille", False),
-            ],
+            [self.usager_corentin, self.usager_josephine],
+            list(response.context["valid_mandats"]),
+        )
+        self.assertEqual(
+            ["famille", "papiers", "social"],
+            sorted(
+                response.context["valid_mandats"][self.usager_josephine][
+                    "unique_permissions"
+                ]
+            ),
+        )
+        self.assertEqual(
+            [self.usager_corentin, self.usager_alice, self.usager_philomene],
+            list(response.context["expired_mandats"]),
+        )
+        self.assertEqual({}, response.context["revoked_mandats"])
+
+    def test_usagers_index_number_of_queries_doesnt_depend_on_mandates(self):
+        self.client.force_login(self.aidant)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("espace_aidant:usagers"))
+
+        for _ in range(5):
+            usager = UsagerFactory()
+            for _ in range(3):
+                mandat = MandatFactory(
+                    organisation=self.aidant.organisation, usager=usager
+                )
+                AutorisationFactory(mandat=mandat, demarche="papiers")
+                AutorisationFactory(
+                    mandat=mandat, demarche="famille", revocation_date=timezone.now()
+                )
+
+        with self.assertNumQueries(len(queries)):
+            self.client.get(reverse("espace_aidant:usagers"))
+
+    @override_settings(USAGERS_INDEX_PAGE_SIZE=1)
+    def test_usagers_index_paginates_each_tab(self):
+        self.client.force_login(self.aidant)
+        response = self.client.get(
+            reverse("espace_aidant:usagers"), {"onglet": "expires", "page": 2}
         )
 
-        usager, autorisations = usagers["with_valid_mandate"].popitem(last=False)
-        self.assertEqual(usager, self.usager_josephine)
+        self.assertEqual("expires", response.context["selected_tab"])
+        self.assertEqual([self.usager_alice], list(response.context["expired_mandats"]))
+        self.assertEqual(3, response.context["tabs"]["expires"]["page"].paginator.count)
+        # Other tabs stay on their first page
         self.assertEqual(
-            autorisations,
-            [
-                ("papiers", self.mandat_aidant_josephine_1.expiration_date),
-                ("social", self.mandat_aidant_josephine_6.expiration_date),
-            ],
+            [self.usager_corentin], list(response.context["valid_mandats"])
+        )
+        self.assertContains(response, "?onglet=expires&page=3")
+
+    def test_usagers_index_search(self):
+        self.client.force_login(self.aidant)
+        response = self.client.get(
+            reverse("espace_aidant:usagers"), {"q": "dupont jos"}
         )
 
-        usagers_without_valid_mandate = set(usagers["without_valid_mandate"].keys())
-        self.assertSetEqual(
-            usagers_without_valid_mandate, {self.usager_alice, self.usager_philomene}
+        self.assertEqual(
+            [self.usager_josephine], list(response.context["valid_mandats"])
+        )
+        self.assertEqual({}, response.context["expired_mandats"])
+        self.assertEqual(
+            "q=dupont+jos&onglet=actifs",
+            response.context["tabs"]["actifs"]["querystring"],
         )
 
 
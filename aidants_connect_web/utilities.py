@@ -1,15 +1,35 @@
 import hashlib
+import hmac
 import time
 from datetime import date, datetime
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
 from re import sub
 from typing import TYPE_CHECKING, Optional, Union
 
 from django.conf import settings
 
+import qrcode
+from pypdf import PdfReader, PdfWriter
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from aidants_connect_common.utils.render_cache import RenderCache, render_key
+
 if TYPE_CHECKING:
     from aidants_connect_web.models import Aidant, Connection, Usager
 
+_BASE_PATH = Path(__file__).resolve().parent
+
+# Hashes of the files hashed by `generate_file_sha256_hash`, along with their
+# modification time when they were hashed
+_file_hashes: dict[Path, tuple[int, str]] = {}
+
+# Attestation QR codes and formation certificates, see `RenderCache`
+attestation_render_cache = RenderCache(settings.ATTESTATION_RENDER_CACHE_SIZE)
+
 
 def generate_sha256_hash(value: bytes):
     """
@@ -25,16 +45,37 @@ def generate_sha256_hash(value: bytes):
     return hashlib.sha256(value).hexdigest()
 
 
+def generate_fc_as_fi_digest(value: str) -> str:
+    """
+    Generate the HMAC-SHA-256 digest, keyed with `FC_AS_FI_HASH_SALT`, under which
+    the codes and access tokens delivered to FranceConnect are stored
+    :param value: the code or access token
+    :return: a digest (string) of 64 characters
+    """
+    return hmac.new(
+        settings.FC_AS_FI_HASH_SALT.encode(), value.encode(), hashlib.sha256
+    ).hexdigest()
+
+
 def generate_file_sha256_hash(filename):
     """
     Generate a SHA-256 hash of a file
+    The hash is memoised for the lifetime of the process and only computed again
+    when the file's modification time changes
+    :param filename: path of the file, relative to this module's directory
     """
-    base_path = Path(__file__).resolve().parent
-    file_path = (base_path / filename).resolve()
+    file_path = (_BASE_PATH / filename).resolve()
+    mtime = file_path.stat().st_mtime_ns
+    memoised = _file_hashes.get(file_path)
+    if memoised is not None and memoised[0] == mtime:
+        return memoised[1]
+
     with open(file_path, "rb") as f:
         file_bytes = f.read()  # read entire file as bytes
         file_readable_hash = generate_sha256_hash(file_bytes)
-        return file_readable_hash
+
+    _file_hashes[file_path] = (mtime, file_readable_hash)
+    return file_readable_hash
 
 
 def validate_attestation_hash(attestation_string, attestation_hash):
@@ -53,10 +94,16 @@ def generate_attestation_hash(
     creation_date: str = date.today().isoformat(),
     mandat_template_path: str = settings.MANDAT_TEMPLATE_PATH,
     organisation_id: Optional[int] = None,
+    template_hash: Optional[str] = None,
 ):
+    """
+    :param template_hash: hash of the file at `mandat_template_path`, if already known
+    """
     organisation_id = (
-        aidant.organisation.id if organisation_id is None else organisation_id
+        aidant.organisation_id if organisation_id is None else organisation_id
     )
+    if template_hash is None:
+        template_hash = generate_file_sha256_hash(f"templates/{mandat_template_path}")
 
     if isinstance(demarches, str):
         demarches_list = demarches
@@ -70,7 +117,7 @@ def generate_attestation_hash(
         "demarches_list": demarches_list,
         "expiration_date": expiration_date.date().isoformat(),
         "organisation_id": organisation_id,
-        "template_hash": generate_file_sha256_hash(f"templates/{mandat_template_path}"),
+        "template_hash": template_hash,
         "usager_sub": usager.sub,
     }
     sorted_attestation_data = dict(sorted(attestation_data.items()))
@@ -81,6 +128,76 @@ def generate_attestation_hash(
     return generate_sha256_hash(attestation_string_with_salt.encode("utf-8"))
 
 
+def attestation_qrcode_key(attestation_hash: str) -> str:
+    return render_key("attestation_qrcode", attestation_hash)
+
+
+def render_attestation_qrcode(attestation_hash: str) -> bytes:
+    """:returns: the PNG of the QR code printed on the mandate's attestation"""
+
+    def render():
+        stream = BytesIO()
+        qrcode.make(attestation_hash).save(stream, "PNG")
+        return stream.getvalue()
+
+    return attestation_render_cache.get_or_render(
+        attestation_qrcode_key(attestation_hash), render
+    )
+
+
+@lru_cache(maxsize=None)
+def _register_formation_attestation_fonts():
+    pdfmetrics.registerFont(
+        TTFont("mariannethin", "attestation/Marianne-ThinItalic.ttf")
+    )
+    pdfmetrics.registerFont(TTFont("spectralblod", "attestation/Spectral-Bold.ttf"))
+
+
+def render_formation_attestation(name: str, formation_date: str) -> bytes:
+    """
+    :returns: the PDF of the formation certificate, filled with the aidant's name
+        and formation date over `settings.ATTESTATION_TEMPLATE_NAME`
+    """
+    template_hash = generate_file_sha256_hash(
+        Path(settings.ATTESTATION_TEMPLATE_NAME).resolve()
+    )
+    key = render_key(
+        "formation_attestation",
+        template_hash,
+        name,
+        formation_date,
+        settings.ATTESTATION_X_NAME,
+        settings.ATTESTATION_Y_NAME,
+        settings.ATTESTATION_X_DATE,
+        settings.ATTESTATION_Y_DATE,
+    )
+
+    def render():
+        _register_formation_attestation_fonts()
+        overlay = BytesIO()
+        c = canvas.Canvas(overlay)
+        c.setFont("spectralblod", 40)
+        c.drawString(settings.ATTESTATION_X_NAME, settings.ATTESTATION_Y_NAME, name)
+        c.setFont("mariannethin", 10)
+        c.drawString(
+            settings.ATTESTATION_X_DATE, settings.ATTESTATION_Y_DATE, formation_date
+        )
+        c.save()
+
+        reader = PdfReader(settings.ATTESTATION_TEMPLATE_NAME)
+        overlay_reader = PdfReader(overlay)
+        writer = PdfWriter()
+        for i, page in enumerate(reader.pages):
+            if i < len(overlay_reader.pages):
+                page.merge_page(overlay_reader.pages[i])
+            writer.add_page(page)
+        output = BytesIO()
+        writer.write(output)
+        return output.getvalue()
+
+    return attestation_render_cache.get_or_render(key, render)
+
+
 def mandate_template_path():
     return settings.MANDAT_TEMPLATE_PATH
 
@@ -11,9 +11,10 @@ from django.shortcuts import redirect, render
 from django.urls import reverse
 
 import jwt
-import requests as python_request
 from jwt.api_jwt import ExpiredSignatureError
+from requests import RequestException
 
+from aidants_connect_common.utils.franceconnect import FranceConnectClient
 from aidants_connect_common.views import RequireConnectionView
 from aidants_connect_web.constants import RemoteConsentMethodChoices
 from aidants_connect_web.models import Connection, Journal, Usager
@@ -23,6 +24,21 @@ logging.basicConfig(level=logging.INFO)
 log = logging.getLogger()
 
 
+def fc_client() -> FranceConnectClient:
+    return FranceConnectClient.pooled(
+        settings.FC_AS_FS_BASE_URL, settings.FC_AS_FS_ID, settings.FC_AS_FS_SECRET
+    )
+
+
+def fc_client_v2() -> FranceConnectClient:
+    return FranceConnectClient.pooled(
+        settings.FC_AS_FS_BASE_URL_V2,
+        settings.FC_AS_FS_ID_V2,
+        settings.FC_AS_FS_SECRET_V2,
+        (settings.FC_AS_FS_KID_V2, settings.FC_AS_FS_N_V2),
+    )
+
+
 class FCAuthorize(RequireConnectionView):
     def get(self, request: HttpRequest, *args, **kwargs):
         if (
@@ -90,8 +106,6 @@ def fc_callback(request):
         return redirect(f"{reverse('espace_aidant:new_mandat')}{query_params}")
 
     fc_base = settings.FC_AS_FS_BASE_URL
-    fc_id = settings.FC_AS_FS_ID
-    fc_secret = settings.FC_AS_FS_SECRET
     state = request.GET.get("state")
 
     try:
@@ -113,18 +127,13 @@ def fc_callback(request):
     if not code:
         return fc_error("FC AS FS: no code has been provided", connection.pk)
 
-    token_url = f"{fc_base}/token"
     redirect_uri = f"{settings.FC_AS_FS_CALLBACK_URL}{reverse('fc_callback')}"
-    payload = {
-        "grant_type": "authorization_code",
-        "redirect_uri": redirect_uri,
-        "client_id": fc_id,
-        "client_secret": fc_secret,
-        "code": code,
-    }
-    headers = {"Accept": "application/json"}
-
-    request_for_token = python_request.post(token_url, data=payload, headers=headers)
+    client = fc_client()
+    try:
+        request_for_token = client.fetch_token(code, redirect_uri)
+    except RequestException as e:
+        return fc_error(f"Request for a FranceConnect token failed: {e}", connection.pk)
+    token_url = request_for_token.url
 
     try:
         content = request_for_token.json()
@@ -207,8 +216,6 @@ def fc_callback_v2(request):
         return redirect(f"{reverse('espace_aidant:new_mandat')}{query_params}")
 
     fc_base = settings.FC_AS_FS_BASE_URL_V2
-    fc_id = settings.FC_AS_FS_ID_V2
-    fc_secret = settings.FC_AS_FS_SECRET_V2
     state = request.GET.get("state")
 
     try:
@@ -230,18 +237,13 @@ def fc_callback_v2(request):
     if not code:
         return fc_error("FC AS FS: no code has been provided", connection.pk)
 
-    token_url = f"{fc_base}/token"
     redirect_uri = f"{settings.FC_AS_FS_CALLBACK_URL_V2}{reverse('fc_callbackv2')}"
-    payload = {
-        "grant_type": "authorization_code",
-        "redirect_uri": redirect_uri,
-        "client_id": fc_id,
-        "client_secret": fc_secret,
-        "code": code,
-    }
-    headers = {"Accept": "application/json"}
-
-    request_for_token = python_request.post(token_url, data=payload, headers=headers)
+    client = fc_client_v2()
+    try:
+        request_for_token = client.fetch_token(code, redirect_uri)
+    except RequestException as e:
+        return fc_error(f"Request for a FranceConnect token failed: {e}", connection.pk)
+    token_url = request_for_token.url
 
     try:
         content = request_for_token.json()
@@ -264,22 +266,7 @@ def fc_callback_v2(request):
     fc_id_token = content.get("id_token")
 
     try:
-        dict_pk = {
-            "kty": "RSA",
-            "use": "sig",
-            "kid": settings.FC_AS_FS_KID_V2,
-            "alg": "RS256",
-            "e": "AQAB",
-            "n": settings.FC_AS_FS_N_V2,
-        }
-        public_key = jwt.algorithms.RSAAlgorithm.from_jwk(dict_pk)
-        decoded_token = jwt.decode(
-            fc_id_token,
-            public_key,
-            audience=settings.FC_AS_FS_ID_V2,
-            algorithms=["RS256"],
-            leeway=timedelta(seconds=30),
-        )
+        decoded_token = client.decode(fc_id_token)
     except ExpiredSignatureError:
         return fc_error("403: token signature has expired.", connection.pk)
 
@@ -317,12 +304,10 @@ def fc_callback_v2(request):
 
 
 def get_user_info(connection: Connection) -> tuple:
-    fc_base = settings.FC_AS_FS_BASE_URL
-    fc_user_info = python_request.get(
-        f"{fc_base}/userinfo?schema=openid",
-        headers={"Authorization": f"Bearer {connection.access_token}"},
-    )
-    user_info = fc_user_info.json()
+    try:
+        user_info = fc_client().fetch_user_info(connection.access_token).json()
+    except RequestException as e:
+        return None, f"Request for FranceConnect user info failed: {e}"
 
     user_phone = connection.user_phone if len(connection.user_phone) > 0 else None
 
@@ -383,28 +368,11 @@ def get_user_info(connection: Connection) -> tuple:
 
 
 def get_user_infov2(connection: Connection) -> tuple:
-    fc_base = settings.FC_AS_FS_BASE_URL_V2
-    fc_user_info = python_request.get(
-        f"{fc_base}/userinfo?schema=openid",
-        headers={"Authorization": f"Bearer {connection.access_token}"},
-    )
-
-    dict_pk = {
-        "kty": "RSA",
-        "use": "sig",
-        "kid": settings.FC_AS_FS_KID_V2,
-        "alg": "RS256",
-        "e": "AQAB",
-        "n": settings.FC_AS_FS_N_V2,
-    }
-    public_key = jwt.algorithms.RSAAlgorithm.from_jwk(dict_pk)
-    user_info = jwt.decode(
-        fc_user_info.text,
-        public_key,
-        audience=settings.FC_AS_FS_ID_V2,
-        algorithms=["RS256"],
-        leeway=timedelta(seconds=30),
-    )
+    client = fc_client_v2()
+    try:
+        user_info = client.decode(client.fetch_user_info(connection.access_token).text)
+    except RequestException as e:
+        return None, f"Request for FranceConnect user info failed: {e}"
 
     user_phone = connection.user_phone if len(connection.user_phone) > 0 else None
 
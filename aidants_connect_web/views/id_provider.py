@@ -5,7 +5,6 @@ from urllib.parse import unquote, urlencode
 
 from django.conf import settings
 from django.contrib.auth import logout
-from django.contrib.auth.hashers import make_password
 from django.core.exceptions import ObjectDoesNotExist
 from django.forms.models import model_to_dict
 from django.http import (
@@ -44,7 +43,7 @@ from aidants_connect_web.models import (
     Usager,
     UsagerQuerySet,
 )
-from aidants_connect_web.utilities import generate_id_token
+from aidants_connect_web.utilities import generate_fc_as_fi_digest, generate_id_token
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger()
@@ -235,7 +234,7 @@ class FISelectDemarche(RequireConnectionMixin, FormView):
 
     def form_valid(self, form):
         self.code = token_urlsafe(64)
-        self.connection.code = make_password(self.code, settings.FC_AS_FI_HASH_SALT)
+        self.connection.code_digest = generate_fc_as_fi_digest(self.code)
         self.connection.demarche = form.cleaned_data["chosen_demarche"]
         self.connection.autorisation = self.aidant.get_valid_autorisation(
             self.connection.demarche, self.usager
@@ -324,9 +323,8 @@ class Token(FormView):
 
     def form_valid(self, form):
         code = form.cleaned_data["code"]
-        code_hash = make_password(code, settings.FC_AS_FI_HASH_SALT)
         try:
-            connection = Connection.objects.get(code=code_hash)
+            connection = Connection.objects.get_by_code(code)
             if connection.is_expired:
                 log.info("connection has expired at token")
                 return render(self.request, "408.html", status=408)
@@ -344,9 +342,7 @@ class Token(FormView):
         )
 
         access_token = token_urlsafe(64)
-        connection.access_token = make_password(
-            access_token, settings.FC_AS_FI_HASH_SALT
-        )
+        connection.access_token_digest = generate_fc_as_fi_digest(access_token)
         connection.save()
 
         return JsonResponse(
@@ -372,9 +368,8 @@ def user_info(request):
         return HttpResponseForbidden()
 
     auth_token = auth_header[7:]
-    auth_token_hash = make_password(auth_token, settings.FC_AS_FI_HASH_SALT)
     try:
-        connection = Connection.objects.get(access_token=auth_token_hash)
+        connection = Connection.objects.get_by_access_token(auth_token)
         if connection.is_expired:
             log.info("connection has expired at user_info")
             return render(request, "408.html", status=408)
@@ -410,7 +405,7 @@ def user_info(request):
         aidant=connection.aidant,
         usager=connection.usager,
         demarche=connection.demarche,
-        access_token=connection.access_token,
+        access_token=connection.access_token_digest,
         autorisation=connection.autorisation,
     )
 
@@ -1,26 +1,28 @@
 import logging
 import re
 from datetime import date
-from io import BytesIO
 from typing import Callable, List
 from uuid import uuid4
 
 from django.conf import settings
 from django.contrib import messages as django_messages
 from django.contrib.staticfiles import finders
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.http import Http404, HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
 from django.utils import formats, timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.html import format_html
+from django.utils.http import quote_etag
 from django.utils.safestring import mark_safe
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import FormView, TemplateView, View
 
-import qrcode
+from kombu.exceptions import OperationalError
 from phonenumbers import PhoneNumber
+from redis.exceptions import RedisError
 
 from aidants_connect_common.constants import (
     AuthorizationDurationChoices,
@@ -28,10 +30,13 @@ from aidants_connect_common.constants import (
 )
 from aidants_connect_common.templatetags.ac_common import mailto
 from aidants_connect_common.utils import render_markdown
-from aidants_connect_common.utils.sms_api import SmsApi
 from aidants_connect_common.views import RequireConnectionMixin, RequireConnectionView
 from aidants_connect_pico_cms.models import MandateTranslation
 from aidants_connect_pico_cms.utils import is_lang_rtl
+from aidants_connect_web.consent_notifications import (
+    long_poll_slot,
+    subscribe_to_sms_response,
+)
 from aidants_connect_web.decorators import (
     aidant_logged_required,
     aidant_logged_with_activity_required,
@@ -50,7 +55,12 @@ from aidants_connect_web.models import (
     Organisation,
     Usager,
 )
-from aidants_connect_web.utilities import generate_attestation_hash
+from aidants_connect_web.tasks import dispatch_remote_consent_sms
+from aidants_connect_web.utilities import (
+    attestation_qrcode_key,
+    generate_attestation_hash,
+    render_attestation_qrcode,
+)
 from aidants_connect_web.views.service import humanize_demarche_names
 
 logging.basicConfig(level=logging.INFO)
@@ -174,8 +184,21 @@ class RemoteMandateMixin:
         message = re.sub(r"(^\s*)|(\s*$)", "", message)
 
         try:
-            SmsApi().send_sms(user_phone, self.consent_request_id, message)
-        except SmsApi.HttpRequestExpection:
+            # The SMS is queued once the journal entry is committed
+            with transaction.atomic():
+                Journal.log_user_mandate_recap_sms_sent(
+                    aidant=aidant,
+                    demarche=data["demarche"],
+                    duree=data["duree"],
+                    remote_constent_method=data["remote_constent_method"],
+                    user_phone=user_phone,
+                    consent_request_id=self.consent_request_id,
+                    message=message,
+                )
+                dispatch_remote_consent_sms(
+                    user_phone, self.consent_request_id, message
+                )
+        except OperationalError:
             log.exception(
                 "An error happend while trying to send the mandate recap by SMS"
             )
@@ -204,16 +227,6 @@ class RemoteMandateMixin:
             )
             return redirect("espace_aidant:home")
 
-        Journal.log_user_mandate_recap_sms_sent(
-            aidant=aidant,
-            demarche=data["demarche"],
-            duree=data["duree"],
-            remote_constent_method=data["remote_constent_method"],
-            user_phone=user_phone,
-            consent_request_id=self.consent_request_id,
-            message=message,
-        )
-
     def _process_sms_second_step(self, connection: Connection):
         if not Journal.objects.find_sms_consent_recap(
             connection.user_phone, connection.consent_request_id
@@ -233,10 +246,21 @@ class RemoteMandateMixin:
         message = re.sub(r"(^\s*)|(\s*$)", "", message)
 
         try:
-            SmsApi().send_sms(
-                connection.user_phone, connection.consent_request_id, message
-            )
-        except SmsApi.HttpRequestExpection:
+            # The SMS is queued once the journal entry is committed
+            with transaction.atomic():
+                Journal.log_user_consent_request_sms_sent(
+                    aidant=connection.aidant,
+                    demarche=connection.demarche,
+                    duree=AuthorizationDurations.duration(connection.duree_keyword),
+                    remote_constent_method=connection.remote_constent_method,
+                    user_phone=connection.user_phone,
+                    consent_request_id=connection.consent_request_id,
+                    message=message,
+                )
+                dispatch_remote_consent_sms(
+                    connection.user_phone, connection.consent_request_id, message
+                )
+        except OperationalError:
             log.exception(
                 "An error happend while trying to send an SMS consent request"
             )
@@ -265,16 +289,6 @@ class RemoteMandateMixin:
             )
             return redirect("espace_aidant:home")
 
-        Journal.log_user_consent_request_sms_sent(
-            aidant=connection.aidant,
-            demarche=connection.demarche,
-            duree=AuthorizationDurations.duration(connection.duree_keyword),
-            remote_constent_method=connection.remote_constent_method,
-            user_phone=connection.user_phone,
-            consent_request_id=connection.consent_request_id,
-            message=message,
-        )
-
     def _process_sms_consent_validation(self, connection: Connection):
         if not Journal.objects.find_sms_user_consent(
             connection.user_phone, connection.consent_request_id
@@ -508,66 +522,68 @@ class NewMandatRecap(RemoteMandateMixin, RequireConnectionMixin, FormView):
         )
 
         try:
-            self.connection.demarches.sort()
-
-            # Update user phone before creating mandate
-            if self.connection.user_phone:
-                self.connection.usager.phone = self.connection.user_phone
-                self.connection.usager.save()
-
-            # Create a mandat
-            self.mandat = Mandat.objects.create(
-                organisation=self.aidant.organisation,
-                usager=self.connection.usager,
-                duree_keyword=self.connection.duree_keyword,
-                expiration_date=expiration_date,
-                is_remote=self.connection.mandat_is_remote,
-                remote_constent_method=self.connection.remote_constent_method,
-                consent_request_id=self.connection.consent_request_id,
-            )
-
-            # Add a Journal 'create_attestation' action
-            Journal.log_attestation_creation(
-                aidant=self.aidant,
-                usager=self.connection.usager,
-                demarches=self.connection.demarches,
-                is_remote_mandat=self.connection.mandat_is_remote,
-                user_phone=self.connection.user_phone,
-                remote_constent_method=self.connection.remote_constent_method,
-                consent_request_id=self.connection.consent_request_id,
-                access_token=self.connection.access_token,
-                attestation_hash=generate_attestation_hash(
-                    self.aidant,
-                    self.connection.usager,
-                    self.connection.demarches,
-                    expiration_date,
-                ),
-                mandat=self.mandat,
-                duree=AuthorizationDurations.duration(
-                    self.connection.duree_keyword, fixed_date
-                ),
-            )
-
-            # This loop creates one `autorisation` object per `démarche` in the form
-            for demarche in self.connection.demarches:
-                # Revoke existing demarche autorisation(s)
-                similar_active_autorisations = Autorisation.objects.active().filter(
-                    mandat__organisation=self.aidant.organisation,
-                    mandat__usager=self.connection.usager,
-                    demarche=demarche,
+            # Journal entries are written all at once when the mandate is complete
+            with transaction.atomic(), Journal.buffered():
+                self.connection.demarches.sort()
+
+                # Update user phone before creating mandate
+                if self.connection.user_phone:
+                    self.connection.usager.phone = self.connection.user_phone
+                    self.connection.usager.save()
+
+                # Create a mandat
+                self.mandat = Mandat.objects.create(
+                    organisation=self.aidant.organisation,
+                    usager=self.connection.usager,
+                    duree_keyword=self.connection.duree_keyword,
+                    expiration_date=expiration_date,
+                    is_remote=self.connection.mandat_is_remote,
+                    remote_constent_method=self.connection.remote_constent_method,
+                    consent_request_id=self.connection.consent_request_id,
                 )
-                for similar_active_autorisation in similar_active_autorisations:
-                    similar_active_autorisation.revoke(
-                        aidant=self.aidant, revocation_date=fixed_date
-                    )
 
-                # Create new demarche autorisation
-                autorisation = Autorisation.objects.create(
+                # Add a Journal 'create_attestation' action
+                Journal.log_attestation_creation(
+                    aidant=self.aidant,
+                    usager=self.connection.usager,
+                    demarches=self.connection.demarches,
+                    is_remote_mandat=self.connection.mandat_is_remote,
+                    user_phone=self.connection.user_phone,
+                    remote_constent_method=self.connection.remote_constent_method,
+                    consent_request_id=self.connection.consent_request_id,
+                    access_token=self.connection.access_token,
+                    attestation_hash=generate_attestation_hash(
+                        self.aidant,
+                        self.connection.usager,
+                        self.connection.demarches,
+                        expiration_date,
+                    ),
                     mandat=self.mandat,
-                    demarche=demarche,
-                    last_renewal_token=self.connection.access_token,
+                    duree=AuthorizationDurations.duration(
+                        self.connection.duree_keyword, fixed_date
+                    ),
                 )
-                Journal.log_autorisation_creation(autorisation, self.aidant)
+
+                # This loop creates one `autorisation` object per `démarche` in the form
+                for demarche in self.connection.demarches:
+                    # Revoke existing demarche autorisation(s)
+                    similar_active_autorisations = Autorisation.objects.active().filter(
+                        mandat__organisation=self.aidant.organisation,
+                        mandat__usager=self.connection.usager,
+                        demarche=demarche,
+                    )
+                    for similar_active_autorisation in similar_active_autorisations:
+                        similar_active_autorisation.revoke(
+                            aidant=self.aidant, revocation_date=fixed_date
+                        )
+
+                    # Create new demarche autorisation
+                    autorisation = Autorisation.objects.create(
+                        mandat=self.mandat,
+                        demarche=demarche,
+                        last_renewal_token=self.connection.access_token,
+                    )
+                    Journal.log_autorisation_creation(autorisation, self.aidant)
 
         except (AttributeError, IntegrityError):
             return self.redirect_on_error()
@@ -719,20 +735,28 @@ class Attestation(RenderAttestationAbstract):
 @aidant_logged_with_activity_required
 class AttestationQRCode(View):
     def get(self, request, *args, **kwargs):
-        if (mandat_id := kwargs.get("mandat_id")) is not None:
-            attestation_hash = Mandat.get_attestation_hash_or_none(mandat_id)
-            qrcode_png = self.generate_qrcode_png(attestation_hash)
-        else:
+        if (mandat_id := kwargs.get("mandat_id")) is None:
             with open(finders.find("images/empty_qr_code.png"), "rb") as f:
-                qrcode_png = f.read()
+                return HttpResponse(f.read(), content_type="image/png")
 
-        return HttpResponse(qrcode_png, content_type="image/png")
+        attestation_hash = Mandat.get_attestation_hash_or_none(mandat_id)
+        if attestation_hash is None:
+            return HttpResponse(
+                render_attestation_qrcode(f"{attestation_hash}"),
+                content_type="image/png",
+            )
 
-    def generate_qrcode_png(self, content: str):
-        stream = BytesIO()
-        img = qrcode.make(content)
-        img.save(stream, "PNG")
-        return stream.getvalue()
+        # The hash may change, when the mandate is transferred for instance, so
+        # browsers must revalidate their copy, which only costs the hash lookup
+        etag = quote_etag(attestation_qrcode_key(attestation_hash))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(
+                render_attestation_qrcode(attestation_hash), content_type="image/png"
+            )
+        response.headers["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
 
 @aidant_logged_with_activity_required
@@ -762,12 +786,44 @@ class WaitingRoom(RequireConnectionView, TemplateView):
 @aidant_logged_with_activity_required
 class WaitingRoomJson(RequireConnectionView, View):
     def post(self, request, *args, **kwargs):
-        if (
+        if settings.WAITING_ROOM_LONG_POLL_SECONDS > 0:
+            with long_poll_slot() as reserved:
+                if reserved:
+                    try:
+                        return self.long_poll()
+                    except RedisError:
+                        log.warning(
+                            "Push is unavailable for waiting rooms, "
+                            "falling back to polling"
+                        )
+
+        return JsonResponse(
+            {"connectionStatus": "OK" if self.consent_received() else "NOK"}
+        )
+
+    def long_poll(self):
+        """Holds the request until a response to the consent request arrives"""
+        with subscribe_to_sms_response(
+            self.connection.consent_request_id
+        ) as subscription:
+            # Checked once subscribed so that a response arriving meanwhile is seen
+            if self.consent_received():
+                return JsonResponse({"connectionStatus": "OK", "longPoll": True})
+            notified = subscription.wait(settings.WAITING_ROOM_LONG_POLL_SECONDS)
+
+        return JsonResponse(
+            {
+                "connectionStatus": (
+                    "OK" if notified and self.consent_received() else "NOK"
+                ),
+                "longPoll": True,
+            }
+        )
+
+    def consent_received(self):
+        return (
             not self.connection.mandat_is_remote
             or Journal.objects.find_sms_user_consent(
                 self.connection.user_phone, self.connection.consent_request_id
             ).exists()
-        ):
-            return JsonResponse({"connectionStatus": "OK"})
-
-        return JsonResponse({"connectionStatus": "NOK"})
+        )
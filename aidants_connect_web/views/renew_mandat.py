@@ -1,9 +1,7 @@
 import logging
 from secrets import token_urlsafe
 
-from django.conf import settings
 from django.contrib import messages as django_messages
-from django.contrib.auth.hashers import make_password
 from django.shortcuts import redirect
 from django.urls import reverse, reverse_lazy
 from django.views.generic import FormView
@@ -13,6 +11,7 @@ from aidants_connect_pico_cms.models import MandateTranslation
 from aidants_connect_web.decorators import aidant_logged_with_activity_required
 from aidants_connect_web.forms import MandatForm
 from aidants_connect_web.models import Aidant, Connection, Journal, Mandat, Usager
+from aidants_connect_web.utilities import generate_fc_as_fi_digest
 from aidants_connect_web.views.mandat import (
     RemoteConsentSecondStepView as MandatRemoteConsentSecondStepView,
 )
@@ -48,7 +47,7 @@ class RenewMandat(FormView):
 
     def form_valid(self, form):
         data = form.cleaned_data
-        access_token = make_password(token_urlsafe(64), settings.FC_AS_FI_HASH_SALT)
+        access_token = generate_fc_as_fi_digest(token_urlsafe(64))
 
         self.connection = Connection.objects.create(
             aidant=self.aidant,
@@ -5,17 +5,16 @@ from django.conf import settings
 from django.contrib import messages as django_messages
 from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count
 from django.http import HttpResponseNotFound
 from django.shortcuts import redirect, render
-from django.utils.http import url_has_allowed_host_and_scheme
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, url_has_allowed_host_and_scheme
 from django.views.generic import TemplateView
 
-from django_otp.plugins.otp_totp.models import TOTPDevice
-
 from aidants_connect_pico_cms.models import Testimony
 from aidants_connect_web.forms import OTPForm
-from aidants_connect_web.models import Aidant, Journal, Mandat, Organisation
+from aidants_connect_web.models import Journal, PublicStatistiques
+from aidants_connect_web.statistics import compute_public_statistics
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger()
@@ -65,38 +64,43 @@ def habilitation(request):
 class StatistiquesView(TemplateView):
     template_name = "public_website/statistiques.html"
 
-    def setup(self, request, *args, **kwargs):
-        super().setup(request, *args, **kwargs)
-        self.autorisation_use_qs = Journal.objects.excluding_staff().filter(
-            action="use_autorisation"
+    def get(self, request, *args, **kwargs):
+        try:
+            self.statistics = PublicStatistiques.objects.latest()
+        except PublicStatistiques.DoesNotExist:
+            # The periodic task has never run yet
+            self.statistics = compute_public_statistics()
+
+        response = super().get(request, *args, **kwargs)
+        last_modified = int(self.statistics.created_at.timestamp())
+        response.headers["Last-Modified"] = http_date(last_modified)
+
+        if request.user.is_authenticated:
+            # The header of the page shows the connected aidant
+            patch_cache_control(
+                response, private=True, max_age=settings.PUBLIC_STATISTICS_MAX_AGE
+            )
+            return response
+
+        patch_cache_control(
+            response, public=True, max_age=settings.PUBLIC_STATISTICS_MAX_AGE
         )
-
-        self.active_aidants_qs = (
-            Aidant.objects.exclude(organisation__name=settings.STAFF_ORGANISATION_NAME)
-            .filter(is_active=True)
-            .filter(can_create_mandats=True)
+        return get_conditional_response(
+            request, last_modified=last_modified, response=response
         )
 
     def get_demarches_stats(self) -> Tuple[dict[str, list], int]:
         data = {"icons": [], "titles": [], "values": []}
 
-        qs = (
-            self.autorisation_use_qs.values("demarche")
-            .annotate(total=Count("demarche"))
-            .order_by("total")
-            .all()
-        )
-
-        data_total = 0
         demarches_met = []
-        for entry in qs.all():
-            demarche = settings.DEMARCHES[entry["demarche"]]
-            count = entry["total"]
-            demarches_met.append(entry["demarche"])
+        for demarche_name, count in self.statistics.demarches:
+            if demarche_name not in settings.DEMARCHES:
+                continue
+            demarche = settings.DEMARCHES[demarche_name]
+            demarches_met.append(demarche_name)
             data["icons"].append(demarche["icon"])
             data["titles"].append(demarche["titre_court"])
             data["values"].append(count)
-            data_total += count
 
         # Fill rest of data with demarches not met
         for k, v in settings.DEMARCHES.items():
@@ -106,38 +110,9 @@ class StatistiquesView(TemplateView):
             data["titles"].append(v["titre_court"])
             data["values"].append(0)
 
-        return data, data_total
+        return data, self.statistics.number_demarches
 
     def get_context_data(self, **kwargs):
-        usagers_helped_count = (
-            self.autorisation_use_qs.values("usager").distinct().count()
-        )
-
-        mandat_count = Mandat.objects.exclude(
-            organisation__name=settings.STAFF_ORGANISATION_NAME
-        ).count()
-
-        organisations_accredited_count = (
-            Organisation.objects.accredited()
-            .exclude(name=settings.STAFF_ORGANISATION_NAME)
-            .count()
-        )
-        organisations_not_accredited_count = (
-            Organisation.objects.not_yet_accredited()
-            .exclude(name=settings.STAFF_ORGANISATION_NAME)
-            .count()
-        )
-
-        aidant_totp_devices_id = TOTPDevice.objects.all().values_list(
-            "user_id", flat=True
-        )
-        aidants_count = self.active_aidants_qs.filter(
-            id__in=list(set(aidant_totp_devices_id))
-        ).count()
-        aidants_not_accredited_count = self.active_aidants_qs.filter(
-            carte_totp__isnull=True
-        ).count()
-
         data, data_total = self.get_demarches_stats()
         demarches_transcription = [
             {"title": title, "value": value}
@@ -148,20 +123,24 @@ class StatistiquesView(TemplateView):
             **kwargs,
             usage_section={
                 "Démarches administratives réalisées": data_total,
-                "Personnes accompagnées": usagers_helped_count,
-                "Mandats créés": mandat_count,
+                "Personnes accompagnées": self.statistics.number_usagers_helped,
+                "Mandats créés": self.statistics.number_mandats,
             },
             data=data,
             demarches_transcription=demarches_transcription,
             deployment_section=(
                 {
-                    "Aidants habilités": aidants_count,
-                    "Aidants en cours d’habilitation": aidants_not_accredited_count,
+                    "Aidants habilités": self.statistics.number_accredited_aidants,
+                    "Aidants en cours d’habilitation": (
+                        self.statistics.number_future_aidants
+                    ),
                 },
                 {
-                    "Structures habilitées": organisations_accredited_count,
+                    "Structures habilitées": (
+                        self.statistics.number_accredited_organisations
+                    ),
                     "Structures en cours d’habilitation": (
-                        organisations_not_accredited_count
+                        self.statistics.number_future_organisations
                     ),
                 },
             ),
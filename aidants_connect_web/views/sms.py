@@ -3,16 +3,21 @@ import logging
 import re
 
 from django.conf import settings
+from django.db import transaction
 from django.http import HttpResponse, QueryDict
 from django.template.loader import render_to_string
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
 
+from kombu.exceptions import OperationalError
 from phonenumbers import parse as parse_phone
 
 from aidants_connect_common.utils.sms_api import SmsApi
+from aidants_connect_web.consent_notifications import notify_sms_response
+from aidants_connect_web.constants import SmsStatus
 from aidants_connect_web.models import Journal
+from aidants_connect_web.tasks import dispatch_remote_consent_sms
 
 logger = logging.getLogger()
 
@@ -40,7 +45,17 @@ class Callback(View):
             # SMS send report
             try:
                 # Must not fail
-                if self.request.POST.get("errorCode", 0) != 0:
+                # Form-encoded reports carry the code as a string
+                error_code = int(self.request.POST.get("errorCode", 0))
+                Journal.log_sms_status(
+                    parse_phone(f"+{self.request.POST['userId']}"),
+                    self.request.POST["correlationId"],
+                    SmsStatus.DELIVERED if error_code == 0 else SmsStatus.UNDELIVERED,
+                    provider_status=self.request.POST.get("status"),
+                    provider_message=self.request.POST.get("statusMessage"),
+                    error_code=error_code,
+                )
+                if error_code != 0:
                     error_message = self.request.POST.get("errorMessage")
                     additionnal_infos = (
                         f"Error message returned by SMS provider: {error_message}"
@@ -101,17 +116,24 @@ class Callback(View):
 
         if not self._check_user_consents(sms_response.message):  # No consent case
             Journal.log_user_denies_sms(**kwargs)
-            api.send_sms(
-                consent_request.user_phone,
-                sms_response.consent_request_id,
-                render_to_string("aidants_connect_web/sms/denial_receipt.txt"),
-            )
+            receipt = "aidants_connect_web/sms/denial_receipt.txt"
         else:
             Journal.log_user_consents_sms(**kwargs)
-            api.send_sms(
-                consent_request.user_phone,
-                sms_response.consent_request_id,
-                render_to_string("aidants_connect_web/sms/agreement_receipt.txt"),
+            receipt = "aidants_connect_web/sms/agreement_receipt.txt"
+
+        # Wake up the waiting room once the response can be read from the journal
+        consent_request_id = sms_response.consent_request_id
+        transaction.on_commit(lambda: notify_sms_response(consent_request_id))
+
+        try:
+            dispatch_remote_consent_sms(
+                phone_number, sms_response.consent_request_id, render_to_string(receipt)
+            )
+        except OperationalError:
+            # The response is recorded; only the receipt is lost
+            logger.exception(
+                "Could not queue the receipt for consent request "
+                f"{consent_request_id!r}"
             )
 
         return HttpResponse("Status=0")
@@ -2,10 +2,14 @@ import logging
 from collections import OrderedDict
 from datetime import date
 from typing import Iterable
+from urllib.parse import urlencode
 
 from django.conf import settings
 from django.contrib import messages as django_messages
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Case, Exists, OuterRef, Prefetch, Q, Value, When
 from django.db.models.functions import Concat
 from django.shortcuts import redirect, render
 from django.utils import timezone
@@ -21,121 +25,69 @@ logging.basicConfig(level=logging.INFO)
 log = logging.getLogger()
 
 
+USAGERS_INDEX_TABS = {
+    "actifs": "valid",
+    "expires": "expired",
+    "revoques": "revoked",
+}
+
+
 def _get_mandats_for_usagers_index(aidant):
+    """
+    Mandates listed in the usagers index, with their usager and their autorisations
+    fetched along, and annotated with ``index_status``: ``"revoked"`` if all their
+    autorisations were revoked, ``"expired"`` if they are expired or have no
+    autorisations, ``"valid"`` otherwise.
+    """
     return (
-        Mandat.objects.prefetch_related("autorisations")
+        Mandat.objects.select_related("usager")
+        .prefetch_related(
+            Prefetch("autorisations", queryset=Autorisation.objects.order_by("pk"))
+        )
         .filter(organisation=aidant.organisation)
         .exclude(expiration_date__lt=timezone.now() - timedelta(365))
         .exclude(autorisations__revocation_date__lt=timezone.now() - timedelta(365))
+        .annotate_revocation()
         .annotate(
-            for_ordering=Concat("usager__preferred_username", "usager__family_name")
+            index_status=Case(
+                When(was_explicitly_revoked=True, then=Value("revoked")),
+                When(
+                    Q(has_autorisations=False) | Q(expiration_date__lt=timezone.now()),
+                    then=Value("expired"),
+                ),
+                default=Value("valid"),
+            ),
+            for_ordering=Concat("usager__preferred_username", "usager__family_name"),
         )
         .order_by("for_ordering", "expiration_date")
     )
 
 
-def _get_usagers_dict_from_mandats(mandats: Iterable[Mandat]) -> dict:
+def _get_usagers_for_usagers_index(mandats, index_status: str, search: str = ""):
     """
-    :return: A dict containing data about the users from input mandates with attributes:
-
-            with_valid_mandate -> OrderedDict[Usager, list[Tuple[str, bool]]
-
-                dictionnary associating the user with the list of its mandate's
-                authorizations. Each item of the list is a tuple of two items: the
-                the procedure (see aidants_connect.settings.DEMARCHES) covered by the
-                authorization (see aidants_aidants_connect_web.models.Autorisation) and
-                a boolean indication if the authorisation is soon to be expired.
-
-            without_valid_mandate -> OrderedDict[Usager, bool]
-
-                dict associating users without an active mandate and the boolean
-                indicating if the user has no valid autorisations
-                (revoked or no autorisations).
-
-            with_valid_mandate_count -> int
-
-                count of items in ``with_valid_mandate``
-
-            without_valid_mandate_count: int
-
-                count of items in ``without_valid_mandate``
-
-            total: int
-
-                total count of both ``with_valid_mandate`` and ``without_valid_mandate``
-
-        Example:
-            $ _get_usagers_dict_from_mandats(mandates)
-            {
-                "with_valid_mandate": {
-                    <Usager: Angela Claire Louise DUBOIS>: [
-                        ("papiers", False), ("transports", False)
-                    ]
-                },
-                "without_valid_mandate": {<Usager: Karl MARX>: True},
-                "with_valid_mandate_count": 1,
-                "without_valid_mandate_count": 1,
-                "total"2
-            }
+    Usagers having at least one of ``mandats`` with ``index_status``, ordered like
+    the mandates. Every word of ``search`` must be found in one of their names.
     """
-    usagers = OrderedDict()
-    usagers_with_valid_mandate = OrderedDict()
-    usagers_without_valid_mandate = OrderedDict()
-    delta = settings.MANDAT_EXPIRED_SOON
-
-    for mandat in mandats:
-        if mandat.usager not in usagers:
-            usagers[mandat.usager] = {"active_mandats": [], "inactive_mandats": []}
-
-        expired = mandat.expiration_date if mandat.expiration_date < now() else False
-
-        expired_soon = (
-            mandat.expiration_date
-            if mandat.expiration_date - timedelta(days=delta) < now()
-            else False
-        )
-
-        autorisations = (
-            mandat.autorisations.filter(revocation_date=None).all().order_by("pk")
+    usagers = Usager.objects.filter(
+        Exists(mandats.filter(usager=OuterRef("pk"), index_status=index_status))
+    )
+    for term in search.split():
+        usagers = usagers.filter(
+            Q(given_name__icontains=term)
+            | Q(family_name__icontains=term)
+            | Q(preferred_username__icontains=term)
         )
 
-        has_autorisations = autorisations.count() > 0
-        has_no_autorisations = not has_autorisations
-
-        if expired or has_no_autorisations:
-            usagers[mandat.usager]["inactive_mandats"].append(
-                (mandat, has_no_autorisations)
-            )
-
-        if not expired and not has_no_autorisations:
-            for autorisation in autorisations:
-                usagers[mandat.usager]["active_mandats"].append(
-                    (autorisation.demarche, expired_soon)
-                )
-
-    for usager, mandats in usagers.items():
-        if len(mandats["active_mandats"]) > 0:
-            usagers_with_valid_mandate[usager] = mandats["active_mandats"]
-        if len(mandats["inactive_mandats"]) > 0 and len(mandats["active_mandats"]) == 0:
-            usager_without_autorisations = True
-            for mandat, has_no_autorisations in mandats["inactive_mandats"]:
-                if not has_no_autorisations:
-                    usager_without_autorisations = False
-            usagers_without_valid_mandate[usager] = usager_without_autorisations
-
-    with_valid_mandate_count = len(usagers_with_valid_mandate)
-    without_valid_mandate_count = len(usagers_without_valid_mandate)
-
-    return {
-        "with_valid_mandate": usagers_with_valid_mandate,
-        "without_valid_mandate": usagers_without_valid_mandate,
-        "with_valid_mandate_count": with_valid_mandate_count,
-        "without_valid_mandate_count": without_valid_mandate_count,
-        "total": with_valid_mandate_count + without_valid_mandate_count,
-    }
+    return usagers.annotate(
+        for_ordering=Concat("preferred_username", "family_name")
+    ).order_by("for_ordering", "pk")
 
 
 def _get_mandats_dicts_from_queryset_mandats(mandats: Iterable[Mandat]) -> tuple:
+    """
+    :param mandats: mandates from ``_get_mandats_for_usagers_index``
+    :return: the valid, expired and revoked mandates, grouped by usager
+    """
     delta = settings.MANDAT_EXPIRED_SOON
 
     valid_mandats = OrderedDict()
@@ -144,14 +96,14 @@ def _get_mandats_dicts_from_queryset_mandats(mandats: Iterable[Mandat]) -> tuple
 
     for mandat in mandats:
         expired = mandat.expiration_date if mandat.expiration_date < now() else False
-        autorisations = mandat.autorisations.all().order_by("pk")
-
-        l_autorisations = list(autorisations.values_list("demarche", flat=True))
-        has_no_autorisations = autorisations.count() == 0
+        l_autorisations = [
+            autorisation.demarche for autorisation in mandat.autorisations.all()
+        ]
+        has_no_autorisations = not mandat.has_autorisations
         expired_soon = ""
         delta_before_expiration = ""
 
-        if mandat.revocation_date:
+        if mandat.index_status == "revoked":
             if mandat.usager not in revoked_mandats:
                 revoked_mandats[mandat.usager] = list()
 
@@ -279,22 +231,56 @@ def _get_mandats_dicts_from_queryset_mandats(mandats: Iterable[Mandat]) -> tuple
 @activity_required
 def usagers_index(request):
     aidant = request.user
+    search = request.GET.get("q", "").strip()
+    selected_tab = request.GET.get("onglet")
+    if selected_tab not in USAGERS_INDEX_TABS:
+        selected_tab = next(iter(USAGERS_INDEX_TABS))
+
+    # Each tab is paginated on its own; only the selected one follows `page`
     mandats = _get_mandats_for_usagers_index(aidant)
-    usagers_dict = _get_usagers_dict_from_mandats(mandats)
+    tabs = {}
+    for tab, index_status in USAGERS_INDEX_TABS.items():
+        paginator = Paginator(
+            _get_usagers_for_usagers_index(mandats, index_status, search),
+            settings.USAGERS_INDEX_PAGE_SIZE,
+        )
+        tabs[tab] = {
+            "page": paginator.get_page(
+                request.GET.get("page") if tab == selected_tab else 1
+            ),
+            "querystring": urlencode(
+                {"q": search, "onglet": tab} if search else {"onglet": tab}
+            ),
+        }
+
     (
         valid_mandats,
         expired_mandats,
         revoked_mandats,
-    ) = _get_mandats_dicts_from_queryset_mandats(mandats)
+    ) = _get_mandats_dicts_from_queryset_mandats(
+        mandats.filter(
+            usager__in={usager.pk for tab in tabs.values() for usager in tab["page"]}
+        )
+    )
+
+    def for_page(mandats_dict: dict, tab: str) -> dict:
+        return OrderedDict(
+            (usager, mandats_dict[usager])
+            for usager in tabs[tab]["page"]
+            if usager in mandats_dict
+        )
+
     return render(
         request,
         "aidants_connect_web/usagers/usagers.html",
         {
             "aidant": aidant,
-            "usagers_dict": usagers_dict,
-            "valid_mandats": valid_mandats,
-            "expired_mandats": expired_mandats,
-            "revoked_mandats": revoked_mandats,
+            "search": search,
+            "selected_tab": selected_tab,
+            "tabs": tabs,
+            "valid_mandats": for_page(valid_mandats, "actifs"),
+            "expired_mandats": for_page(expired_mandats, "expires"),
+            "revoked_mandats": for_page(revoked_mandats, "revoques"),
         },
     )
 
@@ -331,18 +317,21 @@ class UsagerView(DetailView):
             Mandat.objects.prefetch_related("autorisations")
             .filter(organisation=self.aidant.organisation, usager=self.usager)
             .active()
+            .annotate_revocation()
         )
         inactive_mandats = (
             Mandat.objects.prefetch_related("autorisations")
             .filter(organisation=self.aidant.organisation, usager=self.usager)
             .inactive()
             .renewable()
+            .annotate_revocation()
         )
         revoked_mandats = (
             Mandat.objects.prefetch_related("autorisations")
             .filter(organisation=self.aidant.organisation, usager=self.usager)
             .exclude_outdated()
             .seperatly_revoked()
+            .annotate_revocation()
         )
         return {
             "mandats_grouped": {
@@ -524,14 +513,13 @@ def confirm_mandat_cancelation(request, mandat_id):
         if request.method == "POST":
             if request.POST:
                 autorisation_in_mandat = Autorisation.objects.filter(mandat=mandat)
-                for autorisation in autorisation_in_mandat:
-                    if not autorisation.revocation_date:
-                        autorisation.revocation_date = autorisation.revocation_date = (
-                            timezone.now()
-                        )
-                        autorisation.save(update_fields=["revocation_date"])
-                        Journal.log_autorisation_cancel(autorisation, aidant)
-                Journal.log_mandat_cancel(mandat, aidant)
+                with transaction.atomic(), Journal.buffered():
+                    for autorisation in autorisation_in_mandat:
+                        if not autorisation.revocation_date:
+                            autorisation.revocation_date = timezone.now()
+                            autorisation.save(update_fields=["revocation_date"])
+                            Journal.log_autorisation_cancel(autorisation, aidant)
+                    Journal.log_mandat_cancel(mandat, aidant)
                 return redirect(
                     "espace_aidant:mandat_cancelation_success", mandat_id=mandat.id
                 )
@@ -616,7 +604,9 @@ def mandat_cancelation_success(request, mandat_id: int):
 def mandat_cancellation_attestation(request, mandat_id):
     organisation = request.user.organisation
     try:
-        mandat = Mandat.objects.get(pk=mandat_id, organisation=organisation)
+        mandat = Mandat.objects.annotate_revocation().get(
+            pk=mandat_id, organisation=organisation
+        )
         if not mandat.was_explicitly_revoked:
             return redirect("espace_aidant:home")
     except Mandat.DoesNotExist: